@@ -5,10 +5,21 @@ from schemas.modelos_base import (
     InputData, 
     DecodificacaoInput, 
     BuscaDocumentosInput,
-    InputDataComLaudo
+    InputDataComLaudo,
+    InputLote,
+    ConsultaProcedimentosInput
     )
 from schemas.modelos_para_agentes import Procedimento
 from fastapi import FastAPI, HTTPException, Body
+from fastapi.responses import JSONResponse
+from api.respostas import RespostaJSONRapida, resposta_json
+from contextlib import asynccontextmanager
+import asyncio
+from src.aquecimento import executar_aquecimento, obter_estado_prontidao
+from src.logs import configurar_logs, encerrar_logs
+from src.catalogo import obter_indice_catalogo, procedimento_por_codigo, valores_decodificacao
+from src.metricas import coletar_metricas
+from src.fila_jobs import obter_fila_jobs, CONCLUIDO, FALHOU
 from src.flows.process_fluxo import processar_texto_e_decidir_fluxo
 
 from src.flows.fluxo_chain import (
@@ -26,7 +37,27 @@ from schemas.modelos_para_agentes import Procedimento
 from loguru import logger
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida da aplicação.
+
+    O aquecimento (catálogo, clientes e processadores) roda em segundo plano para
+    que o worker suba imediatamente; o endpoint /prontidao/ indica quando terminou.
+    """
+    configurar_logs()
+    tarefa_aquecimento = asyncio.create_task(asyncio.to_thread(executar_aquecimento))
+    yield
+    if not tarefa_aquecimento.done():
+        tarefa_aquecimento.cancel()
+    from src.clientes_http import fechar_clientes_http
+    fechar_clientes_http()
+    encerrar_logs()
+
 
+# Os endpoints que chamam o LLM rodam o processamento com asyncio.to_thread, fora do
+# laço de eventos: requisições concorrentes são processadas em paralelo (e podem
+# compartilhar micro-lotes, ver src/micro_lote.py) em vez de uma de cada vez.
 app = FastAPI(
     title="API de Processamento de Procedimentos Médicos",
     description="""
@@ -38,43 +69,113 @@ app = FastAPI(
     - /buscar_documentos_similares/: Busca documentos similares no vector store
     - /decodificar_procedimentos/: Decodifica procedimentos verificados
     - /fluxo_completo/: Executa o fluxo completo (extração, verificação, busca e decodificação)
+    - /prontidao/: Indica se o aquecimento da aplicação foi concluído
+    - /metricas/: Métricas internas (reuso de conexões HTTP, entre outras)
+    - /jobs/processar_com_laudo/: Enfileira um caso para processamento assíncrono
+    - /jobs/lote/: Enfileira um lote de casos, reaproveitando o resultado de duplicatas
+    - /jobs/{job_id}: Consulta (com espera opcional) o resultado de um job
+    - /procedimentos/{codigo}: Nome, descrição e valores de um procedimento do catálogo
+    - /procedimentos/consulta/: Consulta em lote ao catálogo, por códigos e nomes
+    
+    Os endpoints de resultado aceitam o parâmetro de consulta `fields` para retornar
+    apenas os campos pedidos, por exemplo `?fields=classificacao_final,decodificacao.codigo_procedimentos`.
     """,
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespostaJSONRapida
 )
 
 @app.get("/")
 def read_root():
     return {"message": "API de Processamento de Procedimentos Médicos", "status": "online"}
 
+@app.get("/prontidao/")
+def prontidao():
+    """
+    Informa se o aquecimento da aplicação foi concluído.
+    
+    Returns:
+        Estado do aquecimento (200 quando pronto, 503 enquanto ainda aquece)
+    """
+    estado = obter_estado_prontidao()
+    return JSONResponse(content=estado, status_code=200 if estado["pronto"] else 503)
+
+@app.get("/metricas/")
+def metricas():
+    """
+    Retorna as métricas internas da aplicação.
+    
+    Returns:
+        Dicionário com as métricas de cada componente registrado
+    """
+    return coletar_metricas()
+
+@app.get("/procedimentos/{codigo}")
+async def obter_procedimento(codigo: str, fields: Optional[str] = None):
+    """
+    Consulta um procedimento no catálogo em memória.
+    
+    Args:
+        codigo: Código SIGTAP (com ou sem pontuação e zeros à esquerda)
+        fields: Campos da resposta, separados por vírgula (opcional)
+        
+    Returns:
+        Código, nome, descrição e valores do procedimento
+    """
+    procedimento = procedimento_por_codigo(codigo)
+    if procedimento is None:
+        raise HTTPException(status_code=404, detail=f"Procedimento {codigo} não encontrado no catálogo")
+    return resposta_json(procedimento, fields)
+
+@app.post("/procedimentos/consulta/")
+async def consultar_procedimentos(data: ConsultaProcedimentosInput, fields: Optional[str] = None):
+    """
+    Consulta em lote ao catálogo em memória, por códigos e por nomes.
+    
+    Args:
+        data: Listas de códigos e de nomes a consultar
+        fields: Campos da resposta, separados por vírgula (opcional)
+        
+    Returns:
+        Dicionários "por_codigo" e "por_nome" (valor null quando não encontrado)
+    """
+    indice = obter_indice_catalogo()
+    return resposta_json({
+        "por_codigo": indice.por_codigos(data.codigos),
+        "por_nome": indice.por_nomes(data.nomes),
+    }, fields)
+
 @app.post("/extrair_procedimentos/")
-async def extrair_procedimentos(data: InputData):
+async def extrair_procedimentos(data: InputData, fields: Optional[str] = None):
     """
     Extrai procedimentos médicos de um texto.
     
     Args:
         data: Objeto contendo o texto a ser processado
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         Os procedimentos extraídos
     """
     try:
         texto = data.text if hasattr(data, 'text') else str(data)
-        logger.info(f"Recebida solicitação para extrair procedimentos. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para extrair procedimentos. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         
-        resultado = executar_chain_extracao(texto)
-        return resultado
+        resultado = await asyncio.to_thread(executar_chain_extracao, texto)
+        return resposta_json(resultado, fields)
     except Exception as e:
-        logger.error(f"Erro ao extrair procedimentos: {str(e)}")
+        logger.error("Erro ao extrair procedimentos: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
 
 
 @app.post("/buscar_documentos_similares/")
-async def buscar_documentos_similares(data: BuscaDocumentosInput):
+async def buscar_documentos_similares(data: BuscaDocumentosInput, fields: Optional[str] = None):
     """
     Busca documentos similares no vector store usando embeddings.
     
     Args:
         data: Objeto contendo os procedimentos verificados e opcionalmente o número de documentos a retornar
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         Lista de documentos similares encontrados
@@ -83,21 +184,22 @@ async def buscar_documentos_similares(data: BuscaDocumentosInput):
         procedimentos_verificados = data.procedimentos_verificados
         match_count = data.match_count
         
-        logger.info(f"Recebida solicitação para buscar documentos similares. Procedimentos: {len(procedimentos_verificados)}")
+        logger.info("Recebida solicitação para buscar documentos similares. Procedimentos: {procedimentos}", procedimentos=len(procedimentos_verificados))
         
-        resultado = executar_busca_documentos(procedimentos_verificados, match_count)
-        return {"documentos_similares": resultado}
+        resultado = await asyncio.to_thread(executar_busca_documentos, procedimentos_verificados, match_count)
+        return resposta_json({"documentos_similares": resultado}, fields)
     except Exception as e:
-        logger.error(f"Erro ao buscar documentos similares: {str(e)}")
+        logger.error("Erro ao buscar documentos similares: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
 
 @app.post("/decodificar_procedimentos/")
-async def decodificar_procedimentos(data: DecodificacaoInput):
+async def decodificar_procedimentos(data: DecodificacaoInput, fields: Optional[str] = None):
     """
     Decodifica procedimentos verificados usando documentos similares como referência.
     
     Args:
         data: Objeto contendo os procedimentos verificados e opcionalmente os documentos similares
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         O resultado da decodificação
@@ -106,17 +208,17 @@ async def decodificar_procedimentos(data: DecodificacaoInput):
         procedimentos_verificados = data.procedimentos_verificados
         documentos_similares = data.documentos_similares
         
-        logger.info(f"Recebida solicitação para decodificar procedimentos. Procedimentos: {len(procedimentos_verificados)}")
-        logger.info(f"Documentos similares fornecidos: {documentos_similares is not None}")
+        logger.info("Recebida solicitação para decodificar procedimentos. Procedimentos: {procedimentos}", procedimentos=len(procedimentos_verificados))
+        logger.info("Documentos similares fornecidos: {fornecidos}", fornecidos=documentos_similares is not None)
         
-        resultado = executar_chain_decodificacao(procedimentos_verificados, documentos_similares)
-        return resultado
+        resultado = await asyncio.to_thread(executar_chain_decodificacao, procedimentos_verificados, documentos_similares)
+        return resposta_json({**resultado.model_dump(), "valores_catalogo": valores_decodificacao(resultado)}, fields)
     except Exception as e:
-        logger.error(f"Erro ao decodificar procedimentos: {str(e)}")
+        logger.error("Erro ao decodificar procedimentos: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
 
 @app.post("/fluxo_completo/")
-async def fluxo_completo(data: InputData):
+async def fluxo_completo(data: InputData, fields: Optional[str] = None):
     """
     Executa o fluxo completo de processamento de procedimentos médicos.
     
@@ -128,45 +230,47 @@ async def fluxo_completo(data: InputData):
     
     Args:
         data: Objeto contendo o texto a ser processado
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         O resultado final do processamento
     """
     try:
         texto = data.text if hasattr(data, 'text') else str(data)
-        logger.info(f"Recebida solicitação para processamento completo. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para processamento completo. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         
-        resultado = executar_chain_completa(texto)
-        return resultado
+        resultado = await asyncio.to_thread(executar_chain_completa, texto)
+        return resposta_json({**resultado.model_dump(), "valores_catalogo": valores_decodificacao(resultado)}, fields)
     except Exception as e:
-        logger.error(f"Erro ao executar fluxo completo: {str(e)}")
+        logger.error("Erro ao executar fluxo completo: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
     
     
 @app.post("/identificar_peca_anatomica/")
-async def identificar_peca_anatomica(data: InputData):
+async def identificar_peca_anatomica(data: InputData, fields: Optional[str] = None):
     """
     Identifica se houve retirada de peça anatômica do paciente.
     
     Args:
         data: Objeto contendo o texto a ser processado
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         O resultado da identificação de peça anatômica (apenas booleano e justificativa)
     """
     try:
         texto = data.text if hasattr(data, 'text') else str(data)
-        logger.info(f"Recebida solicitação para identificar peça anatômica. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para identificar peça anatômica. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         
-        resultado = executar_chain_identificacao_peca(texto)
-        return resultado
+        resultado = await asyncio.to_thread(executar_chain_identificacao_peca, texto)
+        return resposta_json(resultado, fields)
     except Exception as e:
-        logger.error(f"Erro ao identificar peça anatômica: {str(e)}")
+        logger.error("Erro ao identificar peça anatômica: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
 
     
 @app.post("/processar_com_laudo/")
-async def processar_com_laudo(data: InputDataComLaudo):
+async def processar_com_laudo(data: InputDataComLaudo, fields: Optional[str] = None):
     """
     Processa a descrição cirúrgica e o laudo anatomopatológico, decidindo o fluxo apropriado.
     
@@ -175,6 +279,7 @@ async def processar_com_laudo(data: InputDataComLaudo):
     
     Args:
         data: Objeto contendo o texto da descrição cirúrgica e opcionalmente o laudo anatomopatológico
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         Resultado do processamento, incluindo procedimentos corrigidos e complementados
@@ -183,18 +288,96 @@ async def processar_com_laudo(data: InputDataComLaudo):
         texto = data.text
         laudo = data.laudo
         
-        logger.info(f"Recebida solicitação para processar com laudo. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para processar com laudo. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         if laudo:
-            logger.info(f"Laudo fornecido. Tamanho do laudo: {len(laudo)} caracteres")
+            logger.info("Laudo fornecido. Tamanho do laudo: {caracteres_laudo} caracteres", caracteres_laudo=len(laudo))
         else:
             logger.info("Laudo não fornecido, será usado fluxo sem peça anatômica")
         
-        resultado = processar_texto_e_decidir_fluxo(texto, laudo)
-        return resultado
+        resultado = await asyncio.to_thread(
+            processar_texto_e_decidir_fluxo, texto, laudo, data.prazo_segundos, data.caso_id
+        )
+        return resposta_json(resultado, fields)
     except Exception as e:
-        logger.error(f"Erro ao processar com laudo: {str(e)}")
+        logger.error("Erro ao processar com laudo: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
     
+@app.post("/jobs/processar_com_laudo/", status_code=202)
+async def enfileirar_processar_com_laudo(data: InputDataComLaudo):
+    """
+    Enfileira um caso para processamento assíncrono pelos trabalhadores.
+    
+    O processamento é o mesmo de /processar_com_laudo/, mas a conexão não fica
+    aberta: o cliente recebe o id do job e consulta o resultado em /jobs/{job_id}.
+    
+    Args:
+        data: Objeto contendo o texto da descrição cirúrgica e opcionalmente o laudo anatomopatológico
+        
+    Returns:
+        O id do job criado
+    """
+    try:
+        job_id = obter_fila_jobs().enfileirar("processar_com_laudo", {
+            "text": data.text,
+            "laudo": data.laudo,
+            "prazo_segundos": data.prazo_segundos,
+            "caso_id": data.caso_id
+        })
+        logger.info("Job {job_id} enfileirado. Tamanho do texto: {caracteres} caracteres", job_id=job_id, caracteres=len(data.text))
+        return {"job_id": job_id, "status": "pendente"}
+    except Exception as e:
+        logger.error("Erro ao enfileirar job: {erro}", erro=e)
+        raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
+
+@app.post("/jobs/lote/", status_code=202)
+async def enfileirar_lote(data: InputLote):
+    """
+    Enfileira um lote de casos para processamento assíncrono.
+    
+    Casos duplicados ou quase duplicados (mesma descrição de modelo com nomes e
+    datas trocados) são processados uma única vez; o resultado do job traz um
+    resultado por caso e o relatório de reaproveitamento.
+    
+    Args:
+        data: Casos do lote e limiar de similaridade para quase-duplicatas
+        
+    Returns:
+        O id do job criado
+    """
+    try:
+        job_id = obter_fila_jobs().enfileirar("processar_lote", {
+            "casos": [caso.model_dump() for caso in data.casos],
+            "limiar": data.limiar
+        })
+        logger.info("Job de lote {job_id} enfileirado com {casos} casos", job_id=job_id, casos=len(data.casos))
+        return {"job_id": job_id, "status": "pendente"}
+    except Exception as e:
+        logger.error("Erro ao enfileirar lote: {erro}", erro=e)
+        raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(job_id: str, aguardar: float = 0, fields: Optional[str] = None):
+    """
+    Consulta o estado e o resultado de um job.
+    
+    Args:
+        job_id: Id retornado na criação do job
+        aguardar: Segundos para aguardar a conclusão do job antes de responder (long-poll, máximo 60)
+        fields: Campos da resposta, separados por vírgula (opcional)
+        
+    Returns:
+        Status, número de tentativas, resultado (se concluído) e erro (se houver)
+    """
+    fila = obter_fila_jobs()
+    limite = asyncio.get_running_loop().time() + min(max(aguardar, 0), 60)
+    while True:
+        job = fila.obter(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} não encontrado")
+        if job["status"] in (CONCLUIDO, FALHOU) or asyncio.get_running_loop().time() >= limite:
+            return resposta_json(job, fields)
+        await asyncio.sleep(0.5)
+
 @app.post("/verificar_entrada_por_trauma/")
 async def verificar_entrada_por_trauma(data: InputData):
     """
@@ -208,10 +391,10 @@ async def verificar_entrada_por_trauma(data: InputData):
     """
     try:
         texto = data.text if hasattr(data, 'text') else str(data)
-        logger.info(f"Recebida solicitação para verificar entrada por trauma. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para verificar entrada por trauma. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         
         # Executar a verificação
-        resultado = executar_verificacao_trauma(texto)
+        resultado = await asyncio.to_thread(executar_verificacao_trauma, texto)
         
         # Se o resultado for um objeto com atributos, retornar como dicionário
         if hasattr(resultado, 'entrada_por_trauma') and hasattr(resultado, 'justificativa'):
@@ -230,7 +413,7 @@ async def verificar_entrada_por_trauma(data: InputData):
             return resultado
             
     except Exception as e:
-        logger.error(f"Erro ao verificar entrada por trauma: {str(e)}")
+        logger.error("Erro ao verificar entrada por trauma: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
 
 
@@ -247,10 +430,10 @@ async def verificar_mesma_doenca(data: BuscaDocumentosInput):
     """
     try:
         procedimentos = data.procedimentos_verificados
-        logger.info(f"Recebida solicitação para verificar mesma doença. Procedimentos: {len(procedimentos)}")
+        logger.info("Recebida solicitação para verificar mesma doença. Procedimentos: {procedimentos}", procedimentos=len(procedimentos))
         
         # Executar a verificação
-        resultado = executar_verificacao_mesma_doenca(procedimentos)
+        resultado = await asyncio.to_thread(executar_verificacao_mesma_doenca, procedimentos)
         
         # Se o resultado for um objeto com atributos, retornar como dicionário
         if hasattr(resultado, 'mesma_doenca') and hasattr(resultado, 'justificativa'):
@@ -269,11 +452,11 @@ async def verificar_mesma_doenca(data: BuscaDocumentosInput):
             return {"mesma_doenca": resultado}
             
     except Exception as e:
-        logger.error(f"Erro ao verificar mesma doença: {str(e)}")
+        logger.error("Erro ao verificar mesma doença: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
     
 @app.post("/classificacao_final/")
-async def classificacao_final(data: InputData):
+async def classificacao_final(data: InputData, fields: Optional[str] = None):
     """
     Executa o fluxo completo e retorna a classificação final dos procedimentos.
     
@@ -285,29 +468,31 @@ async def classificacao_final(data: InputData):
     
     Args:
         data: Objeto contendo o texto a ser processado
+        fields: Campos da resposta, separados por vírgula (opcional)
         
     Returns:
         A classificação final e sua justificativa
     """
     try:
         texto = data.text if hasattr(data, 'text') else str(data)
-        logger.info(f"Recebida solicitação para classificação final. Tamanho do texto: {len(texto)} caracteres")
+        logger.info("Recebida solicitação para classificação final. Tamanho do texto: {caracteres} caracteres", caracteres=len(texto))
         
         # Importar a função de processamento completo
         from src.flows.process_fluxo import processar_texto_e_decidir_fluxo
         
         # Executar o processamento completo
-        resultado = processar_texto_e_decidir_fluxo(texto)
+        resultado = await asyncio.to_thread(processar_texto_e_decidir_fluxo, texto, prazo_segundos=data.prazo_segundos)
         
         # Extrair apenas as informações relevantes para a resposta
         resposta = {
             "classificacao_final": resultado.get("classificacao_final", "não_classificado"),
             "justificativa": resultado.get("justificativa_classificacao", "Não foi possível determinar uma justificativa."),
-            "detalhes": resultado.get("detalhes_classificacao", {})
+            "detalhes": resultado.get("detalhes_classificacao", {}),
+            "etapas_degradadas": resultado.get("etapas_degradadas", [])
         }
         
-        return resposta
+        return resposta_json(resposta, fields)
             
     except Exception as e:
-        logger.error(f"Erro ao executar classificação final: {str(e)}")
+        logger.error("Erro ao executar classificação final: {erro}", erro=e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a solicitação: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Serialização rápida das respostas da API e projeção de campos.
+
+Os resultados dos fluxos são dicionários com objetos pydantic aninhados. Pelo
+caminho padrão do FastAPI, eles passam pelo jsonable_encoder (que percorre e
+copia toda a estrutura) e depois pelo json da biblioteca padrão. Aqui a resposta
+é serializada direto com o orjson, que converte os modelos pelo `default` e os
+arrays do NumPy nativamente; sem o orjson instalado, usa o json da biblioteca padrão.
+
+O parâmetro de consulta `fields` restringe a resposta aos campos pedidos, com
+caminhos separados por vírgula e níveis separados por ponto, por exemplo
+`fields=classificacao_final,decodificacao.codigo_procedimentos`. Em listas, o
+caminho vale para cada item. Campos inexistentes são omitidos. Só os campos
+projetados dos modelos pydantic são convertidos.
+"""
+import json
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _padrao(obj):
+    """Converte os tipos que o serializador não conhece."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+def serializar(dados) -> bytes:
+    """Serializa os dados em JSON (UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(dados, default=_padrao, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(dados, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def arvore_campos(campos):
+    """
+    Converte "a,b.c,b.d" em {"a": None, "b": {"c": None, "d": None}} (None = o campo inteiro).
+
+    Returns:
+        A árvore dos campos, ou None se nenhum campo foi informado
+    """
+    if not campos:
+        return None
+    arvore = {}
+    for caminho in campos.split(","):
+        partes = [parte.strip() for parte in caminho.split(".") if parte.strip()]
+        if not partes:
+            continue
+        no = arvore
+        for parte in partes[:-1]:
+            if parte in no and no[parte] is None:
+                break  # um prefixo já pede o campo inteiro
+            no = no.setdefault(parte, {})
+        else:
+            no[partes[-1]] = None
+    return arvore or None
+
+
+def projetar(valor, arvore):
+    """
+    Mantém em `valor` apenas os campos da árvore (ver arvore_campos).
+
+    Args:
+        valor: Dicionário, modelo pydantic ou lista deles
+        arvore: Árvore dos campos (None = o valor inteiro)
+
+    Returns:
+        O valor projetado (modelos pydantic viram dicionários só com os campos pedidos)
+    """
+    if arvore is None:
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return [projetar(item, arvore) for item in valor]
+    if isinstance(valor, BaseModel):
+        campos_modelo = type(valor).model_fields
+        return {campo: projetar(getattr(valor, campo), sub) for campo, sub in arvore.items() if campo in campos_modelo}
+    if isinstance(valor, dict):
+        return {campo: projetar(valor[campo], sub) for campo, sub in arvore.items() if campo in valor}
+    return valor
+
+
+class RespostaJSONRapida(JSONResponse):
+    """JSONResponse serializada com o orjson (ou o json padrão, sem ele)."""
+
+    def render(self, content) -> bytes:
+        return serializar(content)
+
+
+def resposta_json(dados, fields=None, status_code=200):
+    """
+    Cria a resposta JSON dos dados, projetados nos campos pedidos.
+
+    Retornar a resposta pronta evita o jsonable_encoder do FastAPI.
+
+    Args:
+        dados: Conteúdo da resposta
+        fields: Campos pedidos (parâmetro de consulta `fields`), ou None para todos
+        status_code: Código HTTP da resposta
+    """
+    return RespostaJSONRapida(content=projetar(dados, arvore_campos(fields)), status_code=status_code)
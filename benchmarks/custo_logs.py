@@ -0,0 +1,166 @@
+"""
+Custo do logging por caso no fluxo completo (processar_texto_e_decidir_fluxo).
+
+As chains de LLM são substituídas por respostas fixas, os limites do agendador
+são removidos e a recuperação usa o índice local com os embeddings do catálogo
+(RECUPERACAO_BACKEND=local), de modo que o tempo medido é só o do código da
+aplicação, sem rede. Para cada configuração de log, mede o tempo médio por caso e
+o compara ao tempo sem nenhum sink (o custo do logging), além do número de linhas
+gravadas por caso e do tempo para esvaziar a fila do sink assíncrono no fim.
+
+Configurações:
+- sem_logs: nenhum sink (referência);
+- padrao_loguru: o sink padrão do loguru (DEBUG, síncrono), o comportamento sem src/logs.py;
+- enqueue_loguru: INFO com o enqueue=True do loguru;
+- info_sincrono / info_assincrono / json_assincrono / warning: configurar_logs com
+  LOG_NIVEL, LOG_ASSINCRONO e LOG_FORMATO correspondentes.
+
+Os sinks gravam em arquivos temporários, para medir o I/O sem depender do terminal.
+
+Uso:
+    python benchmarks/custo_logs.py [--casos 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RECUPERACAO_BACKEND"] = "local"
+# Sem chamadas reais, os limites de RPM/TPM do agendador só atrasariam os casos
+for variavel in ("AGENDADOR_LLM_RPM", "AGENDADOR_LLM_TPM", "AGENDADOR_EMBEDDING_RPM", "AGENDADOR_EMBEDDING_TPM"):
+    os.environ[variavel] = str(10 ** 9)
+
+from loguru import logger
+import src.flows.fluxo_chain as fluxo_chain
+from schemas.modelos_para_agentes import (
+    Decodificacao,
+    IdentificacaoPecaAnatomica,
+    Procedimento,
+    ProcedimentoExtracao,
+    VerificacaoMesmaDoenca,
+    VerificacaoTrauma,
+)
+from src.flows.process_fluxo import processar_texto_e_decidir_fluxo
+from src.indice_local import obter_indice_local
+from src.logs import configurar_logs
+from src.registro_prompts import obter_registro_prompts
+
+TEXTO = (
+    "Paciente submetido a colecistectomia videolaparoscópica por colelitíase sintomática "
+    "e herniorrafia umbilical no mesmo ato. Sem intercorrências. "
+) * 6
+
+CONFIGURACOES = {
+    "info_sincrono": {"LOG_NIVEL": "INFO", "LOG_ASSINCRONO": "false", "LOG_FORMATO": "texto"},
+    "info_assincrono": {"LOG_NIVEL": "INFO", "LOG_ASSINCRONO": "true", "LOG_FORMATO": "texto"},
+    "json_assincrono": {"LOG_NIVEL": "INFO", "LOG_ASSINCRONO": "true", "LOG_FORMATO": "json"},
+    "warning": {"LOG_NIVEL": "WARNING", "LOG_ASSINCRONO": "false", "LOG_FORMATO": "texto"},
+}
+
+
+class ChainLocal:
+    """Chain com resposta fixa, no lugar da chamada ao LLM."""
+
+    def __init__(self, resultado):
+        self.resultado = resultado
+
+    def invoke(self, entradas):
+        return self.resultado
+
+
+def instalar_processador_local():
+    procedimentos = [
+        Procedimento(procedimento="colecistectomia videolaparoscópica", descricao="retirada da vesícula biliar"),
+        Procedimento(procedimento="herniorrafia umbilical", descricao="correção de hérnia umbilical"),
+    ]
+    processador = fluxo_chain.ProcessadorProcedimentos.__new__(fluxo_chain.ProcessadorProcedimentos)
+    registro = obter_registro_prompts()
+    for atributo, nome in fluxo_chain.PROMPTS_PROCESSADOR.items():
+        setattr(processador, atributo, registro.obter(nome))
+    processador.hashes_prompts = {nome: registro.hash(nome) for nome in fluxo_chain.PROMPTS_PROCESSADOR.values()}
+    processador.extrator = ChainLocal(ProcedimentoExtracao(procedimentos_identificados=procedimentos))
+    processador.decodificador = ChainLocal(Decodificacao(
+        nome_procedimentos=procedimentos[0], codigo_procedimentos="0407030034", tratar_cancer=False
+    ))
+    processador.identificador_peca = ChainLocal(IdentificacaoPecaAnatomica(retirada_peca_anatomica=False, justificativa="-"))
+    processador.verificador_trauma = ChainLocal(VerificacaoTrauma(entrada_por_trauma=False, justificativa="-"))
+    processador.verificador_mesma_doenca = ChainLocal(VerificacaoMesmaDoenca(mesma_doenca=False, justificativa="-"))
+
+    matriz = obter_indice_local().matriz_rerank
+    processador.gerar_embeddings = lambda textos: [matriz[i % len(matriz)] for i in range(len(textos))]
+    processador.gerar_embedding = lambda texto: matriz[0]
+    fluxo_chain._processadores[("gpt-4o-mini", 0)] = processador
+
+
+def medir(casos):
+    duracoes = []
+    for _ in range(casos):
+        inicio = time.perf_counter()
+        processar_texto_e_decidir_fluxo(TEXTO)
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+    # Remover o sink espera a gravação das mensagens pendentes
+    inicio = time.perf_counter()
+    logger.remove()
+    return statistics.mean(duracoes), (time.perf_counter() - inicio) * 1000
+
+
+def linhas(caminho):
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        return sum(1 for _ in arquivo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo do logging por caso")
+    parser.add_argument("--casos", type=int, default=300)
+    args = parser.parse_args()
+
+    instalar_processador_local()
+    logger.remove()
+    processar_texto_e_decidir_fluxo(TEXTO)  # aquecimento (catálogo, índice, grafo)
+
+    resumo = {"casos": args.casos}
+    referencia, _ = medir(args.casos)
+    resumo["sem_logs"] = {"ms_por_caso": round(referencia, 3)}
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "padrao.log")
+        logger.add(caminho, level="DEBUG")
+        media, _ = medir(args.casos)
+        resumo["padrao_loguru"] = {
+            "ms_por_caso": round(media, 3),
+            "custo_ms_por_caso": round(media - referencia, 3),
+            "linhas_por_caso": round(linhas(caminho) / args.casos, 1),
+        }
+
+        # enqueue=True do loguru (pickle de cada registro), para comparar com o SinkAssincrono
+        caminho = os.path.join(diretorio, "enqueue.log")
+        logger.add(caminho, level="INFO", enqueue=True)
+        media, esvaziamento = medir(args.casos)
+        resumo["enqueue_loguru"] = {
+            "ms_por_caso": round(media, 3),
+            "custo_ms_por_caso": round(media - referencia, 3),
+            "esvaziamento_fila_ms": round(esvaziamento, 1),
+            "linhas_por_caso": round(linhas(caminho) / args.casos, 1),
+        }
+
+        for nome, variaveis in CONFIGURACOES.items():
+            caminho = os.path.join(diretorio, f"{nome}.log")
+            os.environ.update(variaveis, LOG_ARQUIVO=caminho)
+            configurar_logs(forcar=True)
+            media, esvaziamento = medir(args.casos)
+            resumo[nome] = {
+                "ms_por_caso": round(media, 3),
+                "custo_ms_por_caso": round(media - referencia, 3),
+                "esvaziamento_fila_ms": round(esvaziamento, 1),
+                "linhas_por_caso": round(linhas(caminho) / args.casos, 1),
+            }
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Alocação e vazão do caminho dos embeddings: listas de floats contra float32.
+
+Simula o corpo JSON de uma resposta da API de embeddings com N vetores e mede,
+para cada representação, o caminho da resposta até o payload da RPC:
+- lista_float: encoding_format="float" (listas de floats no JSON);
+- sdk_padrao: o padrão do SDK da OpenAI (base64 convertido em lista de floats),
+  que era o caminho anterior de gerar_embedding(s);
+- float32_base64: encoding_format="base64" decodificado em float32
+  (src/vetores.py), com o literal do pgvector no payload.
+
+Para cada um: tempo por lote, pico de alocação e memória retida pelos embeddings
+(tracemalloc) e tamanho do payload JSON da RPC. A construção dos modelos do SDK
+não entra na medição (é a mesma nos três caminhos).
+
+Uso:
+    python benchmarks/embeddings_float32.py [--vetores 8] [--dimensao 1536] [--repeticoes 50]
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from src.vetores import literal_vetor, matriz_embeddings
+
+
+def corpo_resposta(vetores, formato):
+    dados = [
+        {"object": "embedding", "index": i,
+         "embedding": base64.b64encode(vetor.tobytes()).decode() if formato == "base64" else vetor.tolist()}
+        for i, vetor in enumerate(vetores)
+    ]
+    return json.dumps({"object": "list", "data": dados, "model": "text-embedding-3-small"})
+
+
+def itens(corpo):
+    return [SimpleNamespace(**item) for item in json.loads(corpo)["data"]]
+
+
+def lista_float(corpo):
+    embeddings = [item.embedding for item in sorted(itens(corpo), key=lambda item: item.index)]
+    return embeddings, json.dumps({"query_embeddings": embeddings, "match_count": 8})
+
+
+def sdk_padrao(corpo):
+    embeddings = [
+        np.frombuffer(base64.b64decode(item.embedding), dtype="float32").tolist()
+        for item in sorted(itens(corpo), key=lambda item: item.index)
+    ]
+    return embeddings, json.dumps({"query_embeddings": embeddings, "match_count": 8})
+
+
+def float32_base64(corpo):
+    embeddings = matriz_embeddings(itens(corpo))
+    return embeddings, json.dumps({"query_embeddings": [literal_vetor(e) for e in embeddings], "match_count": 8})
+
+
+def medir(caminho, corpo, repeticoes):
+    caminho(corpo)
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        caminho(corpo)
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    embeddings, payload = caminho(corpo)
+    retidos_com_payload, pico = tracemalloc.get_traced_memory()
+    del payload
+    retidos, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del embeddings
+    return {
+        "media_ms": round(statistics.mean(duracoes), 3),
+        "p50_ms": round(statistics.median(duracoes), 3),
+        "pico_alocacao_kb": round(pico / 1024, 1),
+        "retido_embeddings_kb": round(retidos / 1024, 1),
+        "payload_rpc_kb": round(len(caminho(corpo)[1]) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alocação e vazão dos embeddings em lista e em float32")
+    parser.add_argument("--vetores", type=int, default=8)
+    parser.add_argument("--dimensao", type=int, default=1536)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    gerador = np.random.default_rng(0)
+    vetores = gerador.standard_normal((args.vetores, args.dimensao)).astype(np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    corpo_float = corpo_resposta(vetores, "float")
+    corpo_base64 = corpo_resposta(vetores, "base64")
+
+    resumo = {
+        "vetores": args.vetores,
+        "dimensao": args.dimensao,
+        "resposta_api_kb": {"float": round(len(corpo_float) / 1024, 1), "base64": round(len(corpo_base64) / 1024, 1)},
+        "lista_float": medir(lista_float, corpo_float, args.repeticoes),
+        "sdk_padrao": medir(sdk_padrao, corpo_base64, args.repeticoes),
+        "float32_base64": medir(float32_base64, corpo_base64, args.repeticoes),
+    }
+    # O literal do pgvector deve reproduzir exatamente os float32
+    literais = [literal_vetor(v) for v in vetores]
+    resumo["literal_exato"] = bool(all(
+        np.array_equal(np.array(literal[1:-1].split(","), dtype=np.float32), vetor)
+        for literal, vetor in zip(literais, vetores)
+    ))
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 0 if resumo["literal_exato"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Extração seguida da recuperação, com e sem a extração em streaming.
+
+O LLM é simulado por uma chain que gera o JSON do ProcedimentoExtracao em
+pedaços, com um atraso fixo por pedaço (a velocidade de geração), e a API de
+embeddings por uma espera fixa por chamada; as consultas vão ao índice local
+(RECUPERACAO_BACKEND=local). Para cada caso, mede o tempo até a extração e até
+os documentos de todos os procedimentos estarem disponíveis para a decodificação
+(buscar_documentos_similares), dentro de um ContextoRecuperacao, como no fluxo:
+- sem_streaming: a recuperação começa depois do ProcedimentoExtracao inteiro
+  (um lote de embeddings com todos os procedimentos);
+- streaming: EXTRACAO_STREAMING=true; a recuperação de cada procedimento começa
+  quando o seu nome fecha no JSON, enquanto a descrição e os procedimentos
+  seguintes ainda são gerados.
+
+Uso:
+    python benchmarks/extracao_streaming.py [--procedimentos 4] [--ms-por-pedaco 15]
+        [--caracteres-por-pedaco 4] [--latencia-embedding-ms 150] [--casos 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RECUPERACAO_BACKEND"] = "local"
+# Sem chamadas reais, os limites de RPM/TPM do agendador só atrasariam os casos
+for variavel in ("AGENDADOR_LLM_RPM", "AGENDADOR_LLM_TPM", "AGENDADOR_EMBEDDING_RPM", "AGENDADOR_EMBEDDING_TPM"):
+    os.environ[variavel] = str(10 ** 9)
+
+from langchain_core.messages import AIMessageChunk
+from loguru import logger
+import src.flows.fluxo_chain as fluxo_chain
+from schemas.modelos_para_agentes import Procedimento, ProcedimentoExtracao
+from src.indice_local import obter_indice_local
+from src.recuperacao import com_contexto_recuperacao
+from src.registro_prompts import obter_registro_prompts
+
+NOMES = [
+    "colecistectomia videolaparoscópica",
+    "herniorrafia umbilical",
+    "apendicectomia",
+    "drenagem de abscesso",
+    "biópsia hepática",
+    "lise de aderências",
+]
+
+DESCRICAO = "Procedimento realizado conforme a descrição cirúrgica, sem intercorrências"
+
+
+class ChainGeracaoSimulada:
+    """Gera o JSON da extração em pedaços, com atraso por pedaço."""
+
+    def __init__(self, extracao, segundos_por_pedaco, caracteres_por_pedaco):
+        self.extracao = extracao
+        texto = extracao.model_dump_json()
+        self.pedacos = [texto[i:i + caracteres_por_pedaco] for i in range(0, len(texto), caracteres_por_pedaco)]
+        self.segundos_por_pedaco = segundos_por_pedaco
+
+    def stream(self, entradas):
+        for pedaco in self.pedacos:
+            time.sleep(self.segundos_por_pedaco)
+            yield AIMessageChunk(content=pedaco)
+
+    def invoke(self, entradas):
+        time.sleep(self.segundos_por_pedaco * len(self.pedacos))
+        return self.extracao
+
+
+def instalar_processador(procedimentos, segundos_por_pedaco, caracteres_por_pedaco, latencia_embedding):
+    extracao = ProcedimentoExtracao(procedimentos_identificados=[
+        Procedimento(procedimento=NOMES[i % len(NOMES)] + ("" if i < len(NOMES) else f" {i}"), descricao=DESCRICAO)
+        for i in range(procedimentos)
+    ])
+    processador = fluxo_chain.ProcessadorProcedimentos.__new__(fluxo_chain.ProcessadorProcedimentos)
+    registro = obter_registro_prompts()
+    for atributo, nome in fluxo_chain.PROMPTS_PROCESSADOR.items():
+        setattr(processador, atributo, registro.obter(nome))
+    processador.hashes_prompts = {nome: registro.hash(nome) for nome in fluxo_chain.PROMPTS_PROCESSADOR.values()}
+    chain = ChainGeracaoSimulada(extracao, segundos_por_pedaco, caracteres_por_pedaco)
+    processador.extrator = chain
+    processador.extrator_streaming = chain
+
+    matriz = obter_indice_local().matriz_rerank
+
+    def gerar_embeddings(textos):
+        time.sleep(latencia_embedding)
+        return [matriz[hash(texto) % len(matriz)] for texto in textos]
+
+    processador.gerar_embeddings = gerar_embeddings
+    return processador, len(chain.pedacos)
+
+
+def medir_caso(processador, streaming):
+    os.environ["EXTRACAO_STREAMING"] = "true" if streaming else "false"
+    with com_contexto_recuperacao() as recuperacao:
+        inicio = time.perf_counter()
+        extracao = processador.extrair_procedimentos("descrição cirúrgica")
+        fim_extracao = time.perf_counter()
+        documentos = processador.buscar_documentos_similares(extracao.procedimentos_identificados)
+        fim = time.perf_counter()
+    return (fim_extracao - inicio) * 1000, (fim - inicio) * 1000, len(documentos), recuperacao.resumo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extração e recuperação com e sem streaming")
+    parser.add_argument("--procedimentos", type=int, default=4)
+    parser.add_argument("--ms-por-pedaco", type=float, default=15)
+    parser.add_argument("--caracteres-por-pedaco", type=int, default=4)
+    parser.add_argument("--latencia-embedding-ms", type=float, default=150)
+    parser.add_argument("--casos", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    processador, pedacos = instalar_processador(
+        args.procedimentos, args.ms_por_pedaco / 1000, args.caracteres_por_pedaco, args.latencia_embedding_ms / 1000
+    )
+    obter_indice_local()
+
+    resumo = {"procedimentos": args.procedimentos, "pedacos_gerados": pedacos,
+              "geracao_ms": round(pedacos * args.ms_por_pedaco, 1)}
+    for nome, streaming in (("sem_streaming", False), ("streaming", True)):
+        medicoes = [medir_caso(processador, streaming) for _ in range(args.casos)]
+        resumo[nome] = {
+            "extracao_ms": round(statistics.mean(m[0] for m in medicoes), 1),
+            "ate_documentos_ms": round(statistics.mean(m[1] for m in medicoes), 1),
+            "documentos": medicoes[-1][2],
+            "recuperacao": medicoes[-1][3],
+        }
+    resumo["reducao_ms"] = round(resumo["sem_streaming"]["ate_documentos_ms"] - resumo["streaming"]["ate_documentos_ms"], 1)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Curva memória x latência x recall do índice local (src/indice_local.py).
+
+Para cada combinação de dimensão da busca e quantização, mede a memória por
+vetor, a latência por consulta e o recall@k em relação à busca exata em float32
+com todas as dimensões. Com --rerank-mmap, a matriz de re-rank é mapeada de um
+arquivo temporário, como no índice do serviço, e não entra na memória residente.
+
+Catálogo: os embeddings do armazém local ou do CSV; com --sintetico N, um
+catálogo aleatório de N vetores (útil para latência e memória em escala; o
+recall só é representativo com embeddings reais, que concentram a informação nas
+primeiras dimensões).
+
+Consultas: com --textos (arquivo com um texto por linha), os embeddings desses
+textos (requer a OpenAI); senão, vetores do catálogo com ruído gaussiano.
+
+Uso:
+    python benchmarks/indice_local.py [--dimensoes 128,256,512,0] [--dimensao-rerank 0] [--fator-rerank 4] [--rerank-mmap]
+        [--k 8] [--consultas 200] [--ruido 0.2] [--sintetico 5000] [--textos consultas.txt]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from src.indice_local import IndiceVetorialLocal, carregar_embeddings_catalogo, reduzir
+
+
+def catalogo_sintetico(n, dimensao=1536, semente=0):
+    gerador = np.random.default_rng(semente)
+    # Variância decrescente por dimensão, como nos embeddings encurtáveis
+    escala = 1.0 / np.sqrt(1.0 + np.arange(dimensao) / 64.0)
+    matriz = gerador.standard_normal((n, dimensao)).astype(np.float32) * escala
+    return [{"codigo_procedimento": str(i)} for i in range(n)], matriz
+
+
+def consultas_com_ruido(matriz, total, ruido, semente=1):
+    gerador = np.random.default_rng(semente)
+    base = reduzir(matriz[gerador.integers(0, len(matriz), total)], None)
+    # `ruido` é a norma do ruído em relação à do vetor (unitário)
+    return base + gerador.standard_normal(base.shape).astype(np.float32) * (ruido / np.sqrt(base.shape[1]))
+
+
+def medir(indice, consultas, k, exatos):
+    latencias, recalls = [], []
+    for consulta, esperado in zip(consultas, exatos):
+        inicio = time.perf_counter()
+        indices, _ = indice.buscar_indices(consulta, k)
+        latencias.append((time.perf_counter() - inicio) * 1e6)
+        recalls.append(len(set(indices.tolist()) & esperado) / len(esperado))
+    latencias.sort()
+    return {
+        "latencia_media_us": round(statistics.mean(latencias), 1),
+        "latencia_p95_us": round(latencias[int(0.95 * (len(latencias) - 1))], 1),
+        f"recall@{k}": round(statistics.mean(recalls), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória, latência e recall do índice local")
+    parser.add_argument("--dimensoes", default="128,256,512,0", help="Dimensões da busca (0 = todas)")
+    parser.add_argument("--dimensao-rerank", type=int, default=0, help="Dimensões do re-rank (0 = todas)")
+    parser.add_argument("--fator-rerank", type=int, default=4)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--ruido", type=float, default=0.2)
+    parser.add_argument("--sintetico", type=int, default=0, help="Tamanho de um catálogo sintético (0 = catálogo real)")
+    parser.add_argument("--textos", default=None, help="Arquivo com um texto de consulta por linha")
+    parser.add_argument("--rerank-mmap", action="store_true", help="Mapeia a matriz de re-rank de um arquivo")
+    args = parser.parse_args()
+    diretorio_rerank = tempfile.mkdtemp() if args.rerank_mmap else None
+
+    metadados, matriz = catalogo_sintetico(args.sintetico) if args.sintetico else carregar_embeddings_catalogo()
+    if args.textos:
+        from src.flows.fluxo_chain import obter_processador
+
+        with open(args.textos, "r", encoding="utf-8") as arquivo:
+            textos = [linha.strip() for linha in arquivo if linha.strip()]
+        consultas = np.asarray(obter_processador().gerar_embeddings(textos), dtype=np.float32)
+    else:
+        consultas = consultas_com_ruido(matriz, args.consultas, args.ruido)
+    k = min(args.k, len(metadados))
+    print(f"{len(metadados)} vetores de {matriz.shape[1]} dimensões, {len(consultas)} consultas, k={k}")
+
+    # Referência: busca exata em float32 com todas as dimensões
+    completa = reduzir(matriz, None)
+    exatos = [set(np.argsort(-(completa @ reduzir(q, None)))[:k].tolist()) for q in consultas]
+    referencia = IndiceVetorialLocal(metadados, matriz, dimensao=0, quantizar=False, fator_rerank=0)
+    resumo = {"dimensao": matriz.shape[1], "quantizar": False, "bytes_por_vetor": referencia.bytes_por_vetor()}
+    resumo.update(medir(referencia, consultas, k, exatos))
+    print(json.dumps({"referencia": resumo}, ensure_ascii=False))
+
+    for dimensao in [int(d) for d in args.dimensoes.split(",")]:
+        for quantizar in (False, True):
+            indice = IndiceVetorialLocal(
+                metadados, matriz, dimensao=dimensao, quantizar=quantizar,
+                dimensao_rerank=args.dimensao_rerank, fator_rerank=args.fator_rerank,
+                diretorio_rerank=diretorio_rerank,
+            )
+            resumo = {
+                "dimensao": indice.dimensao,
+                "quantizar": quantizar,
+                "dimensao_rerank": indice.dimensao_rerank if args.fator_rerank else None,
+                "bytes_por_vetor": indice.bytes_por_vetor(),
+            }
+            resumo.update(medir(indice, consultas, k, exatos))
+            print(json.dumps(resumo, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
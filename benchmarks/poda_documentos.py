@@ -0,0 +1,121 @@
+"""
+Mede o efeito da recuperação por procedimento com poda sobre o prompt da decodificação.
+
+Compara, para cada caso do arquivo:
+- "consulta_unica": o comportamento anterior (nomes concatenados em uma consulta,
+  15 documentos, sem poda nem orçamento de tokens);
+- "podado": buscar_documentos_similares (uma consulta por procedimento, RRF) e
+  formatação com poda e orçamento de tokens (RECUPERACAO_*).
+
+Reporta os tokens médios do contexto formatado, a cobertura (fração dos códigos
+esperados presentes no contexto) e, com --decodificar, a acurácia e a latência do
+decodificador em cada modo.
+
+Requer credenciais da OpenAI e do Supabase. O arquivo de casos é JSONL com
+"codigos_esperados" (lista de códigos SIGTAP) e "procedimentos" (lista de
+{"procedimento", "descricao"}) ou "text" (os procedimentos são extraídos com o extrator).
+
+Uso:
+    python benchmarks/poda_documentos.py --arquivo casos.jsonl [--decodificar] [--limite 50]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas.modelos_para_agentes import Procedimento
+from src.agendador import estimar_tokens
+from src.flows.fluxo_chain import obter_processador
+
+
+def carregar_casos(caminho, limite):
+    casos = []
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                casos.append(json.loads(linha))
+            if limite and len(casos) >= limite:
+                break
+    return casos
+
+
+def normalizar_codigo(codigo):
+    return re.sub(r"\D", "", str(codigo)).lstrip("0")
+
+
+def codigos_no_contexto(documentos):
+    return {normalizar_codigo(d.get("codigo_procedimento", "")) for d in documentos if isinstance(d, dict)}
+
+
+def documentos_consulta_unica(processador, procedimentos):
+    query = " ".join(proc.procedimento for proc in procedimentos)
+    return processador._consultar_vector_store(query, 15)
+
+
+def medir_modo(processador, casos, modo, decodificar):
+    tokens, cobertura, acertos, latencias = [], [], [], []
+    for caso in casos:
+        procedimentos = caso["procedimentos_objetos"]
+        esperados = {normalizar_codigo(codigo) for codigo in caso.get("codigos_esperados", [])}
+        if modo == "consulta_unica":
+            documentos = documentos_consulta_unica(processador, procedimentos)
+            contexto = processador.formatar_documentos_similares(documentos, podar=False)
+            presentes = codigos_no_contexto(documentos)
+        else:
+            documentos = processador.buscar_documentos_similares(procedimentos)
+            contexto = processador.formatar_documentos_similares(documentos)
+            presentes = {codigo for codigo in codigos_no_contexto(documentos) if codigo in contexto}
+        tokens.append(estimar_tokens(contexto))
+        if esperados:
+            cobertura.append(len(esperados & presentes) / len(esperados))
+        if decodificar:
+            inicio = time.perf_counter()
+            resultado = processador.decodificar_procedimentos(procedimentos, contexto)
+            latencias.append(time.perf_counter() - inicio)
+            obtidos = {normalizar_codigo(c) for c in re.split(r"[,;\s]+", str(resultado.codigo_procedimentos)) if c}
+            acertos.append(bool(esperados) and esperados <= obtidos)
+
+    resumo = {
+        "casos": len(casos),
+        "tokens_contexto_medio": round(sum(tokens) / len(tokens), 1) if tokens else None,
+        "cobertura_codigos": round(sum(cobertura) / len(cobertura), 4) if cobertura else None,
+    }
+    if decodificar:
+        resumo["acuracia_decodificacao"] = round(sum(acertos) / len(acertos), 4) if acertos else None
+        resumo["latencia_decodificacao_media_s"] = round(sum(latencias) / len(latencias), 3) if latencias else None
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede tokens e acurácia da recuperação com poda")
+    parser.add_argument("--arquivo", required=True, help="Arquivo JSONL com os casos")
+    parser.add_argument("--limite", type=int, default=0, help="Número máximo de casos (0 = todos)")
+    parser.add_argument("--decodificar", action="store_true", help="Também executa o decodificador em cada modo")
+    args = parser.parse_args()
+
+    processador = obter_processador()
+    casos = carregar_casos(args.arquivo, args.limite)
+    for caso in casos:
+        if caso.get("procedimentos"):
+            caso["procedimentos_objetos"] = [Procedimento(**procedimento) for procedimento in caso["procedimentos"]]
+        else:
+            caso["procedimentos_objetos"] = processador.extrair_procedimentos(caso["text"]).procedimentos_identificados
+    print(f"{len(casos)} casos carregados de {args.arquivo}")
+
+    resultados = {modo: medir_modo(processador, casos, modo, args.decodificar) for modo in ("consulta_unica", "podado")}
+    for modo, resumo in resultados.items():
+        print(f"{modo}: {json.dumps(resumo, ensure_ascii=False)}")
+
+    base, podado = resultados["consulta_unica"], resultados["podado"]
+    if base["tokens_contexto_medio"]:
+        reducao = 1 - podado["tokens_contexto_medio"] / base["tokens_contexto_medio"]
+        print(f"Redução de tokens do contexto: {reducao:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
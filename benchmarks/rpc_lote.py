@@ -0,0 +1,96 @@
+"""
+Compara a latência da busca em lote (match_procedimentos_lote) com N chamadas
+individuais, uma por consulta.
+
+Alvos:
+- supabase (padrão): N chamadas à RPC match_procedimentos contra uma chamada à
+  RPC match_procedimentos_lote (sql/match_procedimentos_lote.sql aplicado no projeto);
+- postgres: um Postgres local com pgvector (--dsn, requer psycopg), populado com
+  `python -m src.ingestao_catalogo --destino postgres --arquivo <dsn>`; compara N
+  chamadas da função em lote com uma consulta cada contra uma chamada com as N.
+
+As consultas são os embeddings dos nomes dos primeiros procedimentos do catálogo
+(gerados com a OpenAI em uma única chamada).
+
+Uso:
+    python benchmarks/rpc_lote.py [--consultas 4] [--match-count 8] [--repeticoes 20] [--dsn postgresql://...]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.catalogo import obter_catalogo
+from src.clientes import FUNC_NAME, FUNC_NAME_LOTE, obter_cliente_supabase
+from src.flows.fluxo_chain import obter_processador
+from src.recuperacao import separar_por_consulta
+from src.vetores import literal_vetor
+
+
+def medir(funcao, repeticoes):
+    funcao()  # aquecimento da conexão
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracoes.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "media_ms": round(statistics.mean(duracoes), 2),
+        "p50_ms": round(statistics.median(duracoes), 2),
+        "max_ms": round(max(duracoes), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência da busca em lote contra N chamadas individuais")
+    parser.add_argument("--consultas", type=int, default=4)
+    parser.add_argument("--match-count", type=int, default=8)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--dsn", default=None, help="DSN de um Postgres local com pgvector (padrão: Supabase)")
+    args = parser.parse_args()
+
+    nomes = [procedimento["nome_procedimento"] for procedimento in obter_catalogo()[:args.consultas]]
+    embeddings = obter_processador().gerar_embeddings(nomes)
+
+    if args.dsn:
+        from src.armazem_embeddings import ArmazemPostgres
+
+        armazem = ArmazemPostgres(args.dsn)
+        individual = lambda: [armazem.match_procedimentos_lote([embedding], args.match_count) for embedding in embeddings]
+        lote = lambda: separar_por_consulta(armazem.match_procedimentos_lote(embeddings, args.match_count), len(embeddings))
+        resultados_individuais = [separar_por_consulta(linhas, 1)[0] for linhas in individual()]
+    else:
+        cliente = obter_cliente_supabase()
+        individual = lambda: [
+            cliente.rpc(FUNC_NAME, {"query_embedding": literal_vetor(embedding), "match_count": args.match_count}).execute().data
+            for embedding in embeddings
+        ]
+        lote = lambda: separar_por_consulta(
+            cliente.rpc(FUNC_NAME_LOTE, {"query_embeddings": [literal_vetor(e) for e in embeddings], "match_count": args.match_count}).execute().data,
+            len(embeddings),
+        )
+        resultados_individuais = individual()
+
+    # As duas formas devem retornar os mesmos códigos para cada consulta
+    codigos = lambda listas: [[str(d["codigo_procedimento"]) for d in lista] for lista in listas]
+    concordam = codigos(resultados_individuais) == codigos(lote())
+
+    resumo = {
+        "consultas": len(embeddings),
+        "match_count": args.match_count,
+        "alvo": "postgres" if args.dsn else "supabase",
+        "individual": medir(individual, args.repeticoes),
+        "lote": medir(lote, args.repeticoes),
+        "resultados_iguais": concordam,
+    }
+    resumo["aceleracao"] = round(resumo["individual"]["media_ms"] / resumo["lote"]["media_ms"], 2)
+    print(json.dumps(resumo, ensure_ascii=False))
+    return 0 if concordam else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
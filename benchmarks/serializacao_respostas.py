@@ -0,0 +1,98 @@
+"""
+CPU e tamanho da serialização de um resultado de fluxo típico.
+
+Compara, para um resultado com N procedimentos (modelos pydantic aninhados e
+justificativas longas):
+- fastapi_padrao: jsonable_encoder + JSONResponse (o caminho anterior da API);
+- rapida: RespostaJSONRapida (orjson, api/respostas.py);
+- projetada: RespostaJSONRapida com `fields` (só a classificação e os códigos).
+
+Uso:
+    python benchmarks/serializacao_respostas.py [--procedimentos 4] [--repeticoes 2000]
+        [--fields classificacao_final,decodificacao.codigo_procedimentos]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from api.respostas import resposta_json
+from schemas.modelos_para_agentes import Decodificacao, Procedimento, ProcedimentoExtracao
+
+JUSTIFICATIVA = (
+    "O paciente deu entrada de forma eletiva para tratamento de colelitíase sintomática; "
+    "não há menção a trauma, acidente ou violência na descrição cirúrgica nem no laudo. "
+) * 4
+
+
+def resultado_tipico(procedimentos):
+    extracao = ProcedimentoExtracao(procedimentos_identificados=[
+        Procedimento(procedimento=f"procedimento {i}", descricao=JUSTIFICATIVA[:200]) for i in range(procedimentos)
+    ])
+    return {
+        "extracao": extracao,
+        "tipo_fluxo": "com_peca_anatomica",
+        "decodificacao": Decodificacao(
+            nome_procedimentos=Procedimento(procedimento="COLECISTECTOMIA", descricao=JUSTIFICATIVA[:200]),
+            codigo_procedimentos="0407030034",
+            tratar_cancer=False,
+        ),
+        "valores_catalogo": {"0407030034": {"valor_sh": 366.35, "valor_sp": 175.31, "valor_total": 541.66}},
+        "entrada_por_trauma": {"entrada_por_trauma": False, "justificativa": JUSTIFICATIVA},
+        "mesma_doenca": {"mesma_doenca": False, "justificativa": JUSTIFICATIVA},
+        "classificacao_final": "multipla",
+        "justificativa_classificacao": JUSTIFICATIVA,
+        "detalhes_classificacao": {
+            "entrada_por_trauma": False,
+            "multiplos_procedimentos": procedimentos > 1,
+            "mesma_doenca": False,
+            "numero_procedimentos": procedimentos,
+        },
+        "execucao": {"etapas": {f"etapa_{i}": {"duracao_ms": 12.5 * i, "origem": "llm"} for i in range(8)}},
+        "recuperacao": {"lotes_embedding": 1, "textos_embedding": procedimentos, "consultas": procedimentos},
+    }
+
+
+def medir(funcao, repeticoes):
+    funcao()
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracoes.append((time.perf_counter() - inicio) * 1e6)
+    return round(statistics.mean(duracoes), 1), round(statistics.median(duracoes), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU e tamanho da serialização das respostas")
+    parser.add_argument("--procedimentos", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--fields", default="classificacao_final,decodificacao.codigo_procedimentos")
+    args = parser.parse_args()
+
+    resultado = resultado_tipico(args.procedimentos)
+    caminhos = {
+        "fastapi_padrao": lambda: JSONResponse(content=jsonable_encoder(resultado)).body,
+        "rapida": lambda: resposta_json(resultado).body,
+        "projetada": lambda: resposta_json(resultado, args.fields).body,
+    }
+    # O caminho rápido deve produzir o mesmo JSON que o padrão
+    iguais = json.loads(caminhos["fastapi_padrao"]()) == json.loads(caminhos["rapida"]())
+
+    resumo = {"procedimentos": args.procedimentos, "fields": args.fields, "mesmo_conteudo": iguais}
+    for nome, funcao in caminhos.items():
+        media, mediana = medir(funcao, args.repeticoes)
+        resumo[nome] = {"media_us": media, "p50_us": mediana, "bytes": len(funcao())}
+    resumo["aceleracao"] = round(resumo["fastapi_padrao"]["media_us"] / resumo["rapida"]["media_us"], 2)
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+    return 0 if iguais else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
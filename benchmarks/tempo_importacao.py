@@ -0,0 +1,90 @@
+"""
+Mede o tempo de importação da API e verifica o orçamento de inicialização.
+
+Cada medição roda em um processo Python novo, sem credenciais no ambiente, para
+garantir que a importação não depende de rede nem cria clientes externos.
+
+Uso:
+    python benchmarks/tempo_importacao.py [--modulo api.main] [--orcamento-ms 1000] [--repeticoes 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos pesados que não devem ser carregados só por importar a API
+MODULOS_PROIBIDOS = ["langchain_openai", "langchain_core", "openai", "supabase"]
+
+CODIGO_MEDICAO = """
+import sys, time
+inicio = time.perf_counter()
+import {modulo}
+duracao = (time.perf_counter() - inicio) * 1000
+carregados = [m for m in {proibidos!r} if m in sys.modules]
+print(f"{{duracao:.1f}}|{{','.join(carregados)}}")
+"""
+
+
+def medir_importacao(modulo, repeticoes):
+    """
+    Importa o módulo em processos novos e retorna as durações e os módulos pesados carregados.
+
+    Args:
+        modulo: Nome do módulo a importar
+        repeticoes: Número de processos a executar
+
+    Returns:
+        Tupla (lista de durações em ms, conjunto de módulos proibidos carregados)
+    """
+    ambiente = {
+        chave: valor for chave, valor in os.environ.items()
+        if chave not in ("OPENAI_API_KEY", "SUPABASE_URL", "SERVICE_KEY_SUPABASE")
+    }
+    duracoes = []
+    carregados = set()
+    codigo = CODIGO_MEDICAO.format(modulo=modulo, proibidos=MODULOS_PROIBIDOS)
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, "-c", codigo],
+            cwd=DIRETORIO_PROJETO,
+            env=ambiente,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip().splitlines()[-1]
+        duracao, modulos = saida.split("|")
+        duracoes.append(float(duracao))
+        carregados.update(m for m in modulos.split(",") if m)
+    return duracoes, carregados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação da API")
+    parser.add_argument("--modulo", default="api.main")
+    parser.add_argument("--orcamento-ms", type=float, default=1000.0)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    duracoes, carregados = medir_importacao(args.modulo, args.repeticoes)
+    mediana = statistics.median(duracoes)
+    print(f"Importação de {args.modulo}: mediana {mediana:.1f} ms "
+          f"(min {min(duracoes):.1f} ms, max {max(duracoes):.1f} ms, n={len(duracoes)})")
+    print(f"Orçamento: {args.orcamento_ms:.0f} ms")
+
+    ok = True
+    if carregados:
+        print(f"FALHA: módulos pesados carregados na importação: {sorted(carregados)}")
+        ok = False
+    if mediana > args.orcamento_ms:
+        print("FALHA: orçamento de importação excedido")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Valida a concordância dos verificadores em micro-lote com a chamada individual.
+
+Para cada caso do arquivo, executa verificador_trauma e verificador_mesma_doenca
+com uma chamada por caso e, em seguida, em lotes de --tamanho-lote casos (o mesmo
+caminho usado quando MICROLOTE_CHAINS está habilitado). Reporta a concordância,
+os casos sem resposta no lote, o número de chamadas e o tempo de cada modo.
+
+Requer credenciais da OpenAI. O arquivo de casos é JSONL com o campo "text" (e,
+opcionalmente, "procedimentos": lista de {"procedimento", "descricao"}; sem ele, os
+procedimentos são extraídos com o extrator).
+
+Uso:
+    python benchmarks/validar_micro_lote.py --arquivo casos.jsonl [--tamanho-lote 8] [--limite 100]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas.modelos_para_agentes import Procedimento
+from src.flows.fluxo_chain import obter_processador
+
+
+def carregar_casos(caminho, limite):
+    casos = []
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                casos.append(json.loads(linha))
+            if limite and len(casos) >= limite:
+                break
+    return casos
+
+
+def entradas_verificadores(processador, casos):
+    """Monta as entradas de cada verificador (extraindo os procedimentos quando necessário)."""
+    entradas_trauma = []
+    entradas_mesma_doenca = []
+    for caso in casos:
+        entradas_trauma.append({"texto": caso["text"]})
+        if caso.get("procedimentos"):
+            procedimentos = [Procedimento(**procedimento) for procedimento in caso["procedimentos"]]
+        else:
+            procedimentos = processador.extrair_procedimentos(caso["text"]).procedimentos_identificados
+        # Com um procedimento só, o verificador não é chamado
+        if len(procedimentos) > 1:
+            entradas_mesma_doenca.append({
+                "procedimentos": processador._formatar_procedimentos_para_verificacao(procedimentos)
+            })
+    return {"verificador_trauma": entradas_trauma, "verificador_mesma_doenca": entradas_mesma_doenca}
+
+
+def comparar(processador, nome_chain, entradas, tamanho_lote):
+    campo = "entrada_por_trauma" if nome_chain == "verificador_trauma" else "mesma_doenca"
+
+    inicio = time.perf_counter()
+    individuais = [getattr(processador._invocar(nome_chain, item), campo) for item in entradas]
+    tempo_individual = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    em_lote = []
+    chamadas_lote = 0
+    for posicao in range(0, len(entradas), tamanho_lote):
+        lote = entradas[posicao:posicao + tamanho_lote]
+        chamadas_lote += 1
+        em_lote.extend(
+            getattr(resultado, campo) if resultado is not None else None
+            for resultado in processador._invocar_lote_verificador(nome_chain, lote)
+        )
+    tempo_lote = time.perf_counter() - inicio
+
+    respondidos = [(a, b) for a, b in zip(individuais, em_lote) if b is not None]
+    concordantes = sum(1 for a, b in respondidos if a == b)
+    return {
+        "casos": len(entradas),
+        "sem_resposta_no_lote": len(entradas) - len(respondidos),
+        "concordancia": round(concordantes / len(respondidos), 4) if respondidos else None,
+        "chamadas_individuais": len(entradas),
+        "chamadas_lote": chamadas_lote,
+        "tempo_individual_s": round(tempo_individual, 2),
+        "tempo_lote_s": round(tempo_lote, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida os verificadores em micro-lote contra a chamada individual")
+    parser.add_argument("--arquivo", required=True, help="Arquivo JSONL com os casos")
+    parser.add_argument("--tamanho-lote", type=int, default=8)
+    parser.add_argument("--limite", type=int, default=0, help="Número máximo de casos (0 = todos)")
+    parser.add_argument("--concordancia-minima", type=float, default=0.95)
+    args = parser.parse_args()
+
+    processador = obter_processador()
+    casos = carregar_casos(args.arquivo, args.limite)
+    print(f"{len(casos)} casos carregados de {args.arquivo}")
+
+    ok = True
+    for nome_chain, entradas in entradas_verificadores(processador, casos).items():
+        if not entradas:
+            print(f"{nome_chain}: nenhum caso aplicável")
+            continue
+        resultado = comparar(processador, nome_chain, entradas, args.tamanho_lote)
+        print(f"{nome_chain}: {json.dumps(resultado, ensure_ascii=False)}")
+        if resultado["concordancia"] is None or resultado["concordancia"] < args.concordancia_minima:
+            ok = False
+
+    print("OK" if ok else f"FALHA: concordância abaixo de {args.concordancia_minima}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
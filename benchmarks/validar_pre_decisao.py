@@ -0,0 +1,138 @@
+"""
+Valida a pré-decisão local de mesma doença (src/pre_decisao.py) contra o LLM.
+
+Para cada caso com mais de um procedimento, calcula os sinais da pré-decisão
+(similaridades entre os embeddings e sítios anatômicos) e a resposta do
+verificador_mesma_doenca (uma chamada por caso). Reporta, para os limiares
+configurados e para uma grade de limiares:
+- cobertura: fração dos casos decididos localmente;
+- concordância: fração das decisões locais iguais à do LLM;
+- erros por tipo (local "mesma doença" com LLM "diferentes" e vice-versa).
+
+Ao fim, sugere o par de limiares com a maior cobertura entre os que atingem
+--concordancia-minima. Só habilite MESMA_DOENCA_PRE_DECISAO com limiares
+escolhidos assim.
+
+Requer credenciais da OpenAI. O arquivo de casos é JSONL com o campo "text" (e,
+opcionalmente, "procedimentos": lista de {"procedimento", "descricao"}; sem ele, os
+procedimentos são extraídos com o extrator).
+
+Uso:
+    python benchmarks/validar_pre_decisao.py --arquivo casos.jsonl [--limite 200]
+        [--concordancia-minima 0.98]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas.modelos_para_agentes import Procedimento
+from src.flows.fluxo_chain import obter_processador
+from src.pre_decisao import (
+    decidir_por_limiares,
+    limiares_pre_decisao,
+    similaridades_pares,
+    sitio_anatomico,
+    texto_procedimento,
+)
+
+LIMIARES_ALTOS = [0.60, 0.65, 0.70, 0.75, 0.80, 0.85, 0.90, 0.95]
+LIMIARES_BAIXOS = [0.10, 0.15, 0.20, 0.25, 0.30, 0.35, 0.40]
+
+
+def carregar_casos(caminho, limite):
+    casos = []
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                casos.append(json.loads(linha))
+            if limite and len(casos) >= limite:
+                break
+    return casos
+
+
+def sinais_e_referencia(processador, casos):
+    """Sinais da pré-decisão e resposta do LLM de cada caso com mais de um procedimento."""
+    amostras = []
+    for caso in casos:
+        if caso.get("procedimentos"):
+            procedimentos = [Procedimento(**procedimento) for procedimento in caso["procedimentos"]]
+        else:
+            procedimentos = processador.extrair_procedimentos(caso["text"]).procedimentos_identificados
+        if len(procedimentos) < 2:
+            continue
+        embeddings = processador.gerar_embeddings([texto_procedimento(proc) for proc in procedimentos])
+        resultado = processador._invocar("verificador_mesma_doenca", {
+            "procedimentos": processador._formatar_procedimentos_para_verificacao(procedimentos)
+        })
+        amostras.append({
+            "similaridades": similaridades_pares(embeddings).tolist(),
+            "sitios": [sitio_anatomico(proc) for proc in procedimentos],
+            "llm": resultado.mesma_doenca,
+        })
+    return amostras
+
+
+def avaliar(amostras, limiar_alto, limiar_baixo):
+    decididos = concordantes = falso_mesma = falso_diferentes = 0
+    for amostra in amostras:
+        decisao = decidir_por_limiares(amostra["similaridades"], amostra["sitios"], limiar_alto, limiar_baixo)
+        if decisao is None:
+            continue
+        decididos += 1
+        if decisao == amostra["llm"]:
+            concordantes += 1
+        elif decisao:
+            falso_mesma += 1
+        else:
+            falso_diferentes += 1
+    return {
+        "limiar_alto": limiar_alto,
+        "limiar_baixo": limiar_baixo,
+        "cobertura": round(decididos / len(amostras), 4) if amostras else None,
+        "concordancia": round(concordantes / decididos, 4) if decididos else None,
+        "decididos": decididos,
+        "local_mesma_llm_diferentes": falso_mesma,
+        "local_diferentes_llm_mesma": falso_diferentes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida a pré-decisão de mesma doença contra o LLM")
+    parser.add_argument("--arquivo", required=True, help="Arquivo JSONL com os casos")
+    parser.add_argument("--limite", type=int, default=0, help="Número máximo de casos (0 = todos)")
+    parser.add_argument("--concordancia-minima", type=float, default=0.98)
+    args = parser.parse_args()
+
+    processador = obter_processador()
+    casos = carregar_casos(args.arquivo, args.limite)
+    amostras = sinais_e_referencia(processador, casos)
+    print(f"{len(casos)} casos carregados de {args.arquivo}, {len(amostras)} com mais de um procedimento")
+    if not amostras:
+        return 1
+
+    atual = avaliar(amostras, *limiares_pre_decisao())
+    print(f"limiares configurados: {json.dumps(atual, ensure_ascii=False)}")
+
+    grade = [avaliar(amostras, alto, baixo) for alto in LIMIARES_ALTOS for baixo in LIMIARES_BAIXOS if baixo < alto]
+    for resultado in grade:
+        print(json.dumps(resultado, ensure_ascii=False))
+
+    aceitos = [r for r in grade if r["concordancia"] is not None and r["concordancia"] >= args.concordancia_minima]
+    if not aceitos:
+        print(f"Nenhum par de limiares atinge concordância {args.concordancia_minima}; mantenha a pré-decisão desligada")
+        return 1
+    melhor = max(aceitos, key=lambda r: (r["cobertura"], r["concordancia"]))
+    print(
+        f"Sugestão: MESMA_DOENCA_LIMIAR_ALTO={melhor['limiar_alto']} MESMA_DOENCA_LIMIAR_BAIXO={melhor['limiar_baixo']} "
+        f"(cobertura {melhor['cobertura']}, concordância {melhor['concordancia']})"
+    )
+    ok = atual["concordancia"] is None or atual["concordancia"] >= args.concordancia_minima
+    print("OK" if ok else f"FALHA: limiares configurados com concordância abaixo de {args.concordancia_minima}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,5 @@
+from src.registro_prompts import obter_prompt
 
-#Carrega um prompt a partir de um arquivo, para que o Agente saiba o que fazer. 
+#Carrega um prompt a partir do registro central, para que o Agente saiba o que fazer. 
 def load_prompt(prompt_path: str) -> str:
-    with open(prompt_path, "r") as f:
-        return f.read()
-
-
-
-
+    return obter_prompt(prompt_path)
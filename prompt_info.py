@@ -4,13 +4,13 @@ from functions import load_prompt
 #Defina aqui os templates de todos os agentes que rpecisar, para depois carregá-lo em agentes.py
 
 prompt_template_procedimentos = ChatPromptTemplate.from_messages([
-    ("system", load_prompt(r"prompts\system_extracao_procedimentos.txt")),
+    ("system", load_prompt("system_extracao_procedimentos")),
     
     ("human", "{text}")
 ])
 
 prompt_decodificacao = ChatPromptTemplate.from_messages([
-    ("system", load_prompt(r"prompts\system_decodificacao.txt")),
+    ("system", load_prompt("system_decodificacao")),
     ("human", "{text}")
 ])
 
@@ -7,6 +7,7 @@ class InputData(BaseModel):
     text: str = Field(..., description="Texto a ser processado")
     model_name: Optional[str] = Field(default="gpt-4o-mini", description="Nome do modelo a ser usado")
     temperature: Optional[float] = Field(default=0.1, description="Temperatura para geração de texto")
+    prazo_segundos: Optional[float] = Field(default=None, description="Orçamento de tempo da requisição, em segundos (opcional)")
     
 # Definir um modelo para a entrada da verificação
 class VerificacaoInput(BaseModel):
@@ -28,4 +29,20 @@ class BuscaDocumentosInput(BaseModel):
 class InputDataComLaudo(BaseModel):
     """Modelo para dados de entrada com descrição cirúrgica e laudo anatomopatológico."""
     text: str = Field(..., description="Texto da descrição cirúrgica")
-    laudo: Optional[str] = Field(None, description="Texto do laudo anatomopatológico")
\ No newline at end of file
+    laudo: Optional[str] = Field(None, description="Texto do laudo anatomopatológico")
+    prazo_segundos: Optional[float] = Field(None, description="Orçamento de tempo da requisição, em segundos (opcional)")
+    caso_id: Optional[str] = Field(None, description="Identificador do caso; reenvios com o mesmo id recalculam apenas as etapas afetadas (opcional)")
+
+class CasoLote(InputDataComLaudo):
+    """Caso de um lote, com identificador opcional."""
+    id: Optional[str] = Field(None, description="Identificador do caso no lote (padrão: posição)")
+
+class InputLote(BaseModel):
+    """Modelo para dados de entrada do processamento em lote."""
+    casos: List[CasoLote] = Field(..., description="Casos do lote")
+    limiar: Optional[float] = Field(0.85, description="Similaridade mínima para reaproveitar o resultado de uma quase-duplicata")
+
+class ConsultaProcedimentosInput(BaseModel):
+    """Modelo para a consulta em lote ao catálogo de procedimentos."""
+    codigos: List[str] = Field(default_factory=list, description="Códigos SIGTAP (com ou sem pontuação e zeros à esquerda)")
+    nomes: List[str] = Field(default_factory=list, description="Nomes dos procedimentos (sem diferenciar caixa e acentos)")
@@ -45,4 +45,24 @@ class VerificacaoTrauma(BaseModel):
 class VerificacaoMesmaDoenca(BaseModel):
     """Modelo para verificação se os procedimentos são para tratar a mesma doença."""
     mesma_doenca: bool = Field(description="Indica se os procedimentos são para tratar a mesma doença")
-    justificativa: str = Field(description="Justificativa para a conclusão sobre mesma doença")
\ No newline at end of file
+    justificativa: str = Field(description="Justificativa para a conclusão sobre mesma doença")
+
+
+class VerificacaoTraumaCaso(VerificacaoTrauma):
+    """Verificação de trauma de um caso dentro de um lote."""
+    caso_id: str = Field(description="Identificador do caso, exatamente como informado na entrada")
+
+
+class VerificacaoTraumaLote(BaseModel):
+    """Modelo para verificação de entrada por trauma de vários casos em uma única chamada."""
+    resultados: List[VerificacaoTraumaCaso] = Field(description="Um resultado para cada caso da entrada")
+
+
+class VerificacaoMesmaDoencaCaso(VerificacaoMesmaDoenca):
+    """Verificação de mesma doença de um caso dentro de um lote."""
+    caso_id: str = Field(description="Identificador do caso, exatamente como informado na entrada")
+
+
+class VerificacaoMesmaDoencaLote(BaseModel):
+    """Modelo para verificação de mesma doença de vários casos em uma única chamada."""
+    resultados: List[VerificacaoMesmaDoencaCaso] = Field(description="Um resultado para cada caso da entrada")
\ No newline at end of file
@@ -0,0 +1,9 @@
+-- Colunas usadas pela ingestão incremental do catálogo (src/ingestao_catalogo.py).
+-- hash_conteudo: SHA-256 de descricao_e_titulo; linhas com o mesmo hash não são reprocessadas.
+-- O upsert é feito pelo código do procedimento.
+
+ALTER TABLE tabela_embeddings_grupo_02_04
+    ADD COLUMN IF NOT EXISTS hash_conteudo text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS tabela_embeddings_grupo_02_04_codigo_idx
+    ON tabela_embeddings_grupo_02_04 (codigo_procedimento);
@@ -0,0 +1,37 @@
+-- Busca em lote no vector store: recebe várias consultas (embeddings) e devolve
+-- os match_count documentos mais similares de cada uma em uma única chamada.
+-- Só as colunas usadas na formatação dos documentos são retornadas.
+--
+-- query_embeddings: array JSON de embeddings, cada um como array de números
+--   ([[...], [...]]) ou como literal de texto do pgvector (["[...]", "[...]"])
+-- consulta: posição (base 0) da consulta em query_embeddings
+
+CREATE OR REPLACE FUNCTION match_procedimentos_lote(query_embeddings jsonb, match_count int)
+RETURNS TABLE (
+    consulta int,
+    codigo_procedimento text,
+    nome_procedimento text,
+    descricao_procedimento text,
+    similarity float
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        (q.posicao - 1)::int AS consulta,
+        t.codigo_procedimento,
+        t.nome_procedimento,
+        t.descricao_procedimento,
+        t.similarity
+    FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS q(embedding, posicao)
+    CROSS JOIN LATERAL (
+        SELECT
+            e.codigo_procedimento::text AS codigo_procedimento,
+            e.nome_procedimento,
+            e.descricao_procedimento,
+            1 - (e.embedding_descricao_titulo <=> (q.embedding #>> '{}')::vector) AS similarity
+        FROM tabela_embeddings_grupo_02_04 e
+        ORDER BY e.embedding_descricao_titulo <=> (q.embedding #>> '{}')::vector
+        LIMIT match_count
+    ) t
+    ORDER BY consulta, t.similarity DESC;
+$$;
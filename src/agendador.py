@@ -0,0 +1,346 @@
+"""
+Agendador das chamadas de saída para a OpenAI (LLM e embeddings).
+
+Coordena todas as chamadas feitas pelo ProcessadorProcedimentos:
+- Token buckets de requisições por minuto (RPM) e tokens por minuto (TPM);
+- Classes de prioridade: chamadas "interativa" (API) passam na frente de "lote";
+- Concorrência adaptativa AIMD: o limite cresce aditivamente a cada sucesso e cai
+  multiplicativamente ao receber 429 ou quando a latência passa do alvo. Uma
+  rajada de 429 (inclusive os retries do SDK) reduz o limite uma vez só: a
+  redução por 429 vale no máximo uma vez por janela de latência (a latência
+  média das chamadas, ou o alvo enquanto não há medida).
+
+A prioridade da requisição corrente é guardada em um ContextVar, então basta o
+chamador envolver o processamento em `com_prioridade("lote")`.
+
+Cada processo tem o seu agendador. Com a API e os trabalhadores da fila
+(src/trabalhador.py) rodando juntos, os limites configurados valeriam uma vez por
+processo; AGENDADOR_PROCESSOS divide RPM, TPM e concorrência entre os processos.
+Quando não configurado, src/trabalhador.py o define como o número de
+trabalhadores + 1, reservando uma parte para a API: configure o mesmo valor no
+processo da API. A precedência de "interativa" sobre "lote" vale dentro de um
+processo; entre processos, as chamadas interativas da API têm a sua parte do
+orçamento reservada em vez de disputarem a mesma fila com os trabalhadores.
+
+Configuração (variáveis de ambiente, com <RECURSO> = LLM ou EMBEDDING):
+    AGENDADOR_<RECURSO>_RPM, AGENDADOR_<RECURSO>_TPM (totais da conta)
+    AGENDADOR_<RECURSO>_CONCORRENCIA_INICIAL, _MIN, _MAX (totais)
+    AGENDADOR_<RECURSO>_LATENCIA_ALVO (segundos)
+    AGENDADOR_PROCESSOS: processos que dividem os limites acima (padrão 1)
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+from src.configuracao import env_float, env_int
+from src.metricas import registrar_fonte_metricas
+from src.prazo import PrazoEsgotadoError, tempo_restante
+
+PRIORIDADES = {"interativa": 0, "lote": 1}
+PRIORIDADE_PADRAO = "interativa"
+
+_prioridade_atual = contextvars.ContextVar("prioridade_atual", default=PRIORIDADE_PADRAO)
+
+# Padrões por recurso: (rpm, tpm, concorrência inicial, mínima, máxima, latência alvo)
+_PADROES = {
+    "llm": (500, 200000, 8, 1, 32, 15.0),
+    "embedding": (3000, 1000000, 16, 1, 64, 5.0),
+}
+
+
+@contextmanager
+def com_prioridade(prioridade: str):
+    """
+    Define a classe de prioridade das chamadas feitas dentro do bloco.
+
+    Args:
+        prioridade: "interativa" ou "lote"
+    """
+    if prioridade not in PRIORIDADES:
+        raise ValueError(f"Prioridade desconhecida: {prioridade}")
+    token = _prioridade_atual.set(prioridade)
+    try:
+        yield
+    finally:
+        _prioridade_atual.reset(token)
+
+
+def prioridade_atual() -> str:
+    """Retorna a classe de prioridade do contexto corrente."""
+    return _prioridade_atual.get()
+
+
+def estimar_tokens(*textos) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token) para os textos informados."""
+    return sum(len(str(texto)) for texto in textos if texto) // 4 + 1
+
+
+class BaldeTokens:
+    """Token bucket simples com reabastecimento contínuo."""
+
+    def __init__(self, capacidade_por_minuto: float):
+        self.capacidade = float(capacidade_por_minuto)
+        self.taxa = self.capacidade / 60.0
+        self.disponivel = self.capacidade
+        self._ultimo = time.monotonic()
+
+    def _reabastecer(self, agora):
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def tempo_ate(self, quantidade: float, agora: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já houver)."""
+        self._reabastecer(agora)
+        quantidade = min(quantidade, self.capacidade)
+        if self.disponivel >= quantidade:
+            return 0.0
+        return (quantidade - self.disponivel) / self.taxa
+
+    def consumir(self, quantidade: float):
+        self.disponivel -= min(quantidade, self.capacidade)
+
+
+class AgendadorSaida:
+    """
+    Controla a admissão de chamadas a um recurso externo (fila com prioridade,
+    limites de taxa e concorrência adaptativa).
+    """
+
+    def __init__(self, nome, rpm, tpm, concorrencia_inicial, concorrencia_min, concorrencia_max, latencia_alvo,
+                 processos=1):
+        self.nome = nome
+        self.processos = processos
+        self.baldes = {"requisicoes": BaldeTokens(rpm), "tokens": BaldeTokens(tpm)}
+        self.limite = float(concorrencia_inicial)
+        self.limite_min = concorrencia_min
+        self.limite_max = concorrencia_max
+        self.latencia_alvo = latencia_alvo
+        self.em_execucao = 0
+        self._fila = []
+        self._sequencia = itertools.count()
+        self._cond = threading.Condition()
+        self._latencia_media = None
+        self._ultima_reducao_429 = None
+        self._contadores = {
+            "executadas": 0, "erros": 0, "erros_429": 0, "erros_429_na_janela": 0, "reducoes": 0, "prazo_esgotado": 0,
+        }
+
+    @contextmanager
+    def permissao(self, tokens_estimados: int = 1, prioridade: str = None, respeitar_prazo: bool = True):
+        """
+        Bloqueia até a chamada poder ser executada e libera a vaga ao final.
+
+        Args:
+            tokens_estimados: Tokens estimados da chamada (para o limite de TPM)
+            prioridade: Classe de prioridade (padrão: a do contexto corrente)
+            respeitar_prazo: Desiste da espera quando o prazo da requisição acaba
+                (para etapas sem fallback, False: a chamada espera a sua vez)
+
+        Raises:
+            PrazoEsgotadoError: Se o prazo acabar antes da admissão
+        """
+        prioridade = prioridade or prioridade_atual()
+        entrada = (PRIORIDADES.get(prioridade, 0), next(self._sequencia))
+        restante = tempo_restante() if respeitar_prazo else None
+        limite = time.monotonic() + restante if restante is not None else None
+        with self._cond:
+            heapq.heappush(self._fila, entrada)
+            try:
+                while True:
+                    espera = self._tempo_ate_admissao(entrada, tokens_estimados)
+                    if espera == 0:
+                        break
+                    if limite is not None:
+                        if time.monotonic() >= limite:
+                            self._contadores["prazo_esgotado"] += 1
+                            raise PrazoEsgotadoError(f"Prazo esgotado na fila do agendador '{self.nome}'")
+                        espera = min(espera, limite - time.monotonic())
+                    self._cond.wait(timeout=espera)
+            except BaseException:
+                self._fila.remove(entrada)
+                heapq.heapify(self._fila)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._fila)
+            self.baldes["requisicoes"].consumir(1)
+            self.baldes["tokens"].consumir(tokens_estimados)
+            self.em_execucao += 1
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.em_execucao -= 1
+                self._cond.notify_all()
+
+    def _tempo_ate_admissao(self, entrada, tokens_estimados):
+        # Só o primeiro da fila (menor prioridade numérica, depois ordem de chegada) é admitido
+        if self._fila[0] != entrada:
+            return 1.0
+        if self.em_execucao >= int(self.limite):
+            return 1.0
+        agora = time.monotonic()
+        espera = max(
+            self.baldes["requisicoes"].tempo_ate(1, agora),
+            self.baldes["tokens"].tempo_ate(tokens_estimados, agora),
+        )
+        return espera if espera > 0 else 0
+
+    def registrar_resultado(self, latencia: float = None, erro: Exception = None):
+        """
+        Atualiza o limite de concorrência (AIMD) a partir do resultado de uma chamada.
+
+        Args:
+            latencia: Duração da chamada em segundos
+            erro: Exceção levantada pela chamada (se houver)
+        """
+        with self._cond:
+            if erro is not None:
+                # Os 429 já reduzem o limite ao passar pelo transporte HTTP (registrar_limite_taxa)
+                self._contadores["erros"] += 1
+                return
+            self._contadores["executadas"] += 1
+            if latencia is not None:
+                self._latencia_media = latencia if self._latencia_media is None else (
+                    0.9 * self._latencia_media + 0.1 * latencia
+                )
+            if latencia is not None and latencia > self.latencia_alvo:
+                self._reduzir(0.9)
+            else:
+                self.limite = min(self.limite_max, self.limite + 1.0 / max(self.limite, 1.0))
+            self._cond.notify_all()
+
+    def registrar_limite_taxa(self):
+        """
+        Registra uma resposta 429 do provedor (inclusive as tratadas com retry pelo SDK).
+
+        Reduz o limite à metade no máximo uma vez por janela de latência: os 429
+        seguintes na mesma janela vêm de chamadas admitidas antes da redução (ou
+        dos retries delas) e só entram nas métricas.
+        """
+        with self._cond:
+            self._contadores["erros_429"] += 1
+            agora = time.monotonic()
+            janela = self._latencia_media if self._latencia_media is not None else self.latencia_alvo
+            if self._ultima_reducao_429 is not None and agora - self._ultima_reducao_429 < janela:
+                self._contadores["erros_429_na_janela"] += 1
+                return
+            self._ultima_reducao_429 = agora
+            self._reduzir(0.5)
+
+    def _reduzir(self, fator):
+        anterior = self.limite
+        self.limite = max(float(self.limite_min), self.limite * fator)
+        self._contadores["reducoes"] += 1
+        if int(anterior) != int(self.limite):
+            logger.warning("Agendador '{nome}': limite de concorrência reduzido para {limite}", nome=self.nome, limite=int(self.limite))
+
+    def profundidade_fila(self):
+        """Retorna quantas chamadas aguardam na fila, por classe de prioridade."""
+        with self._cond:
+            por_classe = {nome: 0 for nome in PRIORIDADES}
+            nomes = {valor: nome for nome, valor in PRIORIDADES.items()}
+            for prioridade, _ in self._fila:
+                por_classe[nomes.get(prioridade, str(prioridade))] += 1
+            return {"total": len(self._fila), **por_classe}
+
+    def resumo(self):
+        """Retorna o estado atual do agendador."""
+        fila = self.profundidade_fila()
+        with self._cond:
+            agora = time.monotonic()
+            for balde in self.baldes.values():
+                balde._reabastecer(agora)
+            return {
+                "processos": self.processos,
+                "fila": fila,
+                "em_execucao": self.em_execucao,
+                "limite_concorrencia": int(self.limite),
+                "requisicoes_disponiveis": int(self.baldes["requisicoes"].disponivel),
+                "tokens_disponiveis": int(self.baldes["tokens"].disponivel),
+                "latencia_media_s": round(self._latencia_media, 3) if self._latencia_media is not None else None,
+                **self._contadores,
+            }
+
+
+_lock = threading.Lock()
+_agendadores = {}
+
+
+def _ao_receber_429(destino, request):
+    if destino != "openai":
+        return
+    recurso = "embedding" if request.url.path.endswith("/embeddings") else "llm"
+    obter_agendador(recurso).registrar_limite_taxa()
+
+
+def obter_agendador(recurso: str = "llm") -> AgendadorSaida:
+    """
+    Retorna o agendador compartilhado de um recurso ("llm" ou "embedding").
+    """
+    agendador = _agendadores.get(recurso)
+    if agendador is None:
+        with _lock:
+            agendador = _agendadores.get(recurso)
+            if agendador is None:
+                from src.clientes_http import registrar_ouvinte_limite_taxa
+                registrar_ouvinte_limite_taxa(_ao_receber_429)
+                rpm, tpm, inicial, minimo, maximo, alvo = _PADROES.get(recurso, _PADROES["llm"])
+                prefixo = f"AGENDADOR_{recurso.upper()}"
+                processos = max(1, env_int("AGENDADOR_PROCESSOS", 1))
+                minimo = env_int(f"{prefixo}_CONCORRENCIA_MIN", minimo)
+                # Parte deste processo: taxas arredondadas para baixo, concorrência para cima
+                maximo = max(minimo, -(-env_int(f"{prefixo}_CONCORRENCIA_MAX", maximo) // processos))
+                agendador = AgendadorSaida(
+                    recurso,
+                    rpm=max(1, env_int(f"{prefixo}_RPM", rpm) // processos),
+                    tpm=max(1, env_int(f"{prefixo}_TPM", tpm) // processos),
+                    concorrencia_inicial=min(maximo, max(minimo, -(-env_int(f"{prefixo}_CONCORRENCIA_INICIAL", inicial) // processos))),
+                    concorrencia_min=minimo,
+                    concorrencia_max=maximo,
+                    latencia_alvo=env_float(f"{prefixo}_LATENCIA_ALVO", alvo),
+                    processos=processos,
+                )
+                _agendadores[recurso] = agendador
+    return agendador
+
+
+def executar_agendado(funcao, recurso: str = "llm", tokens_estimados: int = 1, prioridade: str = None,
+                      respeitar_prazo: bool = True):
+    """
+    Executa `funcao` respeitando os limites do agendador do recurso.
+
+    Args:
+        funcao: Função sem argumentos que faz a chamada externa
+        recurso: "llm" ou "embedding"
+        tokens_estimados: Tokens estimados da chamada
+        prioridade: Classe de prioridade (padrão: a do contexto corrente)
+        respeitar_prazo: Desiste da espera na fila quando o prazo acaba (ver permissao)
+
+    Returns:
+        O retorno de `funcao`
+
+    Raises:
+        PrazoEsgotadoError: Se o prazo acabar na fila
+    """
+    agendador = obter_agendador(recurso)
+    with agendador.permissao(tokens_estimados, prioridade, respeitar_prazo):
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            agendador.registrar_resultado(erro=e)
+            raise
+        agendador.registrar_resultado(latencia=time.perf_counter() - inicio)
+        return resultado
+
+
+def obter_estado_agendadores():
+    """Retorna o estado de todos os agendadores criados."""
+    return {recurso: agendador.resumo() for recurso, agendador in list(_agendadores.items())}
+
+
+registrar_fonte_metricas("agendador", obter_estado_agendadores)
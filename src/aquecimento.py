@@ -0,0 +1,110 @@
+"""
+Aquecimento (warm-up) da aplicação e estado de prontidão.
+
+O aquecimento roda uma vez na subida da API (lifespan do FastAPI) e prepara, fora
+do caminho das requisições, os objetos caros: catálogo local, prompts, clientes
+externos e processadores com suas chains. Falhas em uma etapa não impedem a subida; ficam
+registradas no estado reportado pelo endpoint de prontidão.
+"""
+import threading
+import time
+from loguru import logger
+
+
+def _aquecer_catalogo():
+    from src.catalogo import obter_indice_catalogo
+    return f"{len(obter_indice_catalogo().por_codigo)} procedimentos indexados"
+
+
+def _aquecer_indice_local():
+    from src.indice_local import backend_local_habilitado, obter_indice_local
+    if not backend_local_habilitado():
+        return "desabilitado"
+    return f"{len(obter_indice_local().metadados)} procedimentos"
+
+
+def _aquecer_prompts():
+    from src.registro_prompts import obter_registro_prompts
+    return f"{len(obter_registro_prompts().carregar_todos())} prompts"
+
+
+def _aquecer_clientes():
+    from src.clientes import obter_cliente_supabase, obter_cliente_openai
+    obter_cliente_openai()
+    obter_cliente_supabase()
+
+
+def _aquecer_processador():
+    from src.flows.fluxo_chain import obter_processador
+    obter_processador()
+
+
+def _aquecer_grafo_fluxos():
+    from src.flows.config_fluxos import obter_grafo_fluxos
+    return f"{len(obter_grafo_fluxos().nos)} nós"
+
+
+# Etapas executadas em ordem; cada uma é (nome, função)
+ETAPAS_AQUECIMENTO = [
+    ("catalogo", _aquecer_catalogo),
+    ("indice_local", _aquecer_indice_local),
+    ("prompts", _aquecer_prompts),
+    ("clientes", _aquecer_clientes),
+    ("processador", _aquecer_processador),
+    ("grafo_fluxos", _aquecer_grafo_fluxos),
+]
+
+_lock = threading.Lock()
+_estado = {
+    "pronto": False,
+    "em_andamento": False,
+    "etapas": {},
+    "duracao_ms": None,
+}
+
+
+def executar_aquecimento():
+    """
+    Executa todas as etapas de aquecimento e atualiza o estado de prontidão.
+
+    Returns:
+        Cópia do estado ao final do aquecimento
+    """
+    with _lock:
+        _estado["em_andamento"] = True
+        _estado["pronto"] = False
+    inicio = time.perf_counter()
+    logger.info("Iniciando aquecimento da aplicação")
+
+    for nome, funcao in ETAPAS_AQUECIMENTO:
+        inicio_etapa = time.perf_counter()
+        try:
+            detalhe = funcao()
+            status = {"ok": True}
+            if detalhe:
+                status["detalhe"] = detalhe
+        except Exception as e:
+            logger.error("Erro na etapa de aquecimento '{nome}': {erro}", nome=nome, erro=e)
+            status = {"ok": False, "erro": str(e)}
+        status["duracao_ms"] = round((time.perf_counter() - inicio_etapa) * 1000, 1)
+        with _lock:
+            _estado["etapas"][nome] = status
+
+    with _lock:
+        _estado["duracao_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        _estado["em_andamento"] = False
+        _estado["pronto"] = True
+    logger.info("Aquecimento concluído em {duracao_ms} ms", duracao_ms=_estado["duracao_ms"])
+    return obter_estado_prontidao()
+
+
+def obter_estado_prontidao():
+    """Retorna uma cópia do estado de prontidão atual."""
+    with _lock:
+        return {
+            "pronto": _estado["pronto"],
+            "em_andamento": _estado["em_andamento"],
+            "etapas": {nome: dict(status) for nome, status in _estado["etapas"].items()},
+            "etapas_com_erro": [nome for nome, status in _estado["etapas"].items() if not status.get("ok")],
+            "duracao_ms": _estado["duracao_ms"],
+        }
@@ -0,0 +1,249 @@
+"""
+Destinos dos embeddings do catálogo usados pela ingestão (src/ingestao_catalogo.py).
+
+Cada armazém expõe a mesma interface:
+    hashes() -> {código: hash do conteúdo já gravado}
+    gravar(linhas) -> número de linhas gravadas (upsert pelo código)
+
+- ArmazemSupabase: a tabela do vector store (TABLE). Requer a coluna
+  hash_conteudo e a restrição única em codigo_procedimento (sql/ingestao_catalogo.sql).
+- ArmazemArquivo: substituto local em um arquivo SQLite, com os embeddings em
+  float32, para testes e para uso sem acesso ao Supabase.
+- ArmazemPostgres: substituto local em Postgres com pgvector (requer psycopg),
+  com a mesma tabela e as funções de sql/match_procedimentos_lote.sql, para testar
+  as RPCs de busca sem o Supabase.
+"""
+import os
+import sqlite3
+import threading
+from src.clientes import TABLE, obter_cliente_supabase
+from src.configuracao import env_str
+from src.vetores import literal_vetor
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAMINHO_ARQUIVO_PADRAO = os.path.join(DIRETORIO_PROJETO, "embeddings_catalogo.sqlite3")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS embeddings_catalogo (
+    codigo_procedimento TEXT PRIMARY KEY,
+    nome_procedimento TEXT,
+    descricao_procedimento TEXT,
+    descricao_e_titulo TEXT,
+    hash_conteudo TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    atualizado_em REAL NOT NULL DEFAULT (julianday('now'))
+);
+"""
+
+
+class ArmazemSupabase:
+    """Embeddings do catálogo na tabela do vector store no Supabase."""
+
+    nome = "supabase"
+
+    def __init__(self, tabela=TABLE, tamanho_pagina=1000):
+        self.tabela = tabela
+        self.tamanho_pagina = tamanho_pagina
+
+    def hashes(self):
+        cliente = obter_cliente_supabase()
+        hashes = {}
+        inicio = 0
+        while True:
+            resposta = (
+                cliente.table(self.tabela)
+                .select("codigo_procedimento,hash_conteudo")
+                .range(inicio, inicio + self.tamanho_pagina - 1)
+                .execute()
+            )
+            linhas = resposta.data or []
+            for linha in linhas:
+                hashes[str(linha["codigo_procedimento"])] = linha.get("hash_conteudo")
+            if len(linhas) < self.tamanho_pagina:
+                return hashes
+            inicio += self.tamanho_pagina
+
+    def gravar(self, linhas):
+        if not linhas:
+            return 0
+        registros = [
+            {
+                "codigo_procedimento": linha["codigo_procedimento"],
+                "nome_procedimento": linha["nome_procedimento"],
+                "descricao_procedimento": linha["descricao_procedimento"],
+                "descricao_e_titulo": linha["descricao_e_titulo"],
+                "hash_conteudo": linha["hash_conteudo"],
+                "embedding_descricao_titulo": literal_vetor(linha["embedding"]),
+            }
+            for linha in linhas
+        ]
+        obter_cliente_supabase().table(self.tabela).upsert(registros, on_conflict="codigo_procedimento").execute()
+        return len(registros)
+
+
+class ArmazemArquivo:
+    """Embeddings do catálogo em um arquivo SQLite local (float32)."""
+
+    nome = "arquivo"
+
+    def __init__(self, caminho=CAMINHO_ARQUIVO_PADRAO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.executescript(_ESQUEMA)
+
+    def hashes(self):
+        with self._lock:
+            linhas = self._conexao.execute("SELECT codigo_procedimento, hash_conteudo FROM embeddings_catalogo").fetchall()
+        return dict(linhas)
+
+    def gravar(self, linhas):
+        import numpy as np
+
+        if not linhas:
+            return 0
+        registros = [
+            (
+                linha["codigo_procedimento"],
+                linha["nome_procedimento"],
+                linha["descricao_procedimento"],
+                linha["descricao_e_titulo"],
+                linha["hash_conteudo"],
+                np.asarray(linha["embedding"], dtype=np.float32).tobytes(),
+            )
+            for linha in linhas
+        ]
+        with self._lock:
+            self._conexao.execute("BEGIN")
+            self._conexao.executemany(
+                "INSERT INTO embeddings_catalogo "
+                "(codigo_procedimento, nome_procedimento, descricao_procedimento, descricao_e_titulo, hash_conteudo, embedding) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(codigo_procedimento) DO UPDATE SET "
+                "nome_procedimento = excluded.nome_procedimento, "
+                "descricao_procedimento = excluded.descricao_procedimento, "
+                "descricao_e_titulo = excluded.descricao_e_titulo, "
+                "hash_conteudo = excluded.hash_conteudo, "
+                "embedding = excluded.embedding, "
+                "atualizado_em = julianday('now')",
+                registros,
+            )
+            self._conexao.execute("COMMIT")
+        return len(registros)
+
+    def carregar(self):
+        """
+        Lê todos os embeddings gravados.
+
+        Returns:
+            Tupla (lista de metadados por linha, matriz float32 com um embedding por linha)
+        """
+        import numpy as np
+
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT codigo_procedimento, nome_procedimento, descricao_procedimento, embedding "
+                "FROM embeddings_catalogo ORDER BY codigo_procedimento"
+            ).fetchall()
+        metadados = [
+            {"codigo_procedimento": codigo, "nome_procedimento": nome, "descricao_procedimento": descricao}
+            for codigo, nome, descricao, _ in linhas
+        ]
+        if not linhas:
+            return metadados, np.zeros((0, 0), dtype=np.float32)
+        return metadados, np.vstack([np.frombuffer(embedding, dtype=np.float32) for *_, embedding in linhas])
+
+
+class ArmazemPostgres:
+    """Embeddings do catálogo em um Postgres local com pgvector."""
+
+    nome = "postgres"
+
+    _ESQUEMA = f"""
+    CREATE EXTENSION IF NOT EXISTS vector;
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        codigo_procedimento text PRIMARY KEY,
+        nome_procedimento text,
+        descricao_procedimento text,
+        descricao_e_titulo text,
+        hash_conteudo text,
+        embedding_descricao_titulo vector
+    );
+    """
+
+    def __init__(self, dsn):
+        try:
+            import psycopg
+        except ImportError as e:
+            raise RuntimeError("O destino 'postgres' requer o pacote psycopg") from e
+        self._lock = threading.Lock()
+        self.conexao = psycopg.connect(dsn, autocommit=True)
+        self.conexao.execute(self._ESQUEMA)
+        with open(os.path.join(DIRETORIO_PROJETO, "sql", "match_procedimentos_lote.sql"), "r", encoding="utf-8") as arquivo:
+            self.conexao.execute(arquivo.read())
+
+    def hashes(self):
+        with self._lock:
+            return dict(self.conexao.execute(f"SELECT codigo_procedimento, hash_conteudo FROM {TABLE}").fetchall())
+
+    def gravar(self, linhas):
+        if not linhas:
+            return 0
+        registros = [
+            (
+                linha["codigo_procedimento"],
+                linha["nome_procedimento"],
+                linha["descricao_procedimento"],
+                linha["descricao_e_titulo"],
+                linha["hash_conteudo"],
+                literal_vetor(linha["embedding"]),
+            )
+            for linha in linhas
+        ]
+        with self._lock, self.conexao.transaction(), self.conexao.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} "
+                "(codigo_procedimento, nome_procedimento, descricao_procedimento, descricao_e_titulo, "
+                "hash_conteudo, embedding_descricao_titulo) VALUES (%s, %s, %s, %s, %s, %s::vector) "
+                "ON CONFLICT (codigo_procedimento) DO UPDATE SET "
+                "nome_procedimento = excluded.nome_procedimento, "
+                "descricao_procedimento = excluded.descricao_procedimento, "
+                "descricao_e_titulo = excluded.descricao_e_titulo, "
+                "hash_conteudo = excluded.hash_conteudo, "
+                "embedding_descricao_titulo = excluded.embedding_descricao_titulo",
+                registros,
+            )
+        return len(registros)
+
+    def match_procedimentos_lote(self, query_embeddings, match_count):
+        """Executa a função de busca em lote e retorna as linhas como dicionários (como a RPC)."""
+        import json
+
+        with self._lock:
+            cursor = self.conexao.execute(
+                "SELECT * FROM match_procedimentos_lote(%s::jsonb, %s)",
+                (json.dumps([literal_vetor(embedding) for embedding in query_embeddings]), match_count),
+            )
+            colunas = [coluna.name for coluna in cursor.description]
+            return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+
+def criar_armazem(destino, caminho=None):
+    """
+    Cria o armazém pelo nome.
+
+    Args:
+        destino: "supabase", "arquivo" ou "postgres"
+        caminho: Caminho do arquivo SQLite ("arquivo") ou DSN ("postgres", padrão: POSTGRES_LOCAL_DSN)
+    """
+    if destino == "supabase":
+        return ArmazemSupabase()
+    if destino == "arquivo":
+        return ArmazemArquivo(caminho or CAMINHO_ARQUIVO_PADRAO)
+    if destino == "postgres":
+        dsn = caminho or env_str("POSTGRES_LOCAL_DSN")
+        if not dsn:
+            raise ValueError("Informe o DSN do Postgres local (--arquivo ou POSTGRES_LOCAL_DSN)")
+        return ArmazemPostgres(dsn)
+    raise ValueError(f"Destino desconhecido: {destino}")
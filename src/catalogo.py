@@ -0,0 +1,210 @@
+"""
+Catálogo local de procedimentos (SIGTAP) carregado a partir do CSV do projeto.
+
+O catálogo é lido uma única vez e indexado em memória por código e por nome
+normalizado (IndiceCatalogo), para consultas de valores sem I/O: enriquecimento
+das decodificações e os endpoints /procedimentos/ da API.
+"""
+import csv
+import os
+import re
+import threading
+import unicodedata
+from loguru import logger
+from src.configuracao import env_str
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAMINHO_CATALOGO_PADRAO = os.path.join(DIRETORIO_PROJETO, "top_15_procedimentos - top_15_procedimentos.csv")
+
+_lock = threading.Lock()
+_catalogo = None
+_indice = None
+
+CAMPOS_VALORES = ("servico_hospitalar", "servico_profissional", "total_hospitalar", "total_ambulatorial")
+
+
+def caminho_catalogo():
+    """Retorna o caminho do CSV do catálogo (configurável por CATALOGO_CSV)."""
+    return env_str("CATALOGO_CSV") or CAMINHO_CATALOGO_PADRAO
+
+
+def carregar_catalogo_local(caminho=None):
+    """
+    Lê o CSV do catálogo e retorna a lista de procedimentos.
+
+    A coluna de embedding não é mantida em memória aqui.
+
+    Args:
+        caminho: Caminho do CSV (opcional)
+
+    Returns:
+        Lista de dicionários com código, nome, descrição e valores do procedimento
+    """
+    caminho = caminho or caminho_catalogo()
+    procedimentos = []
+    with open(caminho, "r", encoding="utf-8", newline="") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            procedimentos.append({
+                "codigo_procedimento": linha.get("Código do Procedimento", "").strip(),
+                "nome_procedimento": linha.get("Nome do Procedimento", "").strip(),
+                "descricao_procedimento": linha.get("Descrição do Procedimento", "").strip(),
+                "servico_hospitalar": _valor(linha.get("Serviço Hospitalar")),
+                "servico_profissional": _valor(linha.get("Serviço Profissional")),
+                "total_hospitalar": _valor(linha.get("Total Hospitalar")),
+                "total_ambulatorial": _valor(linha.get("Total Ambulatorial")),
+            })
+    logger.info("Catálogo local carregado: {total} procedimentos", total=len(procedimentos))
+    return procedimentos
+
+
+def obter_catalogo():
+    """Retorna o catálogo local, carregando-o na primeira chamada."""
+    global _catalogo
+    if _catalogo is None:
+        with _lock:
+            if _catalogo is None:
+                _catalogo = carregar_catalogo_local()
+    return _catalogo
+
+
+def _valor(texto):
+    """Converte um valor monetário do CSV em float (None se vazio ou inválido)."""
+    try:
+        return float(texto) if texto not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def normalizar_codigo(codigo) -> str:
+    """Normaliza um código SIGTAP: apenas dígitos, sem zeros à esquerda ("04.07.03.007-7" -> "407030077")."""
+    return re.sub(r"\D", "", str(codigo or "")).lstrip("0")
+
+
+def extrair_codigos(texto) -> list:
+    """Extrai os códigos SIGTAP (normalizados, sem repetição) de um texto como "0407030077, 0407040099"."""
+    codigos = []
+    for candidato in re.findall(r"\d[\d.\-]{6,}\d", str(texto or "")):
+        codigo = normalizar_codigo(candidato)
+        if codigo and codigo not in codigos:
+            codigos.append(codigo)
+    return codigos
+
+
+class IndiceCatalogo:
+    """Catálogo indexado por código, por nome normalizado e pelos termos da busca lexical."""
+
+    def __init__(self, procedimentos):
+        self.procedimentos = procedimentos
+        self.por_codigo = {}
+        self.por_nome = {}
+        self.termos = []
+        for procedimento in procedimentos:
+            self.por_codigo.setdefault(normalizar_codigo(procedimento["codigo_procedimento"]), procedimento)
+            self.por_nome.setdefault(_chave_nome(procedimento["nome_procedimento"]), procedimento)
+            self.termos.append((
+                _termos(procedimento["nome_procedimento"]),
+                _termos(procedimento["descricao_procedimento"]),
+                procedimento,
+            ))
+
+    def por_codigos(self, codigos):
+        """Retorna {código informado: procedimento ou None}."""
+        return {codigo: self.por_codigo.get(normalizar_codigo(codigo)) for codigo in codigos}
+
+    def por_nomes(self, nomes):
+        """Retorna {nome informado: procedimento ou None}, sem diferenciar caixa e acentos."""
+        return {nome: self.por_nome.get(_chave_nome(nome)) for nome in nomes}
+
+
+def obter_indice_catalogo():
+    """Retorna o índice do catálogo local, construído na primeira chamada."""
+    global _indice
+    if _indice is None:
+        catalogo = obter_catalogo()
+        with _lock:
+            if _indice is None:
+                _indice = IndiceCatalogo(catalogo)
+    return _indice
+
+
+def procedimento_por_codigo(codigo):
+    """Procedimento do catálogo com o código informado (ou None)."""
+    return obter_indice_catalogo().por_codigo.get(normalizar_codigo(codigo))
+
+
+def valores_decodificacao(decodificacao):
+    """
+    Valores do catálogo para os códigos de uma decodificação, sem I/O.
+
+    Args:
+        decodificacao: Objeto Decodificacao (ou dicionário com "codigo_procedimentos")
+
+    Returns:
+        Lista com um item por código decodificado, com nome e valores do catálogo
+        e "encontrado" indicando se o código existe no catálogo
+    """
+    if isinstance(decodificacao, dict):
+        codigos = decodificacao.get("codigo_procedimentos")
+    else:
+        codigos = getattr(decodificacao, "codigo_procedimentos", None)
+    valores = []
+    for codigo in extrair_codigos(codigos):
+        procedimento = procedimento_por_codigo(codigo)
+        item = {"codigo_procedimento": codigo, "encontrado": procedimento is not None}
+        if procedimento is not None:
+            item["nome_procedimento"] = procedimento["nome_procedimento"]
+            item.update({campo: procedimento[campo] for campo in CAMPOS_VALORES})
+        valores.append(item)
+    return valores
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza o texto para comparação: minúsculas e sem acentos."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _termos(texto: str):
+    return {termo for termo in re.findall(r"[a-z0-9]+", normalizar_texto(texto)) if len(termo) >= 3}
+
+
+def _chave_nome(nome: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", normalizar_texto(nome)))
+
+
+def buscar_no_catalogo_local(consulta: str, match_count: int = 10):
+    """
+    Busca lexical no catálogo local, usada como fallback quando o vector store
+    está indisponível.
+
+    A pontuação é a fração dos termos da consulta presentes no nome/descrição do
+    procedimento, com peso dobrado para termos do nome.
+
+    Args:
+        consulta: Texto da consulta (nomes dos procedimentos)
+        match_count: Número máximo de documentos retornados
+
+    Returns:
+        Lista de documentos no mesmo formato das linhas do vector store
+    """
+    termos_consulta = _termos(consulta)
+    if not termos_consulta:
+        return []
+
+    pontuados = []
+    for termos_nome, termos_descricao, procedimento in obter_indice_catalogo().termos:
+        pontos = sum(2 if termo in termos_nome else 1 if termo in termos_descricao else 0 for termo in termos_consulta)
+        if pontos:
+            pontuados.append((pontos / (2 * len(termos_consulta)), procedimento))
+
+    pontuados.sort(key=lambda item: item[0], reverse=True)
+    return [
+        {
+            "codigo_procedimento": procedimento["codigo_procedimento"],
+            "nome_procedimento": procedimento["nome_procedimento"],
+            "descricao_procedimento": procedimento["descricao_procedimento"],
+            "similarity": round(pontuacao, 4),
+            "origem": "catalogo_local",
+        }
+        for pontuacao, procedimento in pontuados[:match_count]
+    ]
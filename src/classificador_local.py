@@ -0,0 +1,359 @@
+"""
+Classificadores locais leves (CPU, NumPy) para triagem de perguntas binárias.
+
+Usados como primeira camada antes do LLM em:
+- "trauma": VerificacaoTrauma.entrada_por_trauma
+- "peca": IdentificacaoPecaAnatomica.retirada_peca_anatomica
+
+Modelo: TF-IDF sobre unigramas e bigramas de palavras com hashing (sem
+vocabulário) e regressão logística treinada com gradiente em lote sobre a matriz
+esparsa. Os limiares de confiança são calibrados em uma partição de validação:
+abaixo de `limiar_positivo` e acima de `limiar_negativo` o classificador se abstém
+e a decisão fica com o LLM.
+
+Os modelos são treinados com src/treinar_classificadores.py e lidos de
+CLASSIFICADORES_DIR (padrão: diretório "modelos" na raiz do projeto), nos arquivos
+<nome>.npz. Sem o arquivo, o classificador fica desabilitado. Modelos salvos antes
+da versão 2 do hashing (VERSAO_HASHING) continuam funcionando, com a extração de
+características antiga e mais lenta, até serem retreinados.
+"""
+import json
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from loguru import logger
+from src.catalogo import normalizar_texto
+from src.configuracao import env_str
+from src.metricas import registrar_fonte_metricas
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DIMENSAO_PADRAO = 2 ** 18
+
+# Versão do hashing das características. A 1 (zlib.crc32 de cada termo, em
+# Python) custava ~1,3 µs por palavra; a 2 calcula os hashes de todas as palavras
+# e bigramas de uma vez, com NumPy. Os índices mudam entre as versões: modelos
+# salvos sem o campo são da versão 1 e continuam usando o hashing antigo até
+# serem retreinados.
+VERSAO_HASHING = 2
+
+# Pesos por posição do caractere na palavra (potência de 2; palavras mais longas
+# repetem os pesos)
+POSICOES_HASH = 64
+
+_pesos_posicao = None
+
+
+def _misturar(hashes):
+    """Finalizador do splitmix64, sobre um array uint64 (com overflow)."""
+    import numpy as np
+
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def _pesos():
+    global _pesos_posicao
+    if _pesos_posicao is None:
+        import numpy as np
+
+        _pesos_posicao = _misturar(np.arange(1, POSICOES_HASH + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+    return _pesos_posicao
+
+
+def _caracteristicas_v1(texto: str, dimensao: int):
+    palavras = re.findall(r"[a-z0-9]+", normalizar_texto(texto))
+    contagens = {}
+    anterior = None
+    for palavra in palavras:
+        for termo in (palavra, f"{anterior} {palavra}" if anterior else None):
+            if termo is None:
+                continue
+            indice = zlib.crc32(termo.encode("utf-8")) % dimensao
+            contagens[indice] = contagens.get(indice, 0) + 1
+        anterior = palavra
+    return contagens
+
+
+def caracteristicas(texto: str, dimensao: int, versao: int = VERSAO_HASHING):
+    """
+    Extrai as características com hashing (unigramas e bigramas de palavras).
+
+    Na versão 2, o texto é normalizado como em normalizar_texto (NFKD, sem acentos,
+    minúsculas), mas caracteres fora do ASCII são descartados em vez de separarem
+    palavras. O hash de cada palavra é a soma dos códigos dos caracteres com pesos
+    por posição e o de cada bigrama combina os das duas palavras; tudo em arrays,
+    sem laço em Python por palavra.
+
+    Args:
+        texto: Texto do caso
+        dimensao: Número de posições do hashing
+        versao: Versão do hashing (a do modelo)
+
+    Returns:
+        Tupla (índices únicos, contagens), arrays int64
+    """
+    import numpy as np
+
+    if versao == 1:
+        contagens = _caracteristicas_v1(texto, dimensao)
+        return (np.fromiter(contagens.keys(), dtype=np.int64, count=len(contagens)),
+                np.fromiter(contagens.values(), dtype=np.int64, count=len(contagens)))
+
+    dados = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").lower()
+    codigos = np.frombuffer(dados, dtype=np.uint8)
+    alfanumerico = ((codigos >= 97) & (codigos <= 122)) | ((codigos >= 48) & (codigos <= 57))
+    bordas = np.diff(alfanumerico.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    inicios = np.flatnonzero(bordas == 1)
+    if not len(inicios):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    tamanhos = np.flatnonzero(bordas == -1) - inicios
+
+    # Posição de cada caractere dentro da sua palavra, sobre os caracteres alfanuméricos
+    inicios_compactos = np.zeros(len(inicios), dtype=np.int32)
+    np.cumsum(tamanhos[:-1], out=inicios_compactos[1:])
+    posicoes = np.arange(int(tamanhos.sum()), dtype=np.int32) - np.repeat(inicios_compactos, tamanhos)
+    termos = codigos[alfanumerico].astype(np.uint64) * _pesos()[posicoes & (POSICOES_HASH - 1)]
+    palavras = _misturar(np.add.reduceat(termos, inicios_compactos) ^ tamanhos.astype(np.uint64))
+
+    bigramas = palavras[:-1] * np.uint64(0xD6E8FEB86659FD93)
+    bigramas ^= palavras[1:]
+    hashes = np.concatenate([palavras, _misturar(bigramas)])
+    indices, contagens = np.unique(hashes % np.uint64(dimensao), return_counts=True)
+    return indices.astype(np.int64), contagens
+
+
+class ClassificadorTexto:
+    """Regressão logística sobre TF-IDF com hashing e limiares de abstenção."""
+
+    def __init__(self, dimensao=DIMENSAO_PADRAO, versao_hashing=VERSAO_HASHING):
+        self.dimensao = dimensao
+        self.versao_hashing = versao_hashing
+        self.idf = None
+        self.pesos = None
+        self.vies = 0.0
+        self.limiar_positivo = 1.0
+        self.limiar_negativo = 0.0
+        self.metadados = {}
+
+    def _vetor(self, texto):
+        import numpy as np
+
+        indices, contagens = caracteristicas(texto, self.dimensao, self.versao_hashing)
+        if not len(indices):
+            return indices, np.zeros(0, dtype=np.float32)
+        valores = 1.0 + np.log(contagens.astype(np.float32))
+        valores *= self.idf[indices]
+        norma = np.linalg.norm(valores)
+        return indices, valores / norma if norma > 0 else valores
+
+    def _matriz(self, textos):
+        import numpy as np
+
+        linhas, colunas, valores = [], [], []
+        for linha, texto in enumerate(textos):
+            indices, pesos = self._vetor(texto)
+            linhas.append(np.full(len(indices), linha, dtype=np.int64))
+            colunas.append(indices)
+            valores.append(pesos)
+        return np.concatenate(linhas), np.concatenate(colunas), np.concatenate(valores).astype(np.float64)
+
+    def treinar(self, textos, rotulos, iteracoes=300, taxa=2.0, regularizacao=1e-4,
+                fracao_validacao=0.2, precisao_alvo=0.98, semente=42):
+        """
+        Treina o modelo e calibra os limiares de confiança.
+
+        Args:
+            textos: Lista de textos
+            rotulos: Lista de rótulos booleanos (os do LLM)
+            iteracoes: Iterações do gradiente em lote
+            taxa: Taxa de aprendizado
+            regularizacao: Peso da regularização L2
+            fracao_validacao: Fração dos exemplos reservada para calibração
+            precisao_alvo: Concordância mínima com o LLM nas decisões confiantes
+            semente: Semente do embaralhamento
+
+        Returns:
+            Dicionário com as métricas de validação
+        """
+        import numpy as np
+
+        rotulos = np.asarray(rotulos, dtype=np.float64)
+        ordem = np.random.default_rng(semente).permutation(len(textos))
+        n_validacao = max(1, int(len(textos) * fracao_validacao))
+        validacao, treino = ordem[:n_validacao], ordem[n_validacao:]
+        textos_treino = [textos[i] for i in treino]
+
+        # IDF (suavizado) calculado só no treino
+        documentos = np.zeros(self.dimensao, dtype=np.float64)
+        for texto in textos_treino:
+            documentos[caracteristicas(texto, self.dimensao, self.versao_hashing)[0]] += 1
+        self.idf = (np.log((1 + len(textos_treino)) / (1 + documentos)) + 1).astype(np.float32)
+
+        linhas, colunas, valores = self._matriz(textos_treino)
+        y = rotulos[treino]
+        n = len(treino)
+        pesos = np.zeros(self.dimensao, dtype=np.float64)
+        vies = float(np.log((y.mean() + 1e-6) / (1 - y.mean() + 1e-6)))
+        for _ in range(iteracoes):
+            z = np.bincount(linhas, weights=valores * pesos[colunas], minlength=n) + vies
+            erro = 1.0 / (1.0 + np.exp(-z)) - y
+            gradiente = np.bincount(colunas, weights=valores * erro[linhas], minlength=self.dimensao) / n
+            pesos -= taxa * (gradiente + regularizacao * pesos)
+            vies -= taxa * float(erro.mean())
+        self.pesos = pesos.astype(np.float32)
+        self.vies = vies
+
+        probabilidades = np.array([self.prever_proba(textos[i]) for i in validacao])
+        y_validacao = rotulos[validacao].astype(bool)
+        self.limiar_positivo = _calibrar_limiar(probabilidades, y_validacao, precisao_alvo, positivo=True)
+        self.limiar_negativo = _calibrar_limiar(probabilidades, y_validacao, precisao_alvo, positivo=False)
+
+        decididos = (probabilidades >= self.limiar_positivo) | (probabilidades <= self.limiar_negativo)
+        acertos = (probabilidades >= self.limiar_positivo) == y_validacao
+        metricas = {
+            "exemplos_treino": int(n),
+            "exemplos_validacao": int(len(validacao)),
+            "acuracia_validacao": round(float(((probabilidades >= 0.5) == y_validacao).mean()), 4),
+            "cobertura": round(float(decididos.mean()), 4),
+            "concordancia_decididos": round(float(acertos[decididos].mean()), 4) if decididos.any() else None,
+            "limiar_positivo": round(self.limiar_positivo, 4),
+            "limiar_negativo": round(self.limiar_negativo, 4),
+        }
+        self.metadados = {"metricas": metricas, "precisao_alvo": precisao_alvo}
+        return metricas
+
+    def prever_proba(self, texto: str) -> float:
+        """Probabilidade da classe positiva."""
+        import numpy as np
+
+        indices, valores = self._vetor(texto)
+        z = float(np.dot(self.pesos[indices], valores)) + self.vies
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def decidir(self, texto: str):
+        """
+        Retorna (decisão, probabilidade); a decisão é None quando a confiança não
+        atinge os limiares calibrados.
+        """
+        probabilidade = self.prever_proba(texto)
+        if probabilidade >= self.limiar_positivo:
+            return True, probabilidade
+        if probabilidade <= self.limiar_negativo:
+            return False, probabilidade
+        return None, probabilidade
+
+    def salvar(self, caminho):
+        import numpy as np
+
+        np.savez_compressed(
+            caminho,
+            idf=self.idf,
+            pesos=self.pesos,
+            parametros=np.array(json.dumps({
+                "dimensao": self.dimensao,
+                "versao_hashing": self.versao_hashing,
+                "vies": self.vies,
+                "limiar_positivo": self.limiar_positivo,
+                "limiar_negativo": self.limiar_negativo,
+                "metadados": self.metadados,
+            })),
+        )
+
+    @classmethod
+    def carregar(cls, caminho):
+        import numpy as np
+
+        with np.load(caminho) as dados:
+            parametros = json.loads(str(dados["parametros"]))
+            classificador = cls(parametros["dimensao"], parametros.get("versao_hashing", 1))
+            classificador.idf = dados["idf"]
+            classificador.pesos = dados["pesos"]
+        classificador.vies = parametros["vies"]
+        classificador.limiar_positivo = parametros["limiar_positivo"]
+        classificador.limiar_negativo = parametros["limiar_negativo"]
+        classificador.metadados = parametros.get("metadados", {})
+        return classificador
+
+
+def _calibrar_limiar(probabilidades, rotulos, precisao_alvo, positivo):
+    """
+    Escolhe o limiar mais permissivo em que as decisões confiantes concordam com os
+    rótulos em pelo menos `precisao_alvo`. Sem limiar viável, o lado fica desligado.
+    """
+    import numpy as np
+
+    # Positivo: do menor limiar para o maior; negativo: do maior para o menor
+    candidatos = np.unique(probabilidades)
+    candidatos = candidatos[candidatos >= 0.5] if positivo else candidatos[candidatos <= 0.5][::-1]
+    for limiar in candidatos:
+        selecionados = probabilidades >= limiar if positivo else probabilidades <= limiar
+        if (rotulos[selecionados] == positivo).mean() >= precisao_alvo:
+            return float(limiar)
+    return 1.01 if positivo else -0.01
+
+
+_lock = threading.Lock()
+_classificadores = {}
+_contadores = {}
+
+
+def diretorio_classificadores():
+    return env_str("CLASSIFICADORES_DIR") or os.path.join(DIRETORIO_PROJETO, "modelos")
+
+
+def obter_classificador(nome: str):
+    """Retorna o classificador treinado (ou None se não houver modelo salvo)."""
+    if nome not in _classificadores:
+        with _lock:
+            if nome not in _classificadores:
+                caminho = os.path.join(diretorio_classificadores(), f"{nome}.npz")
+                classificador = None
+                if os.path.exists(caminho):
+                    try:
+                        classificador = ClassificadorTexto.carregar(caminho)
+                        logger.info("Classificador local '{nome}' carregado de {caminho}", nome=nome, caminho=caminho)
+                        if classificador.versao_hashing < VERSAO_HASHING:
+                            logger.warning(
+                                "Classificador local '{nome}' usa o hashing v{versao} (mais lento); retreine-o",
+                                nome=nome, versao=classificador.versao_hashing,
+                            )
+                    except Exception as e:
+                        logger.error("Erro ao carregar classificador local '{nome}': {erro}", nome=nome, erro=e)
+                _classificadores[nome] = classificador
+                _contadores[nome] = {"decididos": 0, "encaminhados_llm": 0}
+    return _classificadores[nome]
+
+
+def decidir_localmente(nome: str, texto: str):
+    """
+    Tenta decidir a pergunta binária com o classificador local.
+
+    Returns:
+        Tupla (decisão, probabilidade); decisão None se não há modelo ou se a
+        confiança é insuficiente
+    """
+    classificador = obter_classificador(nome)
+    if classificador is None:
+        return None, None
+    decisao, probabilidade = classificador.decidir(texto)
+    with _lock:
+        _contadores[nome]["decididos" if decisao is not None else "encaminhados_llm"] += 1
+    return decisao, probabilidade
+
+
+def resumo_classificadores():
+    with _lock:
+        return {
+            nome: {"carregado": _classificadores.get(nome) is not None, **contadores}
+            for nome, contadores in _contadores.items()
+        }
+
+
+registrar_fonte_metricas("classificadores_locais", resumo_classificadores)
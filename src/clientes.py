@@ -0,0 +1,106 @@
+"""
+Construção preguiçosa (lazy) dos clientes externos: OpenAI, LangChain e Supabase.
+
+Nenhum cliente é criado durante a importação deste módulo. As bibliotecas pesadas
+(langchain_openai, openai, supabase) só são importadas na primeira chamada de cada
+getter, e a instância criada é reaproveitada pelo restante do processo.
+
+Todos os clientes usam os clientes httpx compartilhados de src.clientes_http, de
+modo que as conexões (TCP/TLS) são reaproveitadas entre chamadas.
+"""
+import threading
+from src.configuracao import env_str
+
+TABLE = "tabela_embeddings_grupo_02_04"
+FUNC_NAME = "match_procedimentos"
+FUNC_NAME_LOTE = "match_procedimentos_lote"
+
+_lock = threading.RLock()
+_supabase = None
+_openai = None
+_embeddings = None
+_llms = {}
+
+
+def obter_chave_openai():
+    """Retorna a chave da API da OpenAI configurada no ambiente."""
+    return env_str("OPENAI_API_KEY")
+
+
+def obter_cliente_supabase():
+    """
+    Retorna o cliente do Supabase, criando-o na primeira chamada.
+
+    Raises:
+        Exception: Se SUPABASE_URL ou SERVICE_KEY_SUPABASE não estiverem configuradas
+    """
+    global _supabase
+    if _supabase is None:
+        with _lock:
+            if _supabase is None:
+                from supabase import create_client
+                from supabase.lib.client_options import SyncClientOptions
+                from src.clientes_http import obter_cliente_http
+                _supabase = create_client(
+                    env_str("SUPABASE_URL"),
+                    env_str("SERVICE_KEY_SUPABASE"),
+                    options=SyncClientOptions(httpx_client=obter_cliente_http("supabase"))
+                )
+    return _supabase
+
+
+def obter_cliente_openai():
+    """Retorna o cliente da OpenAI (usado para embeddings), criando-o na primeira chamada."""
+    global _openai
+    if _openai is None:
+        with _lock:
+            if _openai is None:
+                from openai import OpenAI
+                from src.clientes_http import obter_cliente_http
+                _openai = OpenAI(api_key=obter_chave_openai(), http_client=obter_cliente_http("openai"))
+    return _openai
+
+
+def obter_embeddings():
+    """Retorna o OpenAIEmbeddings do LangChain, criando-o na primeira chamada."""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from langchain_openai import OpenAIEmbeddings
+                from src.clientes_http import obter_cliente_http
+                _embeddings = OpenAIEmbeddings(
+                    openai_api_key=obter_chave_openai(),
+                    http_client=obter_cliente_http("openai")
+                )
+    return _embeddings
+
+
+def obter_llm(model_name="gpt-4o-mini", temperature=0):
+    """
+    Retorna o ChatOpenAI para o par (modelo, temperatura), criando-o na primeira chamada.
+
+    Args:
+        model_name: Nome do modelo
+        temperature: Temperatura de geração
+
+    Returns:
+        Instância compartilhada de ChatOpenAI
+    """
+    chave = (model_name, temperature)
+    llm = _llms.get(chave)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(chave)
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+                from src.clientes_http import obter_cliente_http, obter_cliente_http_assincrono
+                llm = ChatOpenAI(
+                    openai_api_key=obter_chave_openai(),
+                    model=model_name,
+                    temperature=temperature,
+                    http_client=obter_cliente_http("openai"),
+                    http_async_client=obter_cliente_http_assincrono("openai")
+                )
+                _llms[chave] = llm
+    return llm
@@ -0,0 +1,262 @@
+"""
+Camada HTTP compartilhada pelas chamadas externas (OpenAI e Supabase).
+
+Todos os clientes são httpx com pool de conexões e keep-alive configuráveis, e
+opcionalmente HTTP/2. Há um cliente por destino, criado sob demanda e reaproveitado
+pelo processo inteiro, para que as conexões TCP/TLS sejam reutilizadas entre
+requisições. O transporte é instrumentado para contar requisições e conexões
+novas, o que permite reportar a taxa de reuso de conexões.
+
+Configuração (variáveis de ambiente):
+    HTTP_MAX_CONEXOES: máximo de conexões simultâneas por cliente (padrão 100)
+    HTTP_MAX_KEEPALIVE: máximo de conexões ociosas mantidas abertas (padrão 20)
+    HTTP_KEEPALIVE_EXPIRY: segundos até fechar uma conexão ociosa (padrão 30)
+    HTTP_HTTP2: habilita HTTP/2 quando o pacote h2 está instalado (padrão desligado)
+    HTTP_TIMEOUT: timeout total de leitura/escrita em segundos (padrão 60)
+    HTTP_TIMEOUT_CONEXAO: timeout de conexão em segundos (padrão 10)
+"""
+import threading
+import weakref
+import httpx
+from loguru import logger
+from src.configuracao import env_bool, env_float, env_int
+from src.metricas import registrar_fonte_metricas
+
+
+class EstatisticasConexoes:
+    """Contadores de requisições e conexões novas de um cliente HTTP."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self._lock = threading.Lock()
+        self._conexoes_vistas = weakref.WeakSet()
+        self.requisicoes = 0
+        self.conexoes_novas = 0
+        self.erros = 0
+        self.respostas_429 = 0
+
+    def registrar(self, stream):
+        with self._lock:
+            self.requisicoes += 1
+            if stream is None:
+                return
+            try:
+                if stream not in self._conexoes_vistas:
+                    self._conexoes_vistas.add(stream)
+                    self.conexoes_novas += 1
+            except TypeError:
+                self.conexoes_novas += 1
+
+    def registrar_429(self):
+        with self._lock:
+            self.respostas_429 += 1
+
+    def registrar_erro(self):
+        with self._lock:
+            self.erros += 1
+
+    def resumo(self):
+        with self._lock:
+            reusadas = max(self.requisicoes - self.conexoes_novas, 0)
+            return {
+                "requisicoes": self.requisicoes,
+                "conexoes_novas": self.conexoes_novas,
+                "requisicoes_em_conexao_reusada": reusadas,
+                "taxa_reuso": round(reusadas / self.requisicoes, 4) if self.requisicoes else None,
+                "conexoes_abertas": len(self._conexoes_vistas),
+                "erros": self.erros,
+                "respostas_429": self.respostas_429,
+            }
+
+
+_ouvintes_limite_taxa = []
+
+
+def registrar_ouvinte_limite_taxa(funcao):
+    """
+    Registra uma função chamada a cada resposta 429 recebida por qualquer cliente.
+
+    Inclui as respostas que o SDK da OpenAI trata com retry interno e que, por isso,
+    nunca chegam ao chamador como exceção.
+
+    Args:
+        funcao: Função que recebe (destino, request)
+    """
+    if funcao not in _ouvintes_limite_taxa:
+        _ouvintes_limite_taxa.append(funcao)
+
+
+def _notificar_limite_taxa(estatisticas, request):
+    estatisticas.registrar_429()
+    for funcao in list(_ouvintes_limite_taxa):
+        try:
+            funcao(estatisticas.destino, request)
+        except Exception as e:
+            logger.error("Erro no ouvinte de limite de taxa: {erro}", erro=e)
+
+
+class _TransporteInstrumentado(httpx.HTTPTransport):
+    def __init__(self, estatisticas, **kwargs):
+        super().__init__(**kwargs)
+        self._estatisticas = estatisticas
+
+    def handle_request(self, request):
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self._estatisticas.registrar_erro()
+            raise
+        self._estatisticas.registrar(response.extensions.get("network_stream"))
+        if response.status_code == 429:
+            _notificar_limite_taxa(self._estatisticas, request)
+        return response
+
+
+class _TransporteAssincronoInstrumentado(httpx.AsyncHTTPTransport):
+    def __init__(self, estatisticas, **kwargs):
+        super().__init__(**kwargs)
+        self._estatisticas = estatisticas
+
+    async def handle_async_request(self, request):
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            self._estatisticas.registrar_erro()
+            raise
+        self._estatisticas.registrar(response.extensions.get("network_stream"))
+        if response.status_code == 429:
+            _notificar_limite_taxa(self._estatisticas, request)
+        return response
+
+
+def obter_configuracao_http():
+    """Retorna a configuração do pool HTTP lida do ambiente."""
+    return {
+        "max_conexoes": env_int("HTTP_MAX_CONEXOES", 100),
+        "max_keepalive": env_int("HTTP_MAX_KEEPALIVE", 20),
+        "keepalive_expiry": env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+        "http2": env_bool("HTTP_HTTP2", False),
+        "timeout": env_float("HTTP_TIMEOUT", 60.0),
+        "timeout_conexao": env_float("HTTP_TIMEOUT_CONEXAO", 10.0),
+    }
+
+
+def _http2_disponivel():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _parametros_transporte(config):
+    http2 = config["http2"]
+    if http2 and not _http2_disponivel():
+        logger.warning("HTTP/2 solicitado, mas o pacote 'h2' não está instalado; usando HTTP/1.1")
+        http2 = False
+    return {
+        "limits": httpx.Limits(
+            max_connections=config["max_conexoes"],
+            max_keepalive_connections=config["max_keepalive"],
+            keepalive_expiry=config["keepalive_expiry"],
+        ),
+        "http2": http2,
+    }
+
+
+def _timeout(config):
+    return httpx.Timeout(config["timeout"], connect=config["timeout_conexao"])
+
+
+_lock = threading.Lock()
+_clientes = {}
+_estatisticas = {}
+
+
+def _estatisticas_destino(destino):
+    if destino not in _estatisticas:
+        _estatisticas[destino] = EstatisticasConexoes(destino)
+    return _estatisticas[destino]
+
+
+def obter_cliente_http(destino: str) -> httpx.Client:
+    """
+    Retorna o cliente httpx síncrono compartilhado para um destino.
+
+    Args:
+        destino: Nome lógico do destino (por exemplo "openai" ou "supabase")
+
+    Returns:
+        httpx.Client com pool de conexões e keep-alive
+    """
+    chave = (destino, "sync")
+    cliente = _clientes.get(chave)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes.get(chave)
+            if cliente is None:
+                config = obter_configuracao_http()
+                transporte = _TransporteInstrumentado(_estatisticas_destino(destino), **_parametros_transporte(config))
+                cliente = httpx.Client(transport=transporte, timeout=_timeout(config), follow_redirects=True)
+                _clientes[chave] = cliente
+                logger.info("Cliente HTTP '{destino}' criado (http2={http2})", destino=destino, http2=transporte_http2(config))
+    return cliente
+
+
+def obter_cliente_http_assincrono(destino: str) -> httpx.AsyncClient:
+    """
+    Retorna o cliente httpx assíncrono compartilhado para um destino.
+
+    Args:
+        destino: Nome lógico do destino (por exemplo "openai")
+
+    Returns:
+        httpx.AsyncClient com pool de conexões e keep-alive
+    """
+    chave = (destino, "async")
+    cliente = _clientes.get(chave)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes.get(chave)
+            if cliente is None:
+                config = obter_configuracao_http()
+                transporte = _TransporteAssincronoInstrumentado(
+                    _estatisticas_destino(destino), **_parametros_transporte(config)
+                )
+                cliente = httpx.AsyncClient(transport=transporte, timeout=_timeout(config), follow_redirects=True)
+                _clientes[chave] = cliente
+    return cliente
+
+
+def transporte_http2(config):
+    """Indica se o HTTP/2 está efetivamente habilitado para a configuração."""
+    return config["http2"] and _http2_disponivel()
+
+
+def obter_estatisticas_http():
+    """
+    Retorna as estatísticas de reuso de conexões de todos os destinos.
+
+    Returns:
+        Dicionário com a configuração do pool e os contadores por destino
+    """
+    config = obter_configuracao_http()
+    return {
+        "configuracao": {**config, "http2_efetivo": transporte_http2(config)},
+        "destinos": {destino: estatisticas.resumo() for destino, estatisticas in list(_estatisticas.items())},
+    }
+
+
+def fechar_clientes_http():
+    """Fecha os clientes síncronos abertos (usado no desligamento da aplicação)."""
+    with _lock:
+        for (destino, tipo), cliente in list(_clientes.items()):
+            if tipo == "sync":
+                try:
+                    cliente.close()
+                except Exception as e:
+                    logger.error("Erro ao fechar cliente HTTP '{destino}': {erro}", destino=destino, erro=e)
+                del _clientes[(destino, tipo)]
+
+
+registrar_fonte_metricas("http", obter_estatisticas_http)
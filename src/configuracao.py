@@ -0,0 +1,59 @@
+"""
+Leitura centralizada das variáveis de ambiente do projeto.
+
+O arquivo .env é carregado apenas uma vez e somente quando alguma configuração
+é de fato solicitada, evitando efeitos colaterais durante a importação dos módulos.
+"""
+import os
+import threading
+
+_lock_env = threading.Lock()
+_env_carregado = False
+
+
+def carregar_variaveis_ambiente():
+    """Carrega o arquivo .env (uma única vez por processo)."""
+    global _env_carregado
+    if _env_carregado:
+        return
+    with _lock_env:
+        if _env_carregado:
+            return
+        try:
+            import dotenv
+            dotenv.load_dotenv()
+        except ImportError:
+            pass
+        _env_carregado = True
+
+
+def env_str(nome: str, padrao: str = None) -> str:
+    """Retorna uma variável de ambiente como string."""
+    carregar_variaveis_ambiente()
+    return os.getenv(nome, padrao)
+
+
+def env_int(nome: str, padrao: int) -> int:
+    """Retorna uma variável de ambiente como inteiro, usando o padrão se ausente ou inválida."""
+    valor = env_str(nome)
+    try:
+        return int(valor) if valor not in (None, "") else padrao
+    except ValueError:
+        return padrao
+
+
+def env_float(nome: str, padrao: float) -> float:
+    """Retorna uma variável de ambiente como float, usando o padrão se ausente ou inválida."""
+    valor = env_str(nome)
+    try:
+        return float(valor) if valor not in (None, "") else padrao
+    except ValueError:
+        return padrao
+
+
+def env_bool(nome: str, padrao: bool = False) -> bool:
+    """Retorna uma variável de ambiente como booleano ("1", "true", "sim", "yes", "on")."""
+    valor = env_str(nome)
+    if valor in (None, ""):
+        return padrao
+    return valor.strip().lower() in ("1", "true", "sim", "yes", "on")
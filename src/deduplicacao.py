@@ -0,0 +1,145 @@
+"""
+Canonicalização de entradas e detecção de quase-duplicatas (MinHash + LSH).
+
+Lotes costumam trazer a mesma descrição cirúrgica de modelo com apenas nome do
+paciente ou datas trocados. A canonicalização (espaços, caixa, acentos, datas e
+números) gera chaves estáveis para duplicatas exatas; o índice MinHash/LSH
+encontra as quase-duplicatas, para que só um representante de cada grupo passe
+pelo processamento completo.
+"""
+import hashlib
+import re
+import zlib
+from src.catalogo import normalizar_texto
+
+# Maior primo menor que 2**32: com coeficientes e hashes de 32 bits, a*x + b cabe em uint64
+_PRIMO = 4294967291
+
+_PADRAO_DATA = re.compile(
+    r"\b\d{1,2}\s*[/.-]\s*\d{1,2}(\s*[/.-]\s*\d{2,4})?\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}\s+de\s+[a-z]+\s+de\s+\d{4}\b"
+)
+_PADRAO_HORA = re.compile(r"\b\d{1,2}\s*(:|h)\s*\d{2}\b")
+_PADRAO_NUMERO = re.compile(r"\d+([.,]\d+)*")
+
+
+def canonicalizar(texto: str) -> str:
+    """
+    Forma canônica do texto: minúsculas, sem acentos, datas/horas/números
+    substituídos por marcadores e espaços normalizados.
+    """
+    texto = normalizar_texto(texto)
+    texto = _PADRAO_DATA.sub(" <data> ", texto)
+    texto = _PADRAO_HORA.sub(" <hora> ", texto)
+    texto = _PADRAO_NUMERO.sub(" <num> ", texto)
+    return " ".join(texto.split())
+
+
+def chave_cache(texto: str, laudo: str = None) -> str:
+    """Chave estável (SHA-256) da entrada canonicalizada (descrição e laudo)."""
+    conteudo = canonicalizar(texto) + "\x1f" + canonicalizar(laudo or "")
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class IndiceMinHash:
+    """Índice MinHash com LSH por bandas para busca de quase-duplicatas."""
+
+    def __init__(self, num_permutacoes=128, bandas=32, tamanho_shingle=5, semente=1):
+        """
+        Args:
+            num_permutacoes: Tamanho da assinatura MinHash
+            bandas: Número de bandas do LSH (deve dividir num_permutacoes)
+            tamanho_shingle: Palavras por shingle
+            semente: Semente das funções de hash
+        """
+        import numpy as np
+
+        if num_permutacoes % bandas:
+            raise ValueError("num_permutacoes deve ser múltiplo de bandas")
+        gerador = np.random.default_rng(semente)
+        self.a = gerador.integers(1, _PRIMO, num_permutacoes, dtype=np.uint64)
+        self.b = gerador.integers(0, _PRIMO, num_permutacoes, dtype=np.uint64)
+        self.bandas = bandas
+        self.linhas_banda = num_permutacoes // bandas
+        self.tamanho_shingle = tamanho_shingle
+        self.assinaturas = {}
+        self._baldes = {}
+
+    def assinatura(self, texto_canonico: str):
+        """Calcula a assinatura MinHash do texto (já canonicalizado)."""
+        import numpy as np
+
+        palavras = texto_canonico.split()
+        n = self.tamanho_shingle
+        shingles = {" ".join(palavras[i:i + n]) for i in range(max(1, len(palavras) - n + 1))}
+        valores = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        return ((self.a[:, None] * valores[None, :] + self.b[:, None]) % np.uint64(_PRIMO)).min(axis=1)
+
+    def _chaves_bandas(self, assinatura):
+        for banda in range(self.bandas):
+            inicio = banda * self.linhas_banda
+            yield banda, assinatura[inicio:inicio + self.linhas_banda].tobytes()
+
+    def adicionar(self, identificador, assinatura):
+        """Adiciona uma assinatura ao índice."""
+        self.assinaturas[identificador] = assinatura
+        for chave in self._chaves_bandas(assinatura):
+            self._baldes.setdefault(chave, []).append(identificador)
+
+    def candidatos(self, assinatura):
+        """Retorna os identificadores que compartilham ao menos uma banda com a assinatura."""
+        encontrados = []
+        vistos = set()
+        for chave in self._chaves_bandas(assinatura):
+            for identificador in self._baldes.get(chave, ()):
+                if identificador not in vistos:
+                    vistos.add(identificador)
+                    encontrados.append(identificador)
+        return encontrados
+
+    def similaridade(self, assinatura, identificador) -> float:
+        """Estimativa da similaridade de Jaccard com um item do índice."""
+        return float((self.assinaturas[identificador] == assinatura).mean())
+
+
+def agrupar_casos(casos, limiar=0.85):
+    """
+    Agrupa os casos em duplicatas exatas (mesma chave canônica) e quase-duplicatas.
+
+    Cada caso é comparado apenas com os representantes já escolhidos (sem
+    encadeamento), então todo membro tem similaridade estimada >= limiar com o
+    representante do seu grupo.
+
+    Args:
+        casos: Lista de dicionários com "text" e, opcionalmente, "laudo"
+        limiar: Similaridade de Jaccard estimada mínima para quase-duplicata
+
+    Returns:
+        Lista alinhada aos casos com (índice do representante, tipo, similaridade),
+        em que tipo é "representante", "exata" ou "quase_duplicata"
+    """
+    indice = IndiceMinHash()
+    por_chave = {}
+    grupos = []
+    for posicao, caso in enumerate(casos):
+        chave = chave_cache(caso.get("text", ""), caso.get("laudo"))
+        if chave in por_chave:
+            grupos.append((por_chave[chave], "exata", 1.0))
+            continue
+        canonico = canonicalizar(caso.get("text", "")) + " " + canonicalizar(caso.get("laudo") or "")
+        assinatura = indice.assinatura(canonico)
+        melhor, melhor_similaridade = None, 0.0
+        for candidato in indice.candidatos(assinatura):
+            similaridade = indice.similaridade(assinatura, candidato)
+            if similaridade > melhor_similaridade:
+                melhor, melhor_similaridade = candidato, similaridade
+        if melhor is not None and melhor_similaridade >= limiar:
+            grupos.append((melhor, "quase_duplicata", round(melhor_similaridade, 4)))
+            continue
+        por_chave[chave] = posicao
+        indice.adicionar(posicao, assinatura)
+        grupos.append((posicao, "representante", 1.0))
+    return grupos
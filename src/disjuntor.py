@@ -0,0 +1,218 @@
+"""
+Disjuntores (circuit breakers) para as dependências externas.
+
+Cada dependência ("llm", "embedding", "recuperacao") tem um disjuntor:
+- fechado: as chamadas passam normalmente; falhas consecutivas são contadas;
+- aberto: após DISJUNTOR_FALHAS falhas seguidas, as chamadas falham imediatamente
+  com DisjuntorAbertoError, e o chamador usa seu fallback (catálogo local ou
+  heurística) sem esperar o timeout da dependência;
+- meio_aberto: após DISJUNTOR_TEMPO_ABERTO segundos, uma chamada de sonda é
+  liberada; se ela funcionar o disjuntor fecha, se falhar volta a abrir.
+
+Configuração (variáveis de ambiente; aceitam sufixo por dependência, por exemplo
+DISJUNTOR_RECUPERACAO_FALHAS):
+    DISJUNTOR_FALHAS: falhas consecutivas para abrir (padrão 5)
+    DISJUNTOR_TEMPO_ABERTO: segundos até liberar a sonda (padrão 30)
+"""
+import threading
+import time
+from loguru import logger
+from src.configuracao import env_float, env_int
+from src.metricas import registrar_fonte_metricas
+from src.prazo import PrazoEsgotadoError
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+# Exceções de cliente que indicam problema na dependência (e não na requisição)
+_NOMES_FALHAS_DEPENDENCIA = {
+    "APIConnectionError", "APITimeoutError", "InternalServerError", "RateLimitError",
+    "ServiceUnavailableError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "RemoteProtocolError", "PoolTimeout",
+}
+
+
+class DisjuntorAbertoError(Exception):
+    """Levantada quando a chamada é rejeitada porque o disjuntor está aberto."""
+
+
+def eh_falha_dependencia(erro: Exception) -> bool:
+    """
+    Indica se a exceção representa falha da dependência (rede, timeout, 429 ou 5xx).
+
+    Erros de validação da saída estruturada, por exemplo, não abrem o disjuntor.
+    """
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    if type(erro).__name__ in _NOMES_FALHAS_DEPENDENCIA:
+        return True
+    status = getattr(erro, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+# Códigos de função inexistente (PostgREST e Postgres): erro de implantação, não de disponibilidade
+_CODIGOS_FUNCAO_INEXISTENTE = {"PGRST202", "42883"}
+
+
+def eh_funcao_inexistente(erro: Exception) -> bool:
+    """Indica se a exceção é de uma RPC que não existe no banco (SQL não aplicado)."""
+    if getattr(erro, "code", None) in _CODIGOS_FUNCAO_INEXISTENTE:
+        return True
+    texto = str(erro)
+    return any(codigo in texto for codigo in _CODIGOS_FUNCAO_INEXISTENTE) or "Could not find the function" in texto
+
+
+def eh_falha_recuperacao(erro: Exception) -> bool:
+    """
+    Indica se a exceção do vector store conta como falha: todas, exceto RPC
+    inexistente (por exemplo, a RPC em lote sem o SQL aplicado), que não indica
+    indisponibilidade do banco e não deve abrir o disjuntor das consultas simples.
+    """
+    return not eh_funcao_inexistente(erro)
+
+
+class Disjuntor:
+    """Disjuntor de uma dependência externa."""
+
+    def __init__(self, nome, max_falhas=5, tempo_aberto=30.0, eh_falha=None):
+        """
+        Args:
+            nome: Nome da dependência
+            max_falhas: Falhas consecutivas para abrir
+            tempo_aberto: Segundos em aberto até liberar uma sonda
+            eh_falha: Função que decide se uma exceção conta como falha (padrão: todas)
+        """
+        self.nome = nome
+        self.max_falhas = max_falhas
+        self.tempo_aberto = tempo_aberto
+        self.eh_falha = eh_falha or (lambda erro: True)
+        self.estado = FECHADO
+        self._falhas_consecutivas = 0
+        self._aberto_em = None
+        self._sonda_em_andamento = False
+        self._lock = threading.Lock()
+        self._contadores = {"sucessos": 0, "falhas": 0, "rejeitadas": 0, "aberturas": 0, "sondas": 0}
+
+    def _permitir(self):
+        with self._lock:
+            if self.estado == FECHADO:
+                return False
+            if self.estado == ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto:
+                self.estado = MEIO_ABERTO
+                logger.info("Disjuntor '{nome}' meio aberto: liberando sonda", nome=self.nome)
+            if self.estado == MEIO_ABERTO and not self._sonda_em_andamento:
+                self._sonda_em_andamento = True
+                self._contadores["sondas"] += 1
+                return True
+            self._contadores["rejeitadas"] += 1
+            raise DisjuntorAbertoError(f"Disjuntor '{self.nome}' aberto")
+
+    def _registrar_sucesso(self, sonda):
+        with self._lock:
+            self._contadores["sucessos"] += 1
+            self._falhas_consecutivas = 0
+            if sonda:
+                self._sonda_em_andamento = False
+            if self.estado != FECHADO:
+                logger.info("Disjuntor '{nome}' fechado", nome=self.nome)
+                self.estado = FECHADO
+
+    def _registrar_falha(self, sonda):
+        with self._lock:
+            self._contadores["falhas"] += 1
+            self._falhas_consecutivas += 1
+            if sonda:
+                self._sonda_em_andamento = False
+            if sonda or self._falhas_consecutivas >= self.max_falhas:
+                if self.estado != ABERTO:
+                    self._contadores["aberturas"] += 1
+                    logger.warning("Disjuntor '{nome}' aberto após {falhas} falhas", nome=self.nome, falhas=self._falhas_consecutivas)
+                self.estado = ABERTO
+                self._aberto_em = time.monotonic()
+
+    def _liberar_sonda(self):
+        with self._lock:
+            self._sonda_em_andamento = False
+
+    def aberto(self) -> bool:
+        """Indica se o disjuntor está aberto e ainda não liberaria uma sonda."""
+        with self._lock:
+            return self.estado == ABERTO and time.monotonic() - self._aberto_em < self.tempo_aberto
+
+    def executar(self, funcao):
+        """
+        Executa `funcao` protegida pelo disjuntor.
+
+        Raises:
+            DisjuntorAbertoError: Se o disjuntor estiver aberto
+        """
+        sonda = self._permitir()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            if isinstance(e, PrazoEsgotadoError):
+                # A dependência nem foi chamada: não conta como falha nem como sucesso
+                raise
+            if self.eh_falha(e):
+                self._registrar_falha(sonda)
+            elif sonda:
+                self._registrar_sucesso(sonda)
+            raise
+        else:
+            self._registrar_sucesso(sonda)
+            return resultado
+        finally:
+            if sonda:
+                # KeyboardInterrupt, CancelledError etc. não passam pelos registros
+                # acima; sem liberar a vaga, nenhuma outra sonda seria permitida
+                self._liberar_sonda()
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "falhas_consecutivas": self._falhas_consecutivas,
+                "segundos_ate_sonda": (
+                    round(max(0.0, self.tempo_aberto - (time.monotonic() - self._aberto_em)), 1)
+                    if self.estado == ABERTO else None
+                ),
+                **self._contadores,
+            }
+
+
+# Dependência -> classificador de falhas
+_CLASSIFICADORES = {
+    "llm": eh_falha_dependencia,
+    "embedding": eh_falha_dependencia,
+    "recuperacao": eh_falha_recuperacao,
+}
+
+_lock = threading.Lock()
+_disjuntores = {}
+
+
+def obter_disjuntor(nome: str) -> Disjuntor:
+    """Retorna o disjuntor compartilhado da dependência."""
+    disjuntor = _disjuntores.get(nome)
+    if disjuntor is None:
+        with _lock:
+            disjuntor = _disjuntores.get(nome)
+            if disjuntor is None:
+                prefixo = f"DISJUNTOR_{nome.upper()}"
+                disjuntor = Disjuntor(
+                    nome,
+                    max_falhas=env_int(f"{prefixo}_FALHAS", env_int("DISJUNTOR_FALHAS", 5)),
+                    tempo_aberto=env_float(f"{prefixo}_TEMPO_ABERTO", env_float("DISJUNTOR_TEMPO_ABERTO", 30.0)),
+                    eh_falha=_CLASSIFICADORES.get(nome),
+                )
+                _disjuntores[nome] = disjuntor
+    return disjuntor
+
+
+def obter_estado_disjuntores():
+    """Retorna o estado de todos os disjuntores criados."""
+    return {nome: disjuntor.resumo() for nome, disjuntor in list(_disjuntores.items())}
+
+
+registrar_fonte_metricas("disjuntores", obter_estado_disjuntores)
@@ -0,0 +1,140 @@
+"""
+Extração de procedimentos em streaming, com a saída estruturada lida aos poucos.
+
+Na extração comum, nada depois dela começa antes de o modelo terminar de gerar
+o ProcedimentoExtracao inteiro. Com EXTRACAO_STREAMING=true, a resposta (o JSON
+do schema, via response_format) é lida em streaming e cada objeto da lista
+"procedimentos_identificados" é entregue assim que fecha, enquanto o modelo
+ainda gera os seguintes. O nome de cada procedimento é entregue antes, assim que
+o valor do campo "procedimento" fecha (a descrição ainda está sendo gerada). O
+processador usa o nome para disparar o embedding e a recuperação de cada
+procedimento já durante a geração (ver
+ProcessadorProcedimentos.extrair_procedimentos); a decodificação reaproveita as
+listas pelo ContextoRecuperacao (src/recuperacao.py).
+
+O JSON completo ainda é validado no fim, com o mesmo schema da extração comum.
+
+Configuração (variáveis de ambiente):
+    EXTRACAO_STREAMING: lê a extração em streaming (padrão false)
+"""
+import json
+from src.configuracao import env_bool
+
+
+def streaming_habilitado() -> bool:
+    return env_bool("EXTRACAO_STREAMING", False)
+
+
+def texto_do_pedaco(pedaco):
+    """Texto de um pedaço do stream (AIMessageChunk, com conteúdo em texto ou em partes)."""
+    conteudo = getattr(pedaco, "content", pedaco)
+    if isinstance(conteudo, str):
+        return conteudo
+    if isinstance(conteudo, list):
+        return "".join(
+            parte if isinstance(parte, str) else str(parte.get("text", ""))
+            for parte in conteudo
+            if isinstance(parte, (str, dict))
+        )
+    return ""
+
+
+class ItensJSONIncrementais:
+    """
+    Lê um objeto JSON em pedaços e devolve os itens de uma lista do primeiro
+    nível (por exemplo "procedimentos_identificados") à medida que fecham.
+
+    Só acompanha aspas, escapes e a pilha de chaves e colchetes; cada item
+    completo é decodificado com o json da biblioteca padrão. Com `chave`, o valor
+    (string) desse campo de cada item é devolvido assim que fecha, antes do item.
+    """
+
+    def __init__(self, campo, chave=None):
+        """
+        Args:
+            campo: Nome do campo do objeto raiz com a lista de itens
+            chave: Campo (string) dos itens entregue antecipadamente (opcional)
+        """
+        self.campo = campo
+        self.chave = chave
+        self._texto = ""
+        self._posicao = 0
+        self._pilha = []
+        self._em_string = False
+        self._escape = False
+        self._inicio_string = None
+        self._ultima_string = None
+        self._chave = None
+        self._profundidade_lista = None
+        self._inicio_item = None
+
+    @property
+    def texto(self):
+        """Todo o texto recebido até agora."""
+        return self._texto
+
+    def alimentar(self, pedaco):
+        """
+        Acrescenta um pedaço do JSON.
+
+        Args:
+            pedaco: Próximo trecho do texto
+
+        Returns:
+            Lista de eventos deste pedaço, em ordem: ("chave", valor) quando o
+            valor da `chave` de um item fecha e ("item", dicionário) quando o item fecha
+        """
+        if not pedaco:
+            return []
+        self._texto += pedaco
+        eventos = []
+        texto = self._texto
+        for i in range(self._posicao, len(texto)):
+            caractere = texto[i]
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif caractere == "\\":
+                    self._escape = True
+                elif caractere == '"':
+                    self._em_string = False
+                    self._ultima_string = texto[self._inicio_string + 1:i]
+                    if (
+                        self.chave is not None
+                        and self._chave == self.chave
+                        and self._inicio_item is not None
+                        and len(self._pilha) == self._profundidade_lista + 1
+                    ):
+                        eventos.append(("chave", json.loads(texto[self._inicio_string:i + 1])))
+                continue
+            if caractere == '"':
+                self._em_string = True
+                self._inicio_string = i
+            elif caractere == ":":
+                self._chave = self._ultima_string
+            elif caractere == ",":
+                self._chave = None
+            elif caractere in "{[":
+                if (
+                    caractere == "["
+                    and self._profundidade_lista is None
+                    and self._pilha == ["{"]
+                    and self._chave == self.campo
+                ):
+                    self._profundidade_lista = 2
+                elif caractere == "{" and self._profundidade_lista == len(self._pilha):
+                    self._inicio_item = i
+                self._pilha.append(caractere)
+                self._chave = None
+            elif caractere in "}]":
+                if self._pilha:
+                    self._pilha.pop()
+                if caractere == "}" and self._inicio_item is not None and len(self._pilha) == self._profundidade_lista:
+                    item = json.loads(texto[self._inicio_item:i + 1])
+                    if isinstance(item, dict):
+                        eventos.append(("item", item))
+                    self._inicio_item = None
+                elif caractere == "]" and self._profundidade_lista is not None and len(self._pilha) < self._profundidade_lista:
+                    self._profundidade_lista = -1  # lista encerrada; itens seguintes não são do campo
+        self._posicao = len(texto)
+        return eventos
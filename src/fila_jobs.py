@@ -0,0 +1,292 @@
+"""
+Fila de jobs durável em SQLite.
+
+Permite que a API receba um caso, devolva um id de job e deixe o processamento
+para processos trabalhadores (src/trabalhador.py). A fila tem:
+- visibilidade: um job reservado fica invisível por `visibilidade` segundos; se o
+  trabalhador morrer sem concluir, o job volta a ser entregue a outro trabalhador;
+- retries: falhas voltam o job para a fila com backoff até `max_tentativas`;
+- consulta com espera (long-poll) do resultado.
+
+Configuração (variáveis de ambiente):
+    FILA_JOBS_DB: caminho do arquivo SQLite (padrão: jobs.sqlite3 na raiz do projeto)
+    FILA_VISIBILIDADE: segundos de invisibilidade de um job reservado (padrão 300)
+    FILA_MAX_TENTATIVAS: tentativas antes de marcar o job como falho (padrão 3)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from loguru import logger
+from src.configuracao import env_float, env_int, env_str
+from src.metricas import registrar_fonte_metricas
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PENDENTE = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    resultado TEXT,
+    erro TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL,
+    visivel_em REAL NOT NULL,
+    trabalhador TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_disponiveis ON jobs (status, visivel_em);
+"""
+
+
+def para_json(obj):
+    """Converte resultados (com modelos pydantic aninhados) em estruturas serializáveis."""
+    if hasattr(obj, "model_dump"):
+        return para_json(obj.model_dump())
+    if isinstance(obj, dict):
+        return {str(chave): para_json(valor) for chave, valor in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [para_json(item) for item in obj]
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    return str(obj)
+
+
+class FilaJobs:
+    """Fila de jobs persistida em um arquivo SQLite."""
+
+    def __init__(self, caminho, visibilidade=300.0, max_tentativas=3):
+        """
+        Args:
+            caminho: Caminho do arquivo SQLite
+            visibilidade: Segundos em que um job reservado fica invisível
+            max_tentativas: Número máximo de tentativas por job
+        """
+        self.caminho = caminho
+        self.visibilidade = visibilidade
+        self.max_tentativas = max_tentativas
+        self._local = threading.local()
+        self._conexao().conexao.executescript(_ESQUEMA)
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return _Transacao(conexao)
+
+    def enfileirar(self, tipo: str, payload: dict, max_tentativas: int = None) -> str:
+        """
+        Adiciona um job à fila.
+
+        Args:
+            tipo: Tipo do job (por exemplo "processar_com_laudo")
+            payload: Parâmetros do job (serializáveis em JSON)
+            max_tentativas: Tentativas máximas (padrão: o da fila)
+
+        Returns:
+            Id do job
+        """
+        job_id = uuid.uuid4().hex
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "INSERT INTO jobs (id, tipo, status, payload, max_tentativas, visivel_em, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, tipo, PENDENTE, json.dumps(payload), max_tentativas or self.max_tentativas, agora, agora, agora),
+            )
+        return job_id
+
+    def reservar(self, trabalhador: str):
+        """
+        Reserva o próximo job disponível (pendente ou com visibilidade expirada).
+
+        Args:
+            trabalhador: Identificador do trabalhador que reserva o job
+
+        Returns:
+            Dicionário com id, tipo, payload e tentativas, ou None se a fila estiver vazia
+        """
+        agora = time.time()
+        with self._conexao() as conexao:
+            while True:
+                linha = conexao.execute(
+                    "SELECT id, tipo, payload, tentativas, max_tentativas FROM jobs "
+                    "WHERE status IN (?, ?) AND visivel_em <= ? ORDER BY visivel_em LIMIT 1",
+                    (PENDENTE, PROCESSANDO, agora),
+                ).fetchone()
+                if linha is None:
+                    return None
+                tentativas = linha["tentativas"] + 1
+                if tentativas <= linha["max_tentativas"]:
+                    break
+                # Visibilidade expirou na última tentativa: o trabalhador provavelmente morreu
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, erro = ?, atualizado_em = ? WHERE id = ?",
+                    (FALHOU, "Tentativas esgotadas (visibilidade expirada)", agora, linha["id"]),
+                )
+            conexao.execute(
+                "UPDATE jobs SET status = ?, tentativas = ?, visivel_em = ?, trabalhador = ?, atualizado_em = ? "
+                "WHERE id = ?",
+                (PROCESSANDO, tentativas, agora + self.visibilidade, trabalhador, agora, linha["id"]),
+            )
+        return {
+            "id": linha["id"],
+            "tipo": linha["tipo"],
+            "payload": json.loads(linha["payload"]),
+            "tentativas": tentativas,
+        }
+
+    def estender_visibilidade(self, job_id: str, trabalhador: str):
+        """Renova a reserva de um job em processamento (heartbeat do trabalhador)."""
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "UPDATE jobs SET visivel_em = ?, atualizado_em = ? WHERE id = ? AND status = ? AND trabalhador = ?",
+                (agora + self.visibilidade, agora, job_id, PROCESSANDO, trabalhador),
+            )
+
+    def concluir(self, job_id: str, resultado, trabalhador: str) -> bool:
+        """
+        Marca o job como concluído e armazena o resultado.
+
+        Só vale enquanto o job estiver reservado pelo próprio trabalhador: se a
+        reserva expirou e outro trabalhador pegou o job, a atualização é ignorada.
+
+        Returns:
+            True se o job foi marcado como concluído
+        """
+        agora = time.time()
+        with self._conexao() as conexao:
+            cursor = conexao.execute(
+                "UPDATE jobs SET status = ?, resultado = ?, erro = NULL, atualizado_em = ? "
+                "WHERE id = ? AND status = ? AND trabalhador = ?",
+                (CONCLUIDO, json.dumps(para_json(resultado)), agora, job_id, PROCESSANDO, trabalhador),
+            )
+            return cursor.rowcount > 0
+
+    def falhar(self, job_id: str, erro: str, trabalhador: str, backoff: float = 5.0) -> bool:
+        """
+        Registra uma falha: o job volta para a fila (com backoff exponencial) ou,
+        se esgotou as tentativas, é marcado como falho.
+
+        Como em concluir, só vale enquanto o job estiver reservado pelo próprio
+        trabalhador; a falha tardia de uma reserva expirada é ignorada.
+
+        Returns:
+            True se a falha foi registrada
+        """
+        agora = time.time()
+        with self._conexao() as conexao:
+            linha = conexao.execute(
+                "SELECT tentativas, max_tentativas FROM jobs WHERE id = ? AND status = ? AND trabalhador = ?",
+                (job_id, PROCESSANDO, trabalhador),
+            ).fetchone()
+            if linha is None:
+                return False
+            if linha["tentativas"] >= linha["max_tentativas"]:
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, erro = ?, atualizado_em = ? WHERE id = ? AND status = ? AND trabalhador = ?",
+                    (FALHOU, erro, agora, job_id, PROCESSANDO, trabalhador),
+                )
+            else:
+                espera = backoff * (2 ** (linha["tentativas"] - 1))
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, erro = ?, visivel_em = ?, trabalhador = NULL, atualizado_em = ? "
+                    "WHERE id = ? AND status = ? AND trabalhador = ?",
+                    (PENDENTE, erro, agora + espera, agora, job_id, PROCESSANDO, trabalhador),
+                )
+            return True
+
+    def obter(self, job_id: str):
+        """
+        Retorna o estado de um job.
+
+        Returns:
+            Dicionário com status, tentativas, resultado e erro, ou None se não existir
+        """
+        with self._conexao() as conexao:
+            linha = conexao.execute(
+                "SELECT id, tipo, status, resultado, erro, tentativas, criado_em, atualizado_em FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if linha is None:
+            return None
+        job = dict(linha)
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def listar_concluidos(self, tipo: str = None):
+        """
+        Percorre os jobs concluídos (payload e resultado), dos mais antigos para os mais recentes.
+
+        Args:
+            tipo: Filtra pelo tipo do job (opcional)
+        """
+        consulta = "SELECT payload, resultado FROM jobs WHERE status = ?"
+        parametros = [CONCLUIDO]
+        if tipo:
+            consulta += " AND tipo = ?"
+            parametros.append(tipo)
+        cursor = self._conexao().conexao.execute(consulta + " ORDER BY criado_em", parametros)
+        for linha in cursor:
+            yield json.loads(linha["payload"]), json.loads(linha["resultado"]) if linha["resultado"] else None
+
+    def contar_por_status(self):
+        """Retorna a quantidade de jobs em cada status."""
+        with self._conexao() as conexao:
+            linhas = conexao.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {linha["status"]: linha["total"] for linha in linhas}
+
+
+class _Transacao:
+    """Context manager que executa o bloco em uma transação IMMEDIATE."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __enter__(self):
+        self.conexao.execute("BEGIN IMMEDIATE")
+        return self.conexao
+
+    def __exit__(self, tipo, valor, traceback):
+        if tipo is None:
+            self.conexao.execute("COMMIT")
+        else:
+            self.conexao.execute("ROLLBACK")
+        return False
+
+
+_lock = threading.Lock()
+_fila = None
+
+
+def obter_fila_jobs() -> FilaJobs:
+    """Retorna a fila de jobs configurada pelo ambiente."""
+    global _fila
+    if _fila is None:
+        with _lock:
+            if _fila is None:
+                _fila = FilaJobs(
+                    env_str("FILA_JOBS_DB") or os.path.join(DIRETORIO_PROJETO, "jobs.sqlite3"),
+                    visibilidade=env_float("FILA_VISIBILIDADE", 300.0),
+                    max_tentativas=env_int("FILA_MAX_TENTATIVAS", 3),
+                )
+                logger.info("Fila de jobs em {caminho}", caminho=_fila.caminho)
+    return _fila
+
+
+registrar_fonte_metricas("fila_jobs", lambda: obter_fila_jobs().contar_por_status())
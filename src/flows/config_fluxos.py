@@ -1,272 +1,161 @@
-from src.flows.decisor_fluxo import DecisorFluxo
+from src.catalogo import valores_decodificacao
+from src.configuracao import env_int
+from src.flows.motor_dag import GrafoFluxo
 from src.flows.fluxo_chain import (
-    executar_chain_completa,
     executar_chain_extracao,
     executar_chain_decodificacao,
+    executar_chain_identificacao_peca,
     executar_extracao_laudo,
-    executar_busca_documentos,
     executar_comparacao_procedimentos,
     executar_verificacao_trauma,
     executar_verificacao_mesma_doenca
 )
+import threading
 from loguru import logger
 
-def configurar_decisor_fluxo():
+_lock_grafo = threading.Lock()
+_grafo = None
+
+def montar_grafo_fluxos():
     """
-    Configura o decisor de fluxo com os fluxos disponíveis e suas condições.
+    Monta o grafo de etapas dos fluxos com e sem peça anatômica.
+    
+    Entradas externas: "texto" (descrição cirúrgica) e "laudo" (laudo
+    anatomopatológico, opcional). A ramificação com/sem peça anatômica é expressa
+    pelas condições dos nós, definidas aqui uma única vez:
+    - identificacao_peca só executa quando há laudo;
+    - extracao_laudo só executa quando há laudo e retirada de peça;
+    - procedimentos_corrigidos usa a comparação com o laudo, se houver, ou a extração.
+    
+    Extração, identificação da peça e verificação de trauma não dependem umas das
+    outras e rodam em paralelo; decodificação e verificação de mesma doença também.
     
     Returns:
-        DecisorFluxo configurado
+        GrafoFluxo compilado
     """
-    decisor = DecisorFluxo()
+    grafo = GrafoFluxo(max_paralelismo=env_int("DAG_MAX_PARALELISMO", 8))
+    grafo.adicionar_entrada("texto")
+    grafo.adicionar_entrada("laudo")
     
-    # Registrar fluxos
-    
-    # Fluxo completo (padrão)
-    decisor.registrar_fluxo(
-        "fluxo_completo",
-        executar_chain_completa
+    grafo.adicionar_no(
+        "identificacao_peca",
+        etapa_identificacao_peca,
+        entradas=["texto", "laudo"],
+        condicao=lambda entradas: bool(entradas["laudo"]),
     )
-    
-    # Fluxo para casos com retirada de peça anatômica
-    decisor.registrar_fluxo(
-        "fluxo_com_peca_anatomica",
-        fluxo_com_peca_anatomica,
-        lambda resultados: resultados.get("retirada_peca_anatomica") is True
+    grafo.adicionar_no("extracao", etapa_extracao, entradas=["texto"])
+    grafo.adicionar_no("entrada_por_trauma", etapa_entrada_por_trauma, entradas=["texto"])
+    grafo.adicionar_no(
+        "extracao_laudo",
+        etapa_extracao_laudo,
+        entradas=["laudo", "identificacao_peca"],
+        condicao=lambda entradas: bool(entradas["laudo"]) and _retirada_peca(entradas["identificacao_peca"]),
     )
-    
-    # Fluxo para casos sem retirada de peça anatômica
-    decisor.registrar_fluxo(
-        "fluxo_sem_peca_anatomica",
-        fluxo_sem_peca_anatomica,
-        lambda resultados: resultados.get("retirada_peca_anatomica") is False
+    grafo.adicionar_no(
+        "procedimentos_corrigidos",
+        etapa_procedimentos_corrigidos,
+        entradas=["extracao", "extracao_laudo"],
     )
-    
-    decisor.registrar_fluxo(
-        "fluxo_classificacao_final",
-        fluxo_classificacao_final,
-        lambda resultados: "decodificacao" in resultados
+    grafo.adicionar_no("decodificacao", etapa_decodificacao, entradas=["procedimentos_corrigidos"])
+    grafo.adicionar_no("mesma_doenca", etapa_mesma_doenca, entradas=["procedimentos_corrigidos"])
+    grafo.adicionar_no(
+        "resultado",
+        etapa_resultado,
+        entradas=[
+            "identificacao_peca", "extracao", "extracao_laudo", "procedimentos_corrigidos",
+            "decodificacao", "entrada_por_trauma", "mesma_doenca",
+        ],
     )
-    
-    # Removido: Fluxo para casos de tratamento de câncer
-    # decisor.registrar_fluxo(
-    #     "fluxo_tratamento_cancer",
-    #     fluxo_tratamento_cancer,
-    #     lambda resultados: any(
-    #         tratar_cancer for tratar_cancer in resultados.get("decodificacao", {}).get("tratar_cancer", [False])
-    #     )
-    # )
-    
-    # Removido: Fluxo para casos sem tratamento de câncer
-    # decisor.registrar_fluxo(
-    #     "fluxo_sem_tratamento_cancer",
-    #     fluxo_sem_tratamento_cancer,
-    #     lambda resultados: not any(
-    #         tratar_cancer for tratar_cancer in resultados.get("decodificacao", {}).get("tratar_cancer", [False])
-    #     )
-    # )
-    
-    # Removido: Fluxo combinado: com peça anatômica E tratamento de câncer
-    # decisor.registrar_fluxo(
-    #     "fluxo_peca_e_cancer",
-    #     fluxo_peca_e_cancer,
-    #     lambda resultados: (
-    #         resultados.get("retirada_peca_anatomica") is True and
-    #         any(tratar_cancer for tratar_cancer in resultados.get("decodificacao", {}).get("tratar_cancer", [False]))
-    #     )
-    # )
-    
-    return decisor
+    return grafo.compilar()
 
-# Implementação dos fluxos específicos
+def obter_grafo_fluxos():
+    """Retorna o grafo de fluxos compartilhado, montado e compilado na primeira chamada."""
+    global _grafo
+    if _grafo is None:
+        with _lock_grafo:
+            if _grafo is None:
+                _grafo = montar_grafo_fluxos()
+    return _grafo
 
-def fluxo_com_peca_anatomica(texto, laudo_anatomopatologico=None):
-    """
-    Fluxo para casos com retirada de peça anatômica.
-    
-    Este fluxo executa um processo especializado que:
-    1. Extrai procedimentos da descrição cirúrgica
-    2. Se disponível, extrai procedimentos do laudo anatomopatológico
-    3. Compara e corrige os procedimentos com base nas duas fontes e no vector storage
-    4. Decodifica os procedimentos corrigidos
-    
-    Args:
-        texto: Descrição cirúrgica
-        laudo_anatomopatologico: Laudo anatomopatológico (opcional)
-        
-    Returns:
-        Resultado do processamento com procedimentos corrigidos
-    """
-    logger.info("Executando fluxo para casos com retirada de peça anatômica")
-    
-    try:
-        # Etapa 1: Extrair procedimentos da descrição cirúrgica
-        logger.info("Extraindo procedimentos da descrição cirúrgica")
-        resultado_extracao = executar_chain_extracao(texto)
-        logger.info(f"Extraídos {len(resultado_extracao.procedimentos_identificados)} procedimentos da descrição cirúrgica")
-        
-        # Etapa 2: Se houver laudo, extrair procedimentos do laudo anatomopatológico
-        resultado_laudo = None
-        if laudo_anatomopatologico:
-            logger.info("Extraindo procedimentos do laudo anatomopatológico")
-            resultado_laudo = executar_extracao_laudo(laudo_anatomopatologico)
-            logger.info(f"Extraídos {len(resultado_laudo.procedimentos_laudo)} procedimentos do laudo anatomopatológico")
-            
-            # Etapa 3: Comparar e corrigir procedimentos (a busca no vector storage é feita internamente)
-            logger.info("Comparando e corrigindo procedimentos com base na descrição cirúrgica e no laudo")
-            procedimentos_corrigidos = executar_comparacao_procedimentos(
-                resultado_extracao.procedimentos_identificados,
-                resultado_laudo.procedimentos_laudo
-            )
-            logger.info(f"Obtidos {len(procedimentos_corrigidos.procedimentos_identificados)} procedimentos corrigidos")
-        else:
-            logger.info("Laudo anatomopatológico não fornecido, usando apenas descrição cirúrgica")
-            
-            # Buscar documentos similares diretamente para os procedimentos da descrição cirúrgica
-            logger.info("Buscando documentos similares para os procedimentos da descrição cirúrgica")
-            documentos_similares = executar_busca_documentos(resultado_extracao.procedimentos_identificados)
-            logger.info(f"Encontrados {len(documentos_similares) if documentos_similares else 0} documentos similares")
-            
-            # Usar os procedimentos da descrição cirúrgica diretamente
-            procedimentos_corrigidos = resultado_extracao
-        
-        # Etapa 4: Decodificar procedimentos
-        logger.info("Decodificando procedimentos")
-        resultado_decodificacao = executar_chain_decodificacao(
-            procedimentos_corrigidos.procedimentos_identificados
-        )
-        
-        # Extrair informações adicionais para classificação final
-        # Verificar se há indicação de trauma/acidente no texto
-        resultado_decodificacao["entrada_por_trauma"] = verificar_entrada_por_trauma(texto)
-        
-        # Verificar se os procedimentos são para tratar a mesma doença
-        resultado_decodificacao["mesma_doenca"] = verificar_mesma_doenca(
-            procedimentos_corrigidos.procedimentos_identificados
-        )        
-        
-        
-        # Construir o resultado final
-        resultado = {
-            "extracao_cirurgia": resultado_extracao,
-            "extracao_laudo": resultado_laudo,
-            "procedimentos_corrigidos": procedimentos_corrigidos,
-            "decodificacao": resultado_decodificacao,
-            "tipo_fluxo": "com_peca_anatomica"
-        }
+def _retirada_peca(identificacao):
+    return identificacao is not None and identificacao.retirada_peca_anatomica is True
 
-        return fluxo_classificacao_final(resultado)
-        
-    except Exception as e:
-        logger.error(f"Erro no fluxo com peça anatômica: {str(e)}")
-        # Retornar um resultado parcial em caso de erro
-        return {
-            "erro": str(e),
-            "extracao_cirurgia": resultado_extracao if 'resultado_extracao' in locals() else None,
-            "extracao_laudo": resultado_laudo if 'resultado_laudo' in locals() else None,
-            "tipo_fluxo": "com_peca_anatomica_com_erro"
-        }
-        
+# Etapas do grafo (cada uma recebe as entradas declaradas como argumentos nomeados)
 
-def fluxo_com_peca_anatomica(texto, laudo_anatomopatologico=None):
-    """
-    Fluxo para casos com retirada de peça anatômica.
-    """
-    logger.info("Executando fluxo para casos com retirada de peça anatômica")
-    
+def etapa_identificacao_peca(texto, laudo):
+    """Identifica se houve retirada de peça anatômica; em caso de erro, segue sem peça."""
     try:
-        # Etapa 1: Extrair procedimentos da descrição cirúrgica
-        logger.info("Extraindo procedimentos da descrição cirúrgica")
-        resultado_extracao = executar_chain_extracao(texto)
-        logger.info(f"Extraídos {len(resultado_extracao.procedimentos_identificados)} procedimentos da descrição cirúrgica")
-        
-        # Etapa 2: Se houver laudo, extrair procedimentos do laudo anatomopatológico
-        resultado_laudo = None
-        if laudo_anatomopatologico:
-            logger.info("Extraindo procedimentos do laudo anatomopatológico")
-            resultado_laudo = executar_extracao_laudo(laudo_anatomopatologico)
-            logger.info(f"Extraídos {len(resultado_laudo.procedimentos_laudo)} procedimentos do laudo anatomopatológico")
-            
-            # Etapa 3: Comparar e corrigir procedimentos
-            logger.info("Comparando e corrigindo procedimentos com base na descrição cirúrgica e no laudo")
-            procedimentos_corrigidos = executar_comparacao_procedimentos(
-                resultado_extracao.procedimentos_identificados,
-                resultado_laudo.procedimentos_laudo
-            )
-            logger.info(f"Obtidos {len(procedimentos_corrigidos.procedimentos_identificados)} procedimentos corrigidos")
-        else:
-            logger.info("Laudo anatomopatológico não fornecido, usando apenas descrição cirúrgica")
-            
-            # Buscar documentos similares diretamente para os procedimentos da descrição cirúrgica
-            logger.info("Buscando documentos similares para os procedimentos da descrição cirúrgica")
-            documentos_similares = executar_busca_documentos(resultado_extracao.procedimentos_identificados)
-            logger.info(f"Encontrados {len(documentos_similares) if documentos_similares else 0} documentos similares")
-            
-            # Usar os procedimentos da descrição cirúrgica diretamente
-            procedimentos_corrigidos = resultado_extracao
-        
-        # Etapa 4: Decodificar procedimentos
-        logger.info("Decodificando procedimentos")
-        resultado_decodificacao = executar_chain_decodificacao(
-            procedimentos_corrigidos.procedimentos_identificados
-        )
-        
-        # Verificar entrada por trauma e mesma doença separadamente
-        entrada_por_trauma = executar_verificacao_trauma(texto)
-        mesma_doenca = executar_verificacao_mesma_doenca(procedimentos_corrigidos.procedimentos_identificados)
-        
-        # Construir o resultado final como um dicionário
+        resultado_peca = executar_chain_identificacao_peca(texto)
+        logger.info("Retirada de peça anatômica: {retirada}", retirada=resultado_peca.retirada_peca_anatomica)
+        return resultado_peca
+    except Exception as e:
+        logger.error("Erro ao identificar peça anatômica: {erro}", erro=e)
+        logger.info("Usando fluxo sem peça anatômica devido a erro na identificação")
+        return None
+
+def etapa_extracao(texto):
+    """Extrai os procedimentos da descrição cirúrgica."""
+    resultado_extracao = executar_chain_extracao(texto)
+    logger.info("Extraídos {procedimentos} procedimentos da descrição cirúrgica", procedimentos=len(resultado_extracao.procedimentos_identificados))
+    return resultado_extracao
+
+def etapa_entrada_por_trauma(texto):
+    """Verifica se o paciente deu entrada por trauma/acidente."""
+    return verificar_entrada_por_trauma(texto)
+
+def etapa_extracao_laudo(laudo, identificacao_peca):
+    """Extrai os procedimentos do laudo anatomopatológico."""
+    resultado_laudo = executar_extracao_laudo(laudo)
+    logger.info("Extraídos {procedimentos_laudo} procedimentos do laudo anatomopatológico", procedimentos_laudo=len(resultado_laudo.procedimentos_laudo))
+    return resultado_laudo
+
+def etapa_procedimentos_corrigidos(extracao, extracao_laudo):
+    """Compara e corrige os procedimentos com o laudo; sem laudo, usa a extração."""
+    if extracao_laudo is None:
+        return extracao
+    logger.debug("Comparando e corrigindo procedimentos com base na descrição cirúrgica e no laudo")
+    procedimentos_corrigidos = executar_comparacao_procedimentos(
+        extracao.procedimentos_identificados,
+        extracao_laudo.procedimentos_laudo
+    )
+    logger.debug("Obtidos {} procedimentos corrigidos", len(procedimentos_corrigidos.procedimentos_identificados))
+    return procedimentos_corrigidos
+
+def etapa_decodificacao(procedimentos_corrigidos):
+    """Decodifica os procedimentos corrigidos."""
+    logger.debug("Decodificando procedimentos")
+    return executar_chain_decodificacao(procedimentos_corrigidos.procedimentos_identificados)
+
+def etapa_mesma_doenca(procedimentos_corrigidos):
+    """Verifica se os procedimentos tratam a mesma doença."""
+    return verificar_mesma_doenca(procedimentos_corrigidos.procedimentos_identificados)
+
+def etapa_resultado(identificacao_peca, extracao, extracao_laudo, procedimentos_corrigidos,
+                    decodificacao, entrada_por_trauma, mesma_doenca):
+    """Monta o resultado no formato do fluxo seguido e aplica a classificação final."""
+    if extracao_laudo is not None:
         resultado = {
-            "extracao_cirurgia": resultado_extracao,
-            "extracao_laudo": resultado_laudo,
+            "extracao_cirurgia": extracao,
+            "extracao_laudo": extracao_laudo,
             "procedimentos_corrigidos": procedimentos_corrigidos,
-            "decodificacao": resultado_decodificacao,
-            "entrada_por_trauma": entrada_por_trauma,
-            "mesma_doenca": mesma_doenca,
             "tipo_fluxo": "com_peca_anatomica"
         }
-
-        # Aplicar a classificação final
-        return fluxo_classificacao_final(resultado)
-        
-    except Exception as e:
-        logger.error(f"Erro no fluxo com peça anatômica: {str(e)}")
-        # Retornar um resultado parcial em caso de erro
-        return {
-            "erro": str(e),
-            "extracao_cirurgia": resultado_extracao if 'resultado_extracao' in locals() else None,
-            "extracao_laudo": resultado_laudo if 'resultado_laudo' in locals() else None,
-            "tipo_fluxo": "com_peca_anatomica_com_erro"
-        }        
-
-
-def fluxo_sem_peca_anatomica(texto):
-    """Fluxo para casos sem retirada de peça anatômica."""
-    logger.info("Executando fluxo para casos sem retirada de peça anatômica")
-    
-    # Implementação específica para este fluxo
-    resultado_extracao = executar_chain_extracao(texto)
-    
-    # Decodificar procedimentos
-    resultado_decodificacao = executar_chain_decodificacao(resultado_extracao.procedimentos_identificados)
-    
-    # Verificar entrada por trauma e mesma doença separadamente
-    entrada_por_trauma = executar_verificacao_trauma(texto)
-    mesma_doenca = executar_verificacao_mesma_doenca(resultado_extracao.procedimentos_identificados)
-    
-    # Construir o resultado como um dicionário
-    resultado = {
-        "extracao": resultado_extracao,
-        "decodificacao": resultado_decodificacao,
+    else:
+        resultado = {
+            "extracao": extracao,
+            "tipo_fluxo": "sem_peca_anatomica"
+        }
+    resultado.update({
+        "decodificacao": decodificacao,
+        "valores_catalogo": valores_decodificacao(decodificacao),
         "entrada_por_trauma": entrada_por_trauma,
         "mesma_doenca": mesma_doenca,
-        "tipo_fluxo": "sem_peca_anatomica"
-    }
-    
-    # Aplicar a classificação final
+    })
+    if identificacao_peca is not None:
+        resultado["retirada_peca_anatomica"] = identificacao_peca.retirada_peca_anatomica
+        resultado["justificativa_peca"] = identificacao_peca.justificativa
     return fluxo_classificacao_final(resultado)
 
-
 def verificar_entrada_por_trauma(texto):
     """
     Verifica se o texto indica que o paciente deu entrada por trauma/acidente
@@ -278,7 +167,7 @@ def verificar_entrada_por_trauma(texto):
     Returns:
         Boolean indicando se há evidência de trauma/acidente
     """
-    logger.info("Iniciando verificação de entrada por trauma")
+    logger.debug("Iniciando verificação de entrada por trauma")
     return executar_verificacao_trauma(texto)
 
 def verificar_mesma_doenca(procedimentos):
@@ -292,7 +181,7 @@ def verificar_mesma_doenca(procedimentos):
     Returns:
         Boolean indicando se os procedimentos tratam a mesma doença
     """
-    logger.info("Iniciando verificação de mesma doença")
+    logger.debug("Iniciando verificação de mesma doença")
     return executar_verificacao_mesma_doenca(procedimentos)
 
 def fluxo_classificacao_final(resultados):
@@ -311,7 +200,7 @@ def fluxo_classificacao_final(resultados):
     Returns:
         Dicionário com os resultados atualizados incluindo a classificação final
     """
-    logger.info("Executando fluxo de classificação final dos procedimentos")
+    logger.debug("Executando fluxo de classificação final dos procedimentos")
     
     try:
         # Obter procedimentos da fonte apropriada
@@ -364,7 +253,8 @@ def fluxo_classificacao_final(resultados):
             classificacao_final = "procedimento_isolado"
             justificativa = "Apenas um procedimento cirúrgico identificado ou paciente com trauma e apenas um procedimento."
         
-        logger.info(f"Classificação final: {classificacao_final} - {justificativa}")
+        logger.info("Classificação final: {classificacao_final}", classificacao_final=classificacao_final)
+        logger.debug("Justificativa da classificação: {}", justificativa)
         
         # Atualizar resultados com a classificação final
         resultados["classificacao_final"] = classificacao_final
@@ -381,7 +271,7 @@ def fluxo_classificacao_final(resultados):
         return resultados
     
     except Exception as e:
-        logger.error(f"Erro no fluxo de classificação final: {str(e)}")
+        logger.error("Erro no fluxo de classificação final: {erro}", erro=e)
         resultados["erro_classificacao"] = str(e)
         resultados["classificacao_final"] = "não_classificado"
         resultados["justificativa_classificacao"] = f"Erro durante a classificação: {str(e)}"
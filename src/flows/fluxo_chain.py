@@ -1,30 +1,114 @@
 from schemas.modelos_para_agentes import (
+    Procedimento,
     ProcedimentoExtracao, 
     Decodificacao, 
     IdentificacaoPecaAnatomica,
     VerificacaoTrauma,
     VerificacaoMesmaDoenca,
+    VerificacaoTraumaLote,
+    VerificacaoMesmaDoencaLote,
     ExtratorLaudoAnatomopatologico
 )
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from openai import OpenAI
-from functions import load_prompt
+from src.registro_prompts import obter_registro_prompts
+from src.agendador import executar_agendado, estimar_tokens
+from src.hedging import obter_executor_hedge
+from src.prazo import (
+    PrazoEsgotadoError,
+    motivo_degradacao,
+    prazo_permite,
+    registrar_decisao_local,
+    registrar_degradacao,
+    registrar_latencia_etapa,
+)
+from src.disjuntor import obter_disjuntor, eh_falha_dependencia, DisjuntorAbertoError
+from src.micro_lote import micro_lote_habilitado, obter_micro_lote
+from src.catalogo import buscar_no_catalogo_local
+from src.indice_local import backend_local_habilitado, obter_indice_local
+from src.vetores import formato_embeddings, literal_vetor, matriz_embeddings
+from src.logs import debug_amostrado
+from src.extracao_streaming import ItensJSONIncrementais, streaming_habilitado, texto_do_pedaco
+from src.recuperacao import (
+    com_contexto_recuperacao,
+    consultas_unicas,
+    contexto_recuperacao,
+    executar_consultas,
+    fundir_rrf,
+    limitar_por_orcamento,
+    parametros_poda,
+    parametros_recuperacao,
+    podar_documentos,
+    rpc_lote_habilitada,
+    separar_por_consulta
+)
+from src.classificador_local import decidir_localmente
+from src.pre_decisao import (
+    mesma_doenca_por_sitio,
+    pre_decidir_mesma_doenca,
+    pre_decisao_habilitada,
+    sitio_anatomico,
+    texto_procedimento
+)
+import time
+from contextlib import nullcontext
 from loguru import logger
-import dotenv
-import os
-from supabase import create_client, Client
+import threading
+from src.clientes import (
+    TABLE,
+    FUNC_NAME,
+    FUNC_NAME_LOTE,
+    obter_cliente_supabase,
+    obter_cliente_openai,
+    obter_embeddings,
+    obter_llm
+)
 from typing import List, Dict, Any, Optional
 
-dotenv.load_dotenv()
-open_ai_key = os.getenv("OPENAI_API_KEY")
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SERVICE_KEY_SUPABASE")
 
-# Configuração do Supabase
-supabase = create_client(supabase_url, supabase_key)
-TABLE = "tabela_embeddings_grupo_02_04"
-FUNC_NAME = "match_procedimentos"
+def _criar_template(template: str):
+    """Cria um ChatPromptTemplate importando o LangChain apenas quando necessário."""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_template(template)
+
+# Estimativa de tokens de saída de uma chamada estruturada (para o limite de TPM)
+TOKENS_SAIDA_ESTIMADOS = 500
+
+# Estimativa de tokens de saída por caso de um micro-lote de verificadores
+TOKENS_SAIDA_POR_CASO_LOTE = 120
+
+# Atributo do processador -> nome do prompt no registro
+PROMPTS_PROCESSADOR = {
+    "prompt_extracao": "system_extracao_procedimentos",
+    "prompt_decodificacao": "system_decodificacao",
+    "prompt_identificacao_peca": "system_identificacao_peca_anatomica",
+    "prompt_extracao_laudo": "system_extracao_procedimentos_laudo",
+    "prompt_comparacao_procedimentos": "system_comparacao_procedimentos",
+    "prompt_verificacao_trauma": "system_verificacao_trauma",
+    "prompt_verificacao_mesma_doenca": "system_verificacao_mesma_doenca",
+    "prompt_verificacao_lote": "system_verificacao_lote",
+}
+
+# Nome da chain -> atributo com o prompt de sistema usado por ela
+PROMPT_DA_CHAIN = {
+    "extrator": "prompt_extracao",
+    "decodificador": "prompt_decodificacao",
+    "identificador_peca": "prompt_identificacao_peca",
+    "extrator_laudo": "prompt_extracao_laudo",
+    "comparador": "prompt_comparacao_procedimentos",
+    "verificador_trauma": "prompt_verificacao_trauma",
+    "verificador_mesma_doenca": "prompt_verificacao_mesma_doenca",
+    "verificador_trauma_lote": "prompt_verificacao_trauma",
+    "verificador_mesma_doenca_lote": "prompt_verificacao_mesma_doenca",
+}
+
+# Chains sem fallback: a chamada espera a vez na fila do agendador mesmo depois do
+# prazo (nas demais, o prazo esgotado na fila leva ao fallback da etapa)
+CHAINS_SEM_FALLBACK = {"extrator", "extrator_laudo"}
+
+# Chain do verificador -> função que formata as entradas de um caso no micro-lote
+FORMATO_CASO_LOTE = {
+    "verificador_trauma": lambda entradas: f"Texto da descrição cirúrgica:\n{entradas['texto']}",
+    "verificador_mesma_doenca": lambda entradas: f"Procedimentos:\n{entradas['procedimentos']}",
+}
 
 class ProcessadorProcedimentos:
     """
@@ -34,26 +118,125 @@ class ProcessadorProcedimentos:
     
     def __init__(self, model_name="gpt-4o-mini", temperature=0):
         """Inicializa o processador com configurações do modelo."""
-        self.llm = ChatOpenAI(openai_api_key=open_ai_key, model=model_name, temperature=temperature)
-        self.embeddings = OpenAIEmbeddings(openai_api_key=open_ai_key)
-        
-        # Carregar prompts
-        self.prompt_extracao = load_prompt(r"prompts\system_extracao_procedimentos.txt")
-        self.prompt_decodificacao = load_prompt(r"prompts\system_decodificacao.txt")
-        self.prompt_identificacao_peca = load_prompt(r"prompts\system_identificacao_peca_anatomica.txt")
-        self.prompt_extracao_laudo = load_prompt(r"prompts\system_extracao_procedimentos_laudo.txt")
-        self.prompt_comparacao_procedimentos = load_prompt(r"prompts\system_comparacao_procedimentos.txt")
-        self.prompt_verificacao_trauma = load_prompt(r"prompts\system_verificacao_trauma.txt")
-        self.prompt_verificacao_mesma_doenca = load_prompt(r"prompts\system_verificacao_mesma_doenca.txt")
+        self.llm = obter_llm(model_name, temperature)
+        self.embeddings = obter_embeddings()
+        
+        # Carregar prompts (do registro central, já em memória)
+        registro = obter_registro_prompts()
+        for atributo, nome in PROMPTS_PROCESSADOR.items():
+            setattr(self, atributo, registro.obter(nome))
+        self.hashes_prompts = {nome: registro.hash(nome) for nome in PROMPTS_PROCESSADOR.values()}
         
         # Criar os modelos com saída estruturada
         self.extrator = self._criar_extrator()
+        self.extrator_streaming = self._criar_extrator_streaming()
         self.decodificador = self._criar_decodificador()
         self.identificador_peca = self._criar_identificador_peca()
         self.extrator_laudo = self._criar_extrator_laudo()
         self.comparador = self._criar_comparador_procedimentos()  # Renomeado para evitar conflito
         self.verificador_trauma = self._criar_verificador_trauma()
         self.verificador_mesma_doenca = self._criar_verificador_mesma_doenca()
+        self.verificador_trauma_lote = self._criar_verificador_trauma_lote()
+        self.verificador_mesma_doenca_lote = self._criar_verificador_mesma_doenca_lote()
+     
+    def _invocar(self, nome_chain, entradas, tokens_saida=TOKENS_SAIDA_ESTIMADOS, registrar_latencia=True):
+        """
+        Invoca uma chain passando pelo agendador de chamadas à OpenAI.
+        
+        Se o hedge estiver habilitado para a chain (HEDGE_CHAINS), uma chamada
+        duplicada é disparada quando a original, depois de sair da fila do
+        agendador, demora além do percentil configurado.
+        Com o disjuntor "llm" aberto, levanta DisjuntorAbertoError imediatamente e o
+        chamador usa o seu fallback; se o prazo da requisição acabar na fila do
+        agendador, levanta PrazoEsgotadoError (exceto nas CHAINS_SEM_FALLBACK).
+        
+        Args:
+            nome_chain: Nome do atributo da chain (por exemplo "extrator")
+            entradas: Dicionário de entradas da chain
+            tokens_saida: Estimativa de tokens de saída (para o limite de TPM)
+            registrar_latencia: Registra a latência da chamada para as decisões de prazo
+            
+        Returns:
+            O resultado estruturado da chain
+        """
+        chain = getattr(self, nome_chain)
+        prompt = getattr(self, PROMPT_DA_CHAIN.get(nome_chain, ""), "")
+        tokens = estimar_tokens(prompt, *entradas.values()) + tokens_saida
+        respeitar_prazo = nome_chain not in CHAINS_SEM_FALLBACK
+        agendar = lambda funcao: executar_agendado(
+            funcao, recurso="llm", tokens_estimados=tokens, respeitar_prazo=respeitar_prazo
+        )
+        chamada = lambda: agendar(lambda: chain.invoke(entradas))
+        executor_hedge = obter_executor_hedge()
+        if executor_hedge.habilitado(nome_chain):
+            # Cada tentativa passa pelo agendador; o atraso conta só a chamada
+            chamada = lambda: executor_hedge.executar(nome_chain, lambda: chain.invoke(entradas), agendar=agendar)
+        inicio = time.perf_counter()
+        resultado = obter_disjuntor("llm").executar(chamada)
+        if registrar_latencia:
+            registrar_latencia_etapa(nome_chain, time.perf_counter() - inicio)
+        return resultado
+     
+    def _invocar_verificador(self, nome_chain, entradas):
+        """
+        Invoca um verificador individualmente ou, se a chain estiver em
+        MICROLOTE_CHAINS, agrupada com as chamadas concorrentes de outras requisições.
+        
+        Casos que o lote não respondeu, ou lotes que falharam por motivo que não é
+        falha da dependência (por exemplo, saída inválida), são refeitos com a
+        chamada individual. A latência de cada caso no micro-lote (com a janela de
+        agrupamento) é registrada com o nome da chain individual, o mesmo que
+        prazo_permite consulta.
+        
+        Args:
+            nome_chain: "verificador_trauma" ou "verificador_mesma_doenca"
+            entradas: Dicionário de entradas da chain individual
+            
+        Returns:
+            O resultado estruturado do caso
+        """
+        if micro_lote_habilitado(nome_chain):
+            try:
+                inicio = time.perf_counter()
+                resultado = obter_micro_lote(nome_chain).submeter(
+                    entradas, lambda lote: self._invocar_lote_verificador(nome_chain, lote)
+                )
+                if resultado is not None:
+                    registrar_latencia_etapa(nome_chain, time.perf_counter() - inicio)
+                    return resultado
+                logger.warning("Micro-lote de '{nome_chain}' sem resultado para o caso; usando chamada individual", nome_chain=nome_chain)
+            except Exception as e:
+                if isinstance(e, (DisjuntorAbertoError, PrazoEsgotadoError)) or eh_falha_dependencia(e):
+                    raise
+                logger.warning("Erro no micro-lote de '{nome_chain}': {erro}; usando chamada individual", nome_chain=nome_chain, erro=e)
+        return self._invocar(nome_chain, entradas)
+    
+    def _invocar_lote_verificador(self, nome_chain, lote):
+        """
+        Executa um micro-lote de verificações em uma única chamada estruturada.
+        
+        Args:
+            nome_chain: Nome da chain individual do verificador
+            lote: Lista de dicionários de entradas (um por caso)
+            
+        Returns:
+            Lista de resultados alinhada ao lote (None para casos sem resposta)
+        """
+        if len(lote) == 1:
+            # A latência do caso é registrada por _invocar_verificador
+            return [self._invocar(nome_chain, lote[0], registrar_latencia=False)]
+        formatar = FORMATO_CASO_LOTE[nome_chain]
+        casos = "\n\n".join(f"caso_id: c{i}\n{formatar(entradas)}" for i, entradas in enumerate(lote))
+        resposta = self._invocar(
+            f"{nome_chain}_lote", {"casos": casos}, tokens_saida=TOKENS_SAIDA_POR_CASO_LOTE * len(lote)
+        )
+        por_caso = {item.caso_id.strip(): item for item in resposta.resultados}
+        return [por_caso.get(f"c{i}") for i in range(len(lote))]
+     
+    def prompts_desatualizados(self):
+        """Indica se algum prompt usado pelo processador mudou desde a sua construção."""
+        registro = obter_registro_prompts()
+        return any(registro.hash(nome) != hash_atual for nome, hash_atual in self.hashes_prompts.items())
      
     def _formatar_procedimentos_para_verificacao(self, procedimentos):
             """
@@ -102,36 +285,70 @@ class ProcessadorProcedimentos:
      
     def _criar_verificador_mesma_doenca(self):
         """Cria o verificador se os procedimentos são para tratar a mesma doença."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_verificacao_mesma_doenca + "\n\nProcedimentos:\n{procedimentos}"
         )
         return prompt | self.llm.with_structured_output(VerificacaoMesmaDoenca)
         
     def _criar_verificador_trauma(self):
         """Cria o verificador de entrada por trauma/acidente."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_verificacao_trauma + "\n\nTexto da descrição cirúrgica:\n{texto}"
         )
         return prompt | self.llm.with_structured_output(VerificacaoTrauma)    
     
+    def _criar_verificador_mesma_doenca_lote(self):
+        """Cria o verificador de mesma doença para vários casos em uma chamada (micro-lote)."""
+        prompt = _criar_template(
+            self.prompt_verificacao_mesma_doenca + "\n\n" + self.prompt_verificacao_lote + "\n\nCasos:\n{casos}"
+        )
+        return prompt | self.llm.with_structured_output(VerificacaoMesmaDoencaLote)
+    
+    def _criar_verificador_trauma_lote(self):
+        """Cria o verificador de trauma para vários casos em uma chamada (micro-lote)."""
+        prompt = _criar_template(
+            self.prompt_verificacao_trauma + "\n\n" + self.prompt_verificacao_lote + "\n\nCasos:\n{casos}"
+        )
+        return prompt | self.llm.with_structured_output(VerificacaoTraumaLote)
+    
     def _criar_extrator(self):
         """Cria o extrator de procedimentos."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_extracao + "\n\nTexto:\n{text}"
         )
         return prompt | self.llm.with_structured_output(ProcedimentoExtracao)
     
+    def _criar_extrator_streaming(self):
+        """
+        Cria o extrator de procedimentos para streaming: o mesmo prompt, com o schema
+        no response_format e a resposta em texto (o JSON), lida aos poucos.
+        
+        O schema vai em modo strict: a API garante a resposta no formato, em vez de
+        a divergência só aparecer na validação final (e custar uma segunda chamada).
+        """
+        from langchain_core.utils.function_calling import convert_to_openai_function
+        
+        prompt = _criar_template(
+            self.prompt_extracao + "\n\nTexto:\n{text}"
+        )
+        funcao = convert_to_openai_function(ProcedimentoExtracao, strict=True)
+        formato = {
+            "type": "json_schema",
+            "json_schema": {"name": funcao["name"], "schema": funcao["parameters"], "strict": True},
+        }
+        return prompt | self.llm.bind(response_format=formato)
+    
     def _criar_extrator_laudo(self):
         """Cria o extrator de procedimentos de laudo."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_extracao_laudo + "\n\nLaudo Anatomopatológico:\n{laudo}"
         )
         return prompt | self.llm.with_structured_output(ExtratorLaudoAnatomopatologico)   
     
     def extrair_procedimentos_laudo(self, laudo):
         """Extrai procedimentos do laudo anatomopatológico."""
-        logger.info("Extraindo procedimentos do laudo anatomopatológico")
-        return self.extrator_laudo.invoke({"laudo": laudo})
+        logger.debug("Extraindo procedimentos do laudo anatomopatológico")
+        return self._invocar("extrator_laudo", {"laudo": laudo})
     
     def comparar_e_corrigir_procedimentos(self, procedimentos_cirurgia, procedimentos_laudo, documentos_similares=None):
         """
@@ -145,11 +362,15 @@ class ProcessadorProcedimentos:
         Returns:
             Procedimentos corrigidos e complementados
         """
-        logger.info("Comparando e corrigindo procedimentos")
+        logger.debug("Comparando e corrigindo procedimentos")
+        
+        # Sem tempo para o comparador: manter os procedimentos da descrição cirúrgica
+        if not prazo_permite("comparador"):
+            return self._procedimentos_como_extracao(procedimentos_cirurgia)
         
         # Se não foram fornecidos documentos similares, buscar no vector store
         if documentos_similares is None:
-            logger.info("Buscando documentos similares no vector store")
+            logger.debug("Buscando documentos similares no vector store")
             
             # Extrair termos relevantes de ambas as fontes para melhorar a busca
             termos_busca = []
@@ -197,35 +418,12 @@ class ProcessadorProcedimentos:
                             termos_busca.append(proc['procedimento'])
             
             # Remover duplicatas e termos vazios
-            termos_busca = [termo for termo in termos_busca if termo and termo.strip()]
-            termos_busca = list(set(termos_busca))
-            
-            logger.info(f"Termos de busca extraídos: {termos_busca}")
+            termos_busca = consultas_unicas(termos_busca)
             
-            # Construir a query para busca
-            query = " ".join(termos_busca)
+            logger.debug("Termos de busca extraídos: {}", termos_busca)
             
-            # Buscar documentos similares
-            try:
-                # Gerar embedding para a query combinada
-                query_embedding = self.gerar_embedding(query)
-                
-                # Chamar a função RPC do Supabase para buscar documentos similares
-                response = supabase.rpc(FUNC_NAME, {
-                    'query_embedding': query_embedding,
-                    'match_count': 10  # Aumentar para ter mais contexto
-                }).execute()
-                
-                if hasattr(response, 'data') and response.data:
-                    documentos_similares = response.data
-                    logger.info(f"Encontrados {len(documentos_similares)} documentos similares")
-                else:
-                    logger.warning("Nenhum documento similar encontrado")
-                    documentos_similares = []
-                    
-            except Exception as e:
-                logger.error(f"Erro ao buscar documentos similares: {str(e)}")
-                documentos_similares = []
+            # Buscar documentos similares por termo (até 10 para ter mais contexto)
+            documentos_similares = self.buscar_por_procedimento(termos_busca, 10)
         
         # Formatar documentos similares para uso no prompt
         documentos_formatados = self.formatar_documentos_similares(documentos_similares)
@@ -237,16 +435,27 @@ class ProcessadorProcedimentos:
         procedimentos_laudo_formatados = self._formatar_procedimentos_laudo_para_comparacao(procedimentos_laudo)
         
         # Invocar o comparador
-        logger.info("Invocando o comparador de procedimentos")
-        resultado = self.comparador.invoke({  # Corrigido para usar self.comparador
-            "procedimentos_cirurgia": procedimentos_cirurgia_formatados,
-            "procedimentos_laudo": procedimentos_laudo_formatados,
-            "documentos_similares": documentos_formatados
-        })
-        
-        logger.info(f"Comparação concluída. Identificados {len(resultado.procedimentos_identificados)} procedimentos corrigidos")
+        logger.debug("Invocando o comparador de procedimentos")
+        try:
+            resultado = self._invocar("comparador", {
+                "procedimentos_cirurgia": procedimentos_cirurgia_formatados,
+                "procedimentos_laudo": procedimentos_laudo_formatados,
+                "documentos_similares": documentos_formatados
+            })
+        except PrazoEsgotadoError as e:
+            logger.warning("{erro}; mantendo os procedimentos da descrição cirúrgica", erro=e)
+            registrar_degradacao("comparador", "prazo")
+            return self._procedimentos_como_extracao(procedimentos_cirurgia)
+        
+        logger.info("Comparação concluída: {procedimentos} procedimentos corrigidos", procedimentos=len(resultado.procedimentos_identificados))
         return resultado
 
+    def _procedimentos_como_extracao(self, procedimentos):
+        """Converte procedimentos (lista ou ProcedimentoExtracao) em ProcedimentoExtracao."""
+        if hasattr(procedimentos, 'procedimentos_identificados'):
+            return procedimentos
+        return ProcedimentoExtracao(procedimentos_identificados=list(procedimentos or []))
+
     def _formatar_procedimentos_para_comparacao(self, procedimentos):
         """
         Formata os procedimentos da descrição cirúrgica para uso no comparador.
@@ -347,7 +556,7 @@ class ProcessadorProcedimentos:
 
     def _criar_comparador_procedimentos(self):
        """Cria o comparador de procedimentos entre descrição cirúrgica e laudo anatomopatológico."""
-       prompt = ChatPromptTemplate.from_template(
+       prompt = _criar_template(
            self.prompt_comparacao_procedimentos + 
            "\n\nProcedimentos da Descrição Cirúrgica:\n{procedimentos_cirurgia}" +
            "\n\nProcedimentos do Laudo Anatomopatológico:\n{procedimentos_laudo}" +
@@ -357,22 +566,89 @@ class ProcessadorProcedimentos:
     
     def _criar_decodificador(self):
         """Cria o decodificador de procedimentos."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_decodificacao + "\n\nProcedimentos Verificados:\n{procedimentos_verificados}\n\nDocumentos Similares:\n{documentos_similares}"
         )
         return prompt | self.llm.with_structured_output(Decodificacao)
     
     def _criar_identificador_peca(self):
         """Cria o identificador de peça anatômica."""
-        prompt = ChatPromptTemplate.from_template(
+        prompt = _criar_template(
             self.prompt_identificacao_peca + "\n\nTexto:\n{text}"
         )
         return prompt | self.llm.with_structured_output(IdentificacaoPecaAnatomica)
     
     def extrair_procedimentos(self, texto):
-        """Extrai procedimentos do texto."""
-        logger.info("Extraindo procedimentos do texto")
-        return self.extrator.invoke({"text": texto})
+        """
+        Extrai procedimentos do texto.
+        
+        Com EXTRACAO_STREAMING=true, a resposta é lida em streaming e a recuperação
+        de cada procedimento começa assim que o seu nome é gerado (ver
+        src/extracao_streaming.py); se o streaming falhar, repete a extração sem streaming.
+        """
+        logger.debug("Extraindo procedimentos do texto")
+        if streaming_habilitado():
+            try:
+                return self._extrair_procedimentos_streaming(texto, ao_receber_nome=self._antecipar_recuperacao)
+            except DisjuntorAbertoError:
+                raise
+            except Exception as e:
+                logger.warning("Erro na extração em streaming: {erro}; extraindo sem streaming", erro=e)
+        return self._invocar("extrator", {"text": texto})
+    
+    def _extrair_procedimentos_streaming(self, texto, ao_receber=None, ao_receber_nome=None):
+        """
+        Extrai os procedimentos lendo a resposta do modelo em streaming.
+        
+        Passa pelo agendador e pelo disjuntor "llm" como _invocar (sem hedge: a
+        chamada duplicada repetiria o que já foi entregue).
+        
+        Args:
+            texto: Descrição cirúrgica
+            ao_receber: Função chamada com cada Procedimento completo, durante a geração
+            ao_receber_nome: Função chamada com o nome de cada procedimento, assim que
+                ele é gerado (antes da descrição)
+            
+        Returns:
+            ProcedimentoExtracao validado a partir do JSON completo
+        """
+        entradas = {"text": texto}
+        tokens = estimar_tokens(self.prompt_extracao, texto) + TOKENS_SAIDA_ESTIMADOS
+        
+        def consumir():
+            leitor = ItensJSONIncrementais("procedimentos_identificados", chave="procedimento")
+            for pedaco in self.extrator_streaming.stream(entradas):
+                for evento, valor in leitor.alimentar(texto_do_pedaco(pedaco)):
+                    try:
+                        if evento == "chave" and ao_receber_nome is not None:
+                            ao_receber_nome(valor)
+                        elif evento == "item" and ao_receber is not None:
+                            ao_receber(Procedimento.model_validate(valor))
+                    except Exception as e:
+                        # O resultado vem da validação do JSON completo, abaixo
+                        logger.debug("Evento da extração em streaming ignorado: {}", e)
+            return ProcedimentoExtracao.model_validate_json(leitor.texto)
+        
+        inicio = time.perf_counter()
+        resultado = obter_disjuntor("llm").executar(
+            lambda: executar_agendado(consumir, recurso="llm", tokens_estimados=tokens, respeitar_prazo=False)
+        )
+        registrar_latencia_etapa("extrator", time.perf_counter() - inicio)
+        return resultado
+    
+    def _antecipar_recuperacao(self, nome_procedimento):
+        """
+        Inicia em segundo plano a recuperação de um procedimento recém-extraído,
+        guardada no ContextoRecuperacao da requisição para a decodificação.
+        """
+        contexto = contexto_recuperacao()
+        termos = consultas_unicas([nome_procedimento])
+        if contexto is None or not termos:
+            return
+        _, candidatos, _ = parametros_recuperacao()
+        # Com um só termo, _recuperar_listas não usa o executor de consultas
+        if contexto.antecipar(termos[0], candidatos, lambda: self._recuperar_listas(termos, candidatos)):
+            logger.debug("Recuperação antecipada: {termo}", termo=termos[0])
     
     def gerar_embedding(self, texto):
         """
@@ -382,17 +658,54 @@ class ProcessadorProcedimentos:
             texto: Texto para gerar o embedding
             
         Returns:
-            Embedding do texto
+            Embedding do texto (array float32, ver src/vetores.py)
         """
-        logger.info("Gerando embedding para o texto")
+        logger.debug("Gerando embedding para o texto")
         
-        client = OpenAI(api_key=open_ai_key)
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=texto
+        client = obter_cliente_openai()
+        response = executar_agendado(
+            lambda: client.embeddings.create(
+                model="text-embedding-3-small",
+                input=texto,
+                encoding_format=formato_embeddings()
+            ),
+            recurso="embedding",
+            tokens_estimados=estimar_tokens(texto)
         )
         
-        return response.data[0].embedding
+        return matriz_embeddings(response.data)[0]
+    
+    def gerar_embeddings(self, textos):
+        """
+        Gera os embeddings de vários textos em uma única chamada.
+        
+        Args:
+            textos: Lista de textos
+            
+        Returns:
+            Matriz float32 com um embedding por linha, na ordem dos textos
+        """
+        client = obter_cliente_openai()
+        response = executar_agendado(
+            lambda: client.embeddings.create(
+                model="text-embedding-3-small",
+                input=list(textos),
+                encoding_format=formato_embeddings()
+            ),
+            recurso="embedding",
+            tokens_estimados=estimar_tokens(*textos)
+        )
+        return matriz_embeddings(response.data)
+    
+    def gerar_embeddings_requisicao(self, textos):
+        """
+        Gera os embeddings dos textos reaproveitando os já calculados na requisição
+        corrente (ver src/recuperacao.py); sem contexto, equivale a gerar_embeddings.
+        """
+        contexto = contexto_recuperacao()
+        if contexto is None:
+            return self.gerar_embeddings(textos)
+        return contexto.obter_embeddings(textos, self.gerar_embeddings)
     
     def processar_texto_completo(self, texto):
         """
@@ -404,30 +717,37 @@ class ProcessadorProcedimentos:
         Returns:
             O resultado final da decodificação
         """
-        logger.info(f"Processando texto completo: {texto[:100]}...")
+        logger.info("Processando texto completo ({caracteres} caracteres)", caracteres=len(texto))
         
+        # Compartilha a recuperação entre as etapas (inclusive a antecipada pela
+        # extração em streaming), a menos que o chamador já tenha aberto o contexto
+        contexto = nullcontext() if contexto_recuperacao() is not None else com_contexto_recuperacao()
+        with contexto:
+            return self._processar_texto_completo(texto)
+    
+    def _processar_texto_completo(self, texto):
         try:
             # Etapa 1: Extração
             resultado_extracao = self.extrair_procedimentos(texto)
-            logger.debug(f"Resultado da extração: {resultado_extracao}")
+            logger.debug("Resultado da extração: {}", resultado_extracao)
             
             # Etapa 2: Busca de documentos similares
             documentos_similares = self.buscar_documentos_similares(
                 resultado_extracao.procedimentos_identificados
             )
-            logger.debug(f"Encontrados {len(documentos_similares)} documentos similares")
+            logger.debug("Encontrados {} documentos similares", len(documentos_similares))
             
             # Etapa 3: Decodificação
             resultado_decodificacao = self.decodificar_procedimentos(
                 resultado_extracao.procedimentos_identificados,
                 documentos_similares
             )
-            logger.debug(f"Resultado da decodificação: {resultado_decodificacao}")
+            logger.debug("Resultado da decodificação: {}", resultado_decodificacao)
             
             return resultado_decodificacao
         
         except Exception as e:
-            logger.error(f"Erro ao processar texto completo: {str(e)}")
+            logger.error("Erro ao processar texto completo: {erro}", erro=e)
             # Retornar um objeto Decodificacao vazio em caso de erro
             return Decodificacao(
                 nome_procedimentos="Erro ao processar texto completo",
@@ -446,12 +766,12 @@ class ProcessadorProcedimentos:
         Returns:
             Lista de documentos similares encontrados
         """
-        logger.info("Buscando documentos similares no vector store")
+        logger.debug("Buscando documentos similares no vector store")
         
         try:
             # Verificar se procedimentos_verificados é uma lista
             if not isinstance(procedimentos_verificados, list):
-                logger.warning(f"procedimentos_verificados não é uma lista: {type(procedimentos_verificados)}")
+                logger.warning("procedimentos_verificados não é uma lista: {tipo}", tipo=type(procedimentos_verificados))
                 if hasattr(procedimentos_verificados, 'procedimentos_verificados'):
                     procedimentos_verificados = procedimentos_verificados.procedimentos_verificados
                 else:
@@ -466,59 +786,204 @@ class ProcessadorProcedimentos:
                     elif hasattr(proc, "procedimento"):
                         nomes_procedimentos.append(proc.procedimento)
                     else:
-                        logger.warning(f"Não foi possível extrair o nome do procedimento: {proc}")
+                        logger.warning("Não foi possível extrair o nome do procedimento: {procedimento}", procedimento=proc)
                 except Exception as e:
-                    logger.error(f"Erro ao extrair nome do procedimento: {str(e)}")
+                    logger.error("Erro ao extrair nome do procedimento: {erro}", erro=e)
             
             # Se não conseguimos extrair nenhum nome, retornar lista vazia
             if not nomes_procedimentos:
                 logger.warning("Não foi possível extrair nomes de procedimentos")
                 return []
             
-            # Criar uma query combinando os nomes dos procedimentos
-            query = " ".join(nomes_procedimentos)
-            logger.debug(f"Query para busca de embeddings: {query}")
+            # Uma consulta por procedimento, fundidas por RRF
+            return self.buscar_por_procedimento(nomes_procedimentos, match_count)
+        
+        except Exception as e:
+            logger.error("Erro geral ao buscar documentos similares: {erro}", erro=e)
+            return []
+    
+    def buscar_por_procedimento(self, termos, match_count):
+        """
+        Busca documentos similares com uma consulta por procedimento.
+        
+        Os embeddings de todos os termos são gerados em uma única chamada; as
+        consultas ao vector store rodam em paralelo e as listas são fundidas por
+        RRF, com deduplicação pelo código do procedimento. São mantidos até
+        RECUPERACAO_DOCS_POR_PROCEDIMENTO documentos por termo, limitados a match_count.
+        
+        Args:
+            termos: Nomes dos procedimentos (ou outros termos de busca)
+            match_count: Número máximo de documentos retornados
             
-            # Gerar o embedding para a query
-            try:
-                query_embedding = self.gerar_embedding(query)
-            except Exception as e:
-                logger.error(f"Erro ao gerar embedding: {str(e)}")
-                return []
+        Returns:
+            Lista de documentos similares, do mais ao menos relevante
+        """
+        termos = consultas_unicas(termos)
+        if not termos:
+            return []
+        k, candidatos, docs_por_procedimento = parametros_recuperacao()
+        limite = min(match_count, docs_por_procedimento * len(termos))
+        
+        # Termos já consultados nesta requisição (por exemplo, na comparação com o laudo)
+        contexto = contexto_recuperacao()
+        listas = {}
+        if contexto is not None:
+            for termo in termos:
+                documentos = contexto.documentos_em_cache(termo, candidatos)
+                if documentos is not None:
+                    listas[termo] = documentos
+        pendentes = [termo for termo in termos if termo not in listas]
+        if pendentes:
+            for termo, documentos in zip(pendentes, self._recuperar_listas(pendentes, candidatos)):
+                listas[termo] = documentos
+        
+        # Poda por consulta: o gap relativo é medido contra o primeiro da própria consulta
+        documentos = fundir_rrf([podar_documentos(listas[termo]) for termo in termos], k=k, limite=limite)
+        logger.info(
+            "Recuperação por procedimento: {consultas} consultas ({reaproveitadas} reaproveitadas), {documentos} documentos após a fusão",
+            consultas=len(termos), reaproveitadas=len(termos) - len(pendentes), documentos=len(documentos)
+        )
+        return documentos
+    
+    def _recuperar_listas(self, termos, candidatos):
+        """
+        Executa uma rodada de recuperação: um lote de embeddings e as consultas ao
+        vector store, em uma chamada à RPC em lote ou uma chamada por termo em
+        paralelo (ou a busca no catálogo local, se indisponível). Com
+        RECUPERACAO_BACKEND=local, as consultas vão ao índice local (src/indice_local.py).
+        
+        Returns:
+            Uma lista de documentos por termo, na ordem dos termos
+        """
+        usar_indice_local = backend_local_habilitado()
+        try:
+            if not usar_indice_local and obter_disjuntor("recuperacao").aberto():
+                raise DisjuntorAbertoError("Disjuntor 'recuperacao' aberto")
+            embeddings = obter_disjuntor("embedding").executar(lambda: self.gerar_embeddings_requisicao(termos))
+        except DisjuntorAbertoError as e:
+            logger.warning("{erro}; buscando no catálogo local", erro=e)
+            registrar_degradacao("recuperacao", "disjuntor_aberto")
+            embeddings = None
+        except Exception as e:
+            logger.error("Erro ao gerar embeddings das consultas: {erro}; buscando no catálogo local", erro=e)
+            registrar_degradacao("recuperacao", motivo_degradacao(e))
+            embeddings = None
+        
+        if embeddings is None:
+            listas = [buscar_no_catalogo_local(termo, candidatos) for termo in termos]
+        elif usar_indice_local:
+            indice = obter_indice_local()
+            listas = [indice.buscar(embedding, candidatos) for embedding in embeddings]
+        elif len(termos) > 1 and rpc_lote_habilitada():
+            listas = self._consultar_vector_store_lote(termos, candidatos, embeddings)
+        else:
+            listas = executar_consultas(
+                self._consultar_vector_store,
+                [(termo, candidatos, embedding) for termo, embedding in zip(termos, embeddings)]
+            )
+        contexto = contexto_recuperacao()
+        if contexto is not None:
+            contexto.guardar_documentos(termos, candidatos, listas)
+        return listas
+    
+    def _consultar_vector_store_lote(self, termos, match_count, embeddings):
+        """
+        Busca os documentos de várias consultas em uma única chamada à RPC em lote.
+        
+        Passa pelo disjuntor "recuperacao"; se ele estiver aberto ou a chamada
+        falhar (por exemplo, sem sql/match_procedimentos_lote.sql aplicado), as
+        consultas voltam a ser feitas uma a uma em paralelo (_consultar_vector_store),
+        que por sua vez usam o catálogo local se a RPC também estiver indisponível.
+        
+        Args:
+            termos: Textos das consultas (usados no fallback)
+            match_count: Número de documentos por consulta
+            embeddings: Embeddings das consultas, na ordem dos termos
             
-            try:
-                # Chamar a função RPC do Supabase para buscar documentos similares
-                response = supabase.rpc(FUNC_NAME, {
-                    'query_embedding': query_embedding,
+        Returns:
+            Uma lista de documentos por termo, na ordem dos termos
+        """
+        try:
+            response = obter_disjuntor("recuperacao").executar(
+                lambda: obter_cliente_supabase().rpc(FUNC_NAME_LOTE, {
+                    'query_embeddings': [literal_vetor(embedding) for embedding in embeddings],
                     'match_count': match_count
                 }).execute()
-                
-                # Verificar se a resposta foi bem-sucedida
-                if hasattr(response, 'data') and response.data:
-                    logger.info(f"Encontrados {len(response.data)} documentos similares")
-                    return response.data
-                else:
-                    logger.warning("Nenhum documento similar encontrado")
-                    return []
-            
-            except Exception as e:
-                logger.error(f"Erro ao buscar documentos similares: {str(e)}")
-                return []
+            )
+        except Exception as e:
+            logger.warning("Erro na busca em lote no vector store: {erro}; consultando por termo", erro=e)
+            return executar_consultas(
+                self._consultar_vector_store,
+                [(termo, match_count, embedding) for termo, embedding in zip(termos, embeddings)]
+            )
         
+        listas = separar_por_consulta(getattr(response, 'data', None), len(termos))
+        logger.debug("Busca em lote: {} consultas, {} documentos", len(termos), sum(len(lista) for lista in listas))
+        return listas
+    
+    def _consultar_vector_store(self, query, match_count, query_embedding=None):
+        """
+        Gera o embedding da query e busca os documentos similares no vector store.
+        
+        O embedding e a RPC passam pelos disjuntores "embedding" e "recuperacao". Se
+        algum deles estiver aberto (ou a chamada falhar), a busca é feita no
+        catálogo local, sem esperar pelo timeout da dependência.
+        
+        Args:
+            query: Texto da consulta
+            match_count: Número de documentos similares a serem retornados
+            query_embedding: Embedding já calculado da query (opcional)
+            
+        Returns:
+            Lista de documentos similares encontrados
+        """
+        try:
+            # Evitar gerar o embedding se a recuperação já está indisponível
+            if obter_disjuntor("recuperacao").aberto():
+                raise DisjuntorAbertoError("Disjuntor 'recuperacao' aberto")
+            if query_embedding is None:
+                query_embedding = obter_disjuntor("embedding").executar(lambda: self.gerar_embedding(query))
+            response = obter_disjuntor("recuperacao").executar(
+                lambda: obter_cliente_supabase().rpc(FUNC_NAME, {
+                    'query_embedding': literal_vetor(query_embedding),
+                    'match_count': match_count
+                }).execute()
+            )
+        except DisjuntorAbertoError as e:
+            logger.warning("{erro}; buscando no catálogo local", erro=e)
+            registrar_degradacao("recuperacao", "disjuntor_aberto")
+            return buscar_no_catalogo_local(query, match_count)
         except Exception as e:
-            logger.error(f"Erro geral ao buscar documentos similares: {str(e)}")
-            return []
+            logger.error("Erro ao buscar documentos similares: {erro}; buscando no catálogo local", erro=e)
+            registrar_degradacao("recuperacao", motivo_degradacao(e))
+            return buscar_no_catalogo_local(query, match_count)
+        
+        # Verificar se a resposta foi bem-sucedida
+        if hasattr(response, 'data') and response.data:
+            logger.debug("Encontrados {} documentos similares", len(response.data))
+            return response.data
+        logger.warning("Nenhum documento similar encontrado")
+        return []
     
-    def formatar_documentos_similares(self, documentos):
+    def formatar_documentos_similares(self, documentos, podar=True):
         """
         Formata os documentos similares para um formato mais legível.
         
+        Com podar=True, documentos abaixo da similaridade mínima e códigos
+        repetidos são descartados e o texto é limitado ao orçamento de tokens
+        (RECUPERACAO_ORCAMENTO_TOKENS), mantendo os documentos mais relevantes.
+        
         Args:
-            documentos: Lista de documentos similares
+            documentos: Lista de documentos similares (do mais ao menos relevante)
+            podar: Se deve aplicar a poda e o orçamento de tokens
             
         Returns:
             String formatada com os documentos similares
         """
+        if podar and documentos:
+            # O gap relativo já foi aplicado por consulta na recuperação
+            documentos = podar_documentos(documentos, gap_relativo=1.0)
+        
         if not documentos:
             return "Nenhum documento similar encontrado."
         
@@ -526,7 +991,7 @@ class ProcessadorProcedimentos:
         for doc in documentos:
             # Verificar se doc é um dicionário
             if not isinstance(doc, dict):
-                logger.warning(f"Documento não é um dicionário: {doc}")
+                logger.warning("Documento não é um dicionário: {documento}", documento=doc)
                 continue
                 
             # Criar a string formatada para o documento
@@ -537,8 +1002,8 @@ class ProcessadorProcedimentos:
                 doc_str += f"Descrição: {doc.get('descricao_procedimento', 'N/A')}\n"
                 documentos_formatados.append(doc_str)
             except Exception as e:
-                logger.error(f"Erro ao formatar documento: {str(e)}")
-                logger.error(f"Documento: {doc}")
+                logger.error("Erro ao formatar documento: {erro}", erro=e)
+                logger.error("Documento: {documento}", documento=doc)
                 # Adicionar uma entrada genérica para não quebrar o fluxo
                 documentos_formatados.append(f"Documento: {str(doc)}")
         
@@ -546,8 +1011,16 @@ class ProcessadorProcedimentos:
         if not documentos_formatados:
             return "Não foi possível formatar os documentos similares."
         
-        logger.info(f"Documentos formatados: {documentos_formatados}")
-        return "\n\n".join(documentos_formatados)
+        total = len(documentos_formatados)
+        if podar:
+            documentos_formatados = limitar_por_orcamento(documentos_formatados, parametros_poda()[2])
+        texto = "\n\n".join(documentos_formatados)
+        logger.info(
+            "Documentos formatados: {documentos} de {total} (~{tokens} tokens)",
+            documentos=len(documentos_formatados), total=total, tokens=estimar_tokens(texto)
+        )
+        debug_amostrado("Documentos formatados: {}", texto)
+        return texto
 
     def decodificar_procedimentos(self, procedimentos_verificados, documentos_similares=None):
         """
@@ -561,53 +1034,129 @@ class ProcessadorProcedimentos:
         Returns:
             Decodificação dos procedimentos com seus respectivos códigos
         """
-        logger.info("Decodificando procedimentos verificados")
+        logger.debug("Decodificando procedimentos verificados")
         
         try:
             # Se não foram fornecidos documentos similares, buscar no vector store
             if documentos_similares is None:
                 documentos_similares = self.buscar_documentos_similares(procedimentos_verificados)
-                logger.debug(f"Documentos similares buscados: {len(documentos_similares) if isinstance(documentos_similares, list) else 'não é lista'}")
+                logger.debug("Documentos similares buscados: {}", len(documentos_similares) if isinstance(documentos_similares, list) else "não é lista")
             
             # Se documentos_similares é uma lista, formatá-la para uma string
             documentos_formatados = ""
             if isinstance(documentos_similares, list):
                 documentos_formatados = self.formatar_documentos_similares(documentos_similares)
-                logger.debug(f"Documentos formatados (primeiros 200 caracteres): {documentos_formatados[:200]}")
+                logger.opt(lazy=True).debug("Documentos formatados (primeiros 200 caracteres): {}", lambda: documentos_formatados[:200])
             elif isinstance(documentos_similares, str):
                 documentos_formatados = documentos_similares
-                logger.debug(f"Documentos já formatados (primeiros 200 caracteres): {documentos_formatados[:200]}")
+                logger.opt(lazy=True).debug("Documentos já formatados (primeiros 200 caracteres): {}", lambda: documentos_formatados[:200])
             else:
-                logger.warning(f"Formato de documentos_similares não reconhecido: {type(documentos_similares)}")
+                logger.warning("Formato de documentos_similares não reconhecido: {tipo}", tipo=type(documentos_similares))
                 documentos_formatados = str(documentos_similares)
             
             # Verificar se procedimentos_verificados é uma lista
             if not isinstance(procedimentos_verificados, list):
-                logger.warning(f"procedimentos_verificados não é uma lista: {type(procedimentos_verificados)}")
+                logger.warning("procedimentos_verificados não é uma lista: {tipo}", tipo=type(procedimentos_verificados))
                 if hasattr(procedimentos_verificados, 'procedimentos_verificados'):
                     procedimentos_verificados = procedimentos_verificados.procedimentos_verificados
                 else:
                     procedimentos_verificados = [procedimentos_verificados]
             
+            # Sem tempo para o decodificador: usar o documento mais similar
+            if not prazo_permite("decodificador"):
+                return self.decodificar_por_documento_mais_similar(procedimentos_verificados, documentos_similares)
+            
             # Invocar o decodificador
-            return self.decodificador.invoke({
+            return self._invocar("decodificador", {
                 "procedimentos_verificados": procedimentos_verificados,
                 "documentos_similares": documentos_formatados
             })
         except Exception as e:
-            logger.error(f"Erro ao decodificar procedimentos: {str(e)}")
-            # Retornar um objeto Decodificacao vazio em caso de erro
-            return Decodificacao(
-                nome_procedimentos=["Erro ao decodificar procedimentos"],
-                codigo_procedimentos=["N/A"]
+            logger.error("Erro ao decodificar procedimentos: {erro}", erro=e)
+            # Em caso de erro, usar o documento mais similar (ou "N/A" se não houver)
+            registrar_degradacao("decodificador", motivo_degradacao(e))
+            return self.decodificar_por_documento_mais_similar(
+                procedimentos_verificados if isinstance(procedimentos_verificados, list) else [],
+                documentos_similares
             )
     
+    def decodificar_por_documento_mais_similar(self, procedimentos_verificados, documentos_similares):
+        """
+        Método de fallback que decodifica usando o documento mais similar do vector store.
+        
+        Args:
+            procedimentos_verificados: Lista de procedimentos verificados
+            documentos_similares: Lista de documentos similares (ordenada por similaridade)
+            
+        Returns:
+            Decodificação com o código do documento mais similar
+        """
+        primeiro = procedimentos_verificados[0] if procedimentos_verificados else None
+        if isinstance(primeiro, dict):
+            primeiro = Procedimento(procedimento=primeiro.get("procedimento", "N/A"), descricao=primeiro.get("descricao", ""))
+        elif not isinstance(primeiro, Procedimento):
+            primeiro = Procedimento(procedimento="N/A", descricao="")
+        
+        documento = documentos_similares[0] if isinstance(documentos_similares, list) and documentos_similares else {}
+        codigo = str(documento.get("codigo_procedimento", "N/A")) if isinstance(documento, dict) else "N/A"
+        logger.info("Decodificação (fallback) pelo documento mais similar: {codigo}", codigo=codigo)
+        return Decodificacao(
+            nome_procedimentos=primeiro,
+            codigo_procedimentos=codigo,
+            tratar_cancer=False
+        )
+    
     def identificar_peca_anatomica(self, texto):
         """
         Identifica a peça anatômica retirada do paciente.
         """
-        logger.info("Identificando peça anatômica retirada do paciente")
-        return self.identificador_peca.invoke({"text": texto})
+        logger.debug("Identificando peça anatômica retirada do paciente")
+        decisao, probabilidade = decidir_localmente("peca", texto)
+        if decisao is not None:
+            logger.info("Retirada de peça anatômica decidida pelo classificador local: {decisao} (p={probabilidade:.3f})", decisao=decisao, probabilidade=probabilidade)
+            registrar_decisao_local("identificador_peca", "classificador_local")
+            return IdentificacaoPecaAnatomica(
+                retirada_peca_anatomica=decisao,
+                justificativa=f"Classificador local (probabilidade de retirada {probabilidade:.2f})"
+            )
+        if not prazo_permite("identificador_peca"):
+            return self.identificar_peca_anatomica_palavras_chave(texto)
+        try:
+            return self._invocar("identificador_peca", {"text": texto})
+        except PrazoEsgotadoError as e:
+            logger.warning("{erro}; identificando a peça por palavras-chave", erro=e)
+            registrar_degradacao("identificador_peca", "prazo")
+            return self.identificar_peca_anatomica_palavras_chave(texto)
+    
+    def identificar_peca_anatomica_palavras_chave(self, texto):
+        """
+        Método de fallback que identifica retirada de peça anatômica
+        baseado em palavras-chave.
+        
+        Args:
+            texto: Texto da descrição cirúrgica
+            
+        Returns:
+            Identificação de peça anatômica com justificativa
+        """
+        palavras_peca = [
+            "ressecção", "resseccao", "exérese", "exerese", "retirada", "biópsia", "biopsia",
+            "peça", "anatomopatológico", "anatomopatologico", "ectomia", "amputação"
+        ]
+        
+        texto_lower = texto.lower()
+        for palavra in palavras_peca:
+            if palavra in texto_lower:
+                logger.info("Identificada retirada de peça anatômica (palavras-chave): '{palavra}'", palavra=palavra)
+                return IdentificacaoPecaAnatomica(
+                    retirada_peca_anatomica=True,
+                    justificativa=f"Identificado por palavra-chave: '{palavra}'"
+                )
+        
+        return IdentificacaoPecaAnatomica(
+            retirada_peca_anatomica=False,
+            justificativa="Nenhuma palavra-chave de retirada de peça anatômica encontrada"
+        )
     
     def verificar_entrada_por_trauma(self, texto):
         """
@@ -620,18 +1169,29 @@ class ProcessadorProcedimentos:
         Returns:
             Boolean indicando se há evidência de trauma/acidente
         """
-        logger.info("Verificando entrada por trauma com agente especializado")
+        logger.debug("Verificando entrada por trauma com agente especializado")
+        
+        decisao, probabilidade = decidir_localmente("trauma", texto)
+        if decisao is not None:
+            logger.info("Entrada por trauma decidida pelo classificador local: {decisao} (p={probabilidade:.3f})", decisao=decisao, probabilidade=probabilidade)
+            registrar_decisao_local("verificador_trauma", "classificador_local")
+            return decisao
+        
+        if not prazo_permite("verificador_trauma"):
+            return self.verificar_entrada_por_trauma_palavras_chave(texto)
         
         try:
             # Invocar o verificador de trauma
-            resultado = self.verificador_trauma.invoke({"texto": texto})
+            resultado = self._invocar_verificador("verificador_trauma", {"texto": texto})
             
-            logger.info(f"Resultado da verificação de trauma: {resultado.entrada_por_trauma} - {resultado.justificativa}")
+            logger.info("Resultado da verificação de trauma: {entrada_por_trauma}", entrada_por_trauma=resultado.entrada_por_trauma)
+            logger.debug("Justificativa da verificação de trauma: {}", resultado.justificativa)
             
             return resultado.entrada_por_trauma
             
         except Exception as e:
-            logger.error(f"Erro na verificação de entrada por trauma: {str(e)}")
+            logger.error("Erro na verificação de entrada por trauma: {erro}", erro=e)
+            registrar_degradacao("verificador_trauma", motivo_degradacao(e))
             
             # Fallback para o método baseado em palavras-chave
             logger.info("Utilizando método de fallback baseado em palavras-chave")
@@ -659,7 +1219,7 @@ class ProcessadorProcedimentos:
         texto_lower = texto.lower()
         for palavra in palavras_trauma:
             if palavra in texto_lower:
-                logger.info(f"Identificada entrada por trauma/acidente (palavras-chave): '{palavra}'")
+                logger.info("Identificada entrada por trauma/acidente (palavras-chave): '{palavra}'", palavra=palavra)
                 return True
         
         return False
@@ -675,35 +1235,80 @@ class ProcessadorProcedimentos:
         Returns:
             Boolean indicando se os procedimentos tratam a mesma doença
         """
-        logger.info("Verificando se procedimentos tratam a mesma doença com agente especializado")
+        logger.debug("Verificando se procedimentos tratam a mesma doença com agente especializado")
         
         # Se houver apenas um procedimento, consideramos como mesma doença
         if not procedimentos or (isinstance(procedimentos, list) and len(procedimentos) <= 1):
             logger.info("Apenas um procedimento identificado, considerando como mesma doença")
             return True
         
+        # Casos claros são decididos localmente, sem chamar o LLM
+        decisao = self.pre_decidir_mesma_doenca(procedimentos)
+        if decisao is not None:
+            return decisao
+        
+        if not prazo_permite("verificador_mesma_doenca"):
+            return self.verificar_mesma_doenca_sitio_anatomico(procedimentos)
+        
         try:
             # Formatar os procedimentos para o verificador
             procedimentos_formatados = self._formatar_procedimentos_para_verificacao(procedimentos)
             
             # Invocar o verificador de mesma doença
-            resultado = self.verificador_mesma_doenca.invoke({"procedimentos": procedimentos_formatados})
+            resultado = self._invocar_verificador("verificador_mesma_doenca", {"procedimentos": procedimentos_formatados})
             
-            logger.info(f"Resultado da verificação de mesma doença: {resultado.mesma_doenca} - {resultado.justificativa}")
+            logger.info("Resultado da verificação de mesma doença: {mesma_doenca}", mesma_doenca=resultado.mesma_doenca)
+            logger.debug("Justificativa da verificação de mesma doença: {}", resultado.justificativa)
             
             return resultado.mesma_doenca
             
         except Exception as e:
-            logger.error(f"Erro na verificação de mesma doença: {str(e)}")
+            logger.error("Erro na verificação de mesma doença: {erro}", erro=e)
+            registrar_degradacao("verificador_mesma_doenca", motivo_degradacao(e))
             
-            # Fallback para o método baseado em diagnósticos
-            logger.info("Utilizando método de fallback baseado em diagnósticos")
-            return self.verificar_mesma_doenca_diagnosticos(procedimentos)    
+            # Fallback para o método baseado no sítio anatômico
+            logger.info("Utilizando método de fallback baseado no sítio anatômico")
+            return self.verificar_mesma_doenca_sitio_anatomico(procedimentos)    
 
-    def verificar_mesma_doenca_diagnosticos(self, procedimentos):
+    def pre_decidir_mesma_doenca(self, procedimentos):
+        """
+        Pré-decisão local da mesma doença por similaridade de embeddings e sítio anatômico.
+        
+        Os embeddings de todos os procedimentos são gerados em uma única chamada.
+        Se a pré-decisão estiver desabilitada, o disjuntor de embeddings estiver
+        aberto ou o caso for limítrofe, retorna None e a decisão fica com o LLM.
+        
+        Args:
+            procedimentos: Lista de procedimentos identificados
+            
+        Returns:
+            True/False quando o caso é claro, ou None
+        """
+        if not pre_decisao_habilitada():
+            return None
+        if hasattr(procedimentos, 'procedimentos_identificados'):
+            procedimentos = procedimentos.procedimentos_identificados
+        if not isinstance(procedimentos, list) or len(procedimentos) < 2:
+            return None
+        
+        try:
+            textos = [texto_procedimento(proc) for proc in procedimentos]
+            embeddings = obter_disjuntor("embedding").executar(lambda: self.gerar_embeddings_requisicao(textos))
+        except Exception as e:
+            logger.warning("Pré-decisão de mesma doença indisponível: {erro}", erro=e)
+            return None
+        
+        decisao, detalhes = pre_decidir_mesma_doenca(embeddings, [sitio_anatomico(proc) for proc in procedimentos])
+        if decisao is None:
+            logger.info("Pré-decisão de mesma doença limítrofe, consultando o LLM: {detalhes}", detalhes=detalhes)
+        else:
+            logger.info("Mesma doença decidida localmente: {decisao} ({detalhes})", decisao=decisao, detalhes=detalhes)
+        return decisao
+
+    def verificar_mesma_doenca_sitio_anatomico(self, procedimentos):
         """
         Método de fallback que verifica se os procedimentos são para a mesma doença
-        baseado nos diagnósticos associados.
+        pelo sítio anatômico (forma de organização SIGTAP) de cada procedimento no catálogo.
         
         Args:
             procedimentos: Lista de procedimentos identificados
@@ -719,33 +1324,54 @@ class ProcessadorProcedimentos:
         if hasattr(procedimentos, 'procedimentos_identificados'):
             procedimentos = procedimentos.procedimentos_identificados
         
-        # Verificar se os procedimentos têm diagnósticos ou indicações semelhantes
-        diagnosticos = set()
-        for proc in procedimentos:
-            if isinstance(proc, dict) and "diagnostico" in proc and proc["diagnostico"]:
-                diagnosticos.add(proc["diagnostico"])
-            elif hasattr(proc, "diagnostico") and proc.diagnostico:
-                diagnosticos.add(proc.diagnostico)
-        
-        # Se todos os procedimentos têm o mesmo diagnóstico ou não têm diagnóstico
-        mesma_doenca = len(diagnosticos) <= 1
-        logger.info(f"Verificação de mesma doença (fallback): {mesma_doenca} (diagnósticos: {diagnosticos})")
+        # Sítios desconhecidos não contam; sem sítios conhecidos, assume mesma doença
+        mesma_doenca = mesma_doenca_por_sitio(procedimentos)
+        logger.info("Verificação de mesma doença (fallback por sítio anatômico): {mesma_doenca}", mesma_doenca=mesma_doenca)
         return mesma_doenca
 
+_processadores = {}
+_lock_processadores = threading.Lock()
+
+
+def obter_processador(model_name="gpt-4o-mini", temperature=0):
+    """
+    Retorna um ProcessadorProcedimentos compartilhado para o par (modelo, temperatura).
+
+    O processador não guarda estado por requisição, então a mesma instância (com
+    suas chains já montadas) é reaproveitada entre chamadas. Se algum prompt for
+    alterado em disco, o processador é reconstruído com o novo conteúdo.
+
+    Args:
+        model_name: Nome do modelo
+        temperature: Temperatura de geração
+
+    Returns:
+        Instância compartilhada de ProcessadorProcedimentos
+    """
+    chave = (model_name, temperature)
+    processador = _processadores.get(chave)
+    if processador is None or processador.prompts_desatualizados():
+        with _lock_processadores:
+            processador = _processadores.get(chave)
+            if processador is None or processador.prompts_desatualizados():
+                processador = ProcessadorProcedimentos(model_name, temperature)
+                _processadores[chave] = processador
+    return processador
+
 # Funções de conveniência para uso direto
 def executar_chain_completa(texto: str):
     """Executa o fluxo completo de processamento."""
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.processar_texto_completo(texto)
 
 def executar_chain_identificacao_peca(texto: str):
     """Executa apenas a etapa de identificação de peça anatômica."""
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.identificar_peca_anatomica(texto)
 
 def executar_chain_extracao(texto: str):
     """Executa apenas a etapa de extração."""
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.extrair_procedimentos(texto)
 
 def executar_busca_documentos(procedimentos_verificados, match_count=10):
@@ -759,7 +1385,7 @@ def executar_busca_documentos(procedimentos_verificados, match_count=10):
     Returns:
         Lista de documentos similares encontrados
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.buscar_documentos_similares(procedimentos_verificados, match_count)
 
 def executar_chain_decodificacao(procedimentos_verificados, documentos_similares=None):
@@ -774,7 +1400,7 @@ def executar_chain_decodificacao(procedimentos_verificados, documentos_similares
     Returns:
         O resultado da decodificação
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.decodificar_procedimentos(procedimentos_verificados, documentos_similares)
 
 def executar_extracao_laudo(laudo: str):
@@ -787,7 +1413,7 @@ def executar_extracao_laudo(laudo: str):
     Returns:
         Procedimentos extraídos do laudo
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.extrair_procedimentos_laudo(laudo)
 
 def executar_comparacao_procedimentos(procedimentos_cirurgia, procedimentos_laudo, documentos_similares=None):
@@ -802,7 +1428,7 @@ def executar_comparacao_procedimentos(procedimentos_cirurgia, procedimentos_laud
     Returns:
         Procedimentos corrigidos e complementados
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.comparar_e_corrigir_procedimentos(
         procedimentos_cirurgia,
         procedimentos_laudo,
@@ -819,7 +1445,7 @@ def executar_verificacao_trauma(texto: str):
     Returns:
         Boolean indicando se há evidência de trauma/acidente
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.verificar_entrada_por_trauma(texto)
 
 def executar_verificacao_mesma_doenca(procedimentos):
@@ -832,5 +1458,5 @@ def executar_verificacao_mesma_doenca(procedimentos):
     Returns:
         Boolean indicando se os procedimentos tratam a mesma doença
     """
-    processador = ProcessadorProcedimentos()
+    processador = obter_processador()
     return processador.verificar_mesma_doenca(procedimentos)
\ No newline at end of file
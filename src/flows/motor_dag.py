@@ -0,0 +1,330 @@
+"""
+Motor de execução de fluxos em DAG (grafo acíclico dirigido).
+
+Cada etapa (nó) declara as entradas de que depende e produz um valor com o seu
+próprio nome. O grafo é montado e validado uma única vez (compilar); a cada caso,
+o motor:
+- executa em paralelo os nós cujas dependências já estão resolvidas;
+- memoriza por caso o valor de cada nó junto com as versões das entradas usadas,
+  de modo que, ao mudar uma entrada (por exemplo, o laudo chega depois), só os nós
+  a jusante são recalculados;
+- não propaga recomputações quando o novo valor é igual ao anterior;
+- avalia as condições dos nós (ramificações) sem recompilar nada.
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from loguru import logger
+from src.configuracao import env_int
+
+
+class No:
+    """Etapa do fluxo: função, entradas declaradas e condição opcional."""
+
+    def __init__(self, nome, funcao, entradas=(), condicao=None, padrao=None):
+        """
+        Args:
+            nome: Nome do nó (também é o nome do valor produzido)
+            funcao: Função chamada com as entradas como argumentos nomeados
+            entradas: Nomes das entradas externas ou de outros nós
+            condicao: Função que recebe o dicionário de entradas e diz se o nó deve executar
+            padrao: Valor do nó quando a condição não é atendida
+        """
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = tuple(entradas)
+        self.condicao = condicao
+        self.padrao = padrao
+
+
+class ContextoCaso:
+    """Valores, versões e memória de execução de um caso."""
+
+    def __init__(self, caso_id=None):
+        self.caso_id = caso_id
+        self.valores = {}
+        self.versoes = {}
+        self.memo = {}
+        self.erros = {}
+        self.tempos = {}
+        self.executados = []
+        self.reutilizados = []
+        self.lock = threading.RLock()
+        self.lock_execucao = threading.Lock()
+
+    def definir_entrada(self, nome, valor):
+        """
+        Define o valor de uma entrada externa; a versão só muda se o valor mudar.
+
+        Returns:
+            True se o valor mudou
+        """
+        with self.lock:
+            if nome in self.valores and self.valores[nome] == valor:
+                return False
+            self.valores[nome] = valor
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+            return True
+
+    def _definir_valor_no(self, nome, valor):
+        with self.lock:
+            if nome in self.valores and self.valores[nome] == valor:
+                return
+            self.valores[nome] = valor
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+
+    def _invalidar(self, nome):
+        with self.lock:
+            self.valores.pop(nome, None)
+            self.memo.pop(nome, None)
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+
+    def concluido(self, nome, entradas):
+        """Indica se o valor do nó é válido para as versões atuais das suas entradas."""
+        with self.lock:
+            versoes_entradas = tuple(self.versoes.get(entrada, 0) for entrada in entradas)
+            return nome in self.valores and self.memo.get(nome) == versoes_entradas
+
+    def resumo_execucao(self):
+        """Retorna quais nós foram executados, reaproveitados ou falharam na última execução."""
+        with self.lock:
+            return {
+                "executados": list(self.executados),
+                "reutilizados": list(self.reutilizados),
+                "erros": dict(self.erros),
+                "tempos_ms": {nome: round(duracao * 1000, 1) for nome, duracao in self.tempos.items()},
+            }
+
+
+class GrafoFluxo:
+    """Grafo de etapas compilado uma vez e executado por caso."""
+
+    def __init__(self, max_paralelismo=8):
+        self.entradas_externas = set()
+        self.nos = {}
+        self.ordem = []
+        self.dependentes = {}
+        self.compilado = False
+        self._executor = ThreadPoolExecutor(max_workers=max_paralelismo, thread_name_prefix="dag")
+
+    def adicionar_entrada(self, nome):
+        """Declara uma entrada externa (fornecida pelo chamador)."""
+        self.entradas_externas.add(nome)
+        self.compilado = False
+        return self
+
+    def adicionar_no(self, nome, funcao, entradas=(), condicao=None, padrao=None):
+        """Adiciona uma etapa ao grafo (ver No)."""
+        if nome in self.nos or nome in self.entradas_externas:
+            raise ValueError(f"Nó '{nome}' já registrado")
+        self.nos[nome] = No(nome, funcao, entradas, condicao, padrao)
+        self.compilado = False
+        return self
+
+    def compilar(self):
+        """
+        Valida as dependências e calcula a ordem topológica e os dependentes de cada nó.
+
+        Raises:
+            ValueError: Se houver dependência desconhecida ou ciclo
+        """
+        for no in self.nos.values():
+            for entrada in no.entradas:
+                if entrada not in self.nos and entrada not in self.entradas_externas:
+                    raise ValueError(f"Nó '{no.nome}' depende de '{entrada}', que não existe")
+
+        ordem = []
+        estado = {}
+
+        def visitar(nome):
+            if estado.get(nome) == "feito":
+                return
+            if estado.get(nome) == "visitando":
+                raise ValueError(f"Ciclo detectado no grafo envolvendo '{nome}'")
+            estado[nome] = "visitando"
+            for entrada in self.nos[nome].entradas:
+                if entrada in self.nos:
+                    visitar(entrada)
+            estado[nome] = "feito"
+            ordem.append(nome)
+
+        for nome in self.nos:
+            visitar(nome)
+
+        self.ordem = ordem
+        self.dependentes = {nome: [] for nome in list(self.nos) + list(self.entradas_externas)}
+        for no in self.nos.values():
+            for entrada in no.entradas:
+                self.dependentes[entrada].append(no.nome)
+        self.compilado = True
+        logger.info("Grafo de fluxo compilado com {nos} nós", nos=len(self.nos))
+        return self
+
+    def _necessarios(self, alvos):
+        necessarios = set()
+        pilha = list(alvos)
+        while pilha:
+            nome = pilha.pop()
+            if nome in necessarios or nome not in self.nos:
+                continue
+            necessarios.add(nome)
+            pilha.extend(self.nos[nome].entradas)
+        return necessarios
+
+    def executar(self, contexto: ContextoCaso, alvos=None, entradas=None):
+        """
+        Executa (ou reaproveita) os nós necessários para produzir os alvos.
+
+        Nós independentes rodam em paralelo; o prazo e a prioridade da requisição
+        (ContextVars) são propagados para cada nó. Se um nó falhar, o erro fica em
+        `contexto.erros` e os nós que dependem dele não são executados.
+
+        As entradas são definidas e o resultado é lido sob o mesmo lock da execução:
+        chamadas concorrentes com o mesmo caso_id (um job refeito, um reenvio da
+        API) não trocam as entradas nem os resultados entre si.
+
+        Args:
+            contexto: Contexto do caso
+            alvos: Nomes dos nós desejados (padrão: todos)
+            entradas: Valores das entradas externas desta execução (opcional)
+
+        Returns:
+            Dicionário com "valores" (dos alvos), "execucao" (resumo_execucao) e
+            "etapas_concluidas" (ver etapas_concluidas), tirados antes de liberar o lock
+        """
+        if not self.compilado:
+            self.compilar()
+        alvos = alvos or list(self.nos)
+        with contexto.lock_execucao:
+            for nome, valor in (entradas or {}).items():
+                contexto.definir_entrada(nome, valor)
+            self._executar(contexto, alvos)
+            with contexto.lock:
+                return {
+                    "valores": {alvo: contexto.valores.get(alvo) for alvo in alvos},
+                    "execucao": contexto.resumo_execucao(),
+                    "etapas_concluidas": self.etapas_concluidas(contexto),
+                }
+
+    def _executar(self, contexto, alvos):
+        necessarios = self._necessarios(alvos)
+        pendentes = [nome for nome in self.ordem if nome in necessarios]
+
+        with contexto.lock:
+            contexto.executados = []
+            contexto.reutilizados = []
+            contexto.erros = {}
+            contexto.tempos = {}
+
+        resolvidos = set(self.entradas_externas)
+        falhos = set()
+        em_execucao = {}
+
+        while pendentes or em_execucao:
+            for nome in list(pendentes):
+                no = self.nos[nome]
+                if any(entrada in falhos for entrada in no.entradas):
+                    # Bloqueado por falha a montante: o valor antigo não vale mais
+                    contexto._invalidar(nome)
+                    falhos.add(nome)
+                    pendentes.remove(nome)
+                    continue
+                if not all(entrada in resolvidos for entrada in no.entradas):
+                    continue
+                pendentes.remove(nome)
+                with contexto.lock:
+                    versoes_entradas = tuple(contexto.versoes.get(entrada, 0) for entrada in no.entradas)
+                    if contexto.memo.get(nome) == versoes_entradas and nome in contexto.valores:
+                        contexto.reutilizados.append(nome)
+                        resolvidos.add(nome)
+                        continue
+                    argumentos = {entrada: contexto.valores.get(entrada) for entrada in no.entradas}
+                if no.condicao is not None and not no.condicao(argumentos):
+                    contexto._definir_valor_no(nome, no.padrao)
+                    with contexto.lock:
+                        contexto.memo[nome] = versoes_entradas
+                    resolvidos.add(nome)
+                    continue
+                futuro = self._executor.submit(contextvars.copy_context().run, self._executar_no, no, argumentos)
+                em_execucao[futuro] = (nome, versoes_entradas)
+
+            if not em_execucao:
+                for nome in pendentes:
+                    # Restam apenas nós bloqueados por falhas
+                    contexto._invalidar(nome)
+                    falhos.add(nome)
+                pendentes = []
+                break
+
+            concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome, versoes_entradas = em_execucao.pop(futuro)
+                try:
+                    valor, duracao = futuro.result()
+                except Exception as e:
+                    logger.error("Erro no nó '{no}': {erro}", no=nome, erro=e)
+                    with contexto.lock:
+                        contexto.erros[nome] = str(e)
+                    contexto._invalidar(nome)
+                    falhos.add(nome)
+                    continue
+                contexto._definir_valor_no(nome, valor)
+                with contexto.lock:
+                    contexto.memo[nome] = versoes_entradas
+                    contexto.executados.append(nome)
+                    contexto.tempos[nome] = duracao
+                resolvidos.add(nome)
+
+        return contexto
+
+    def etapas_concluidas(self, contexto: ContextoCaso):
+        """
+        Retorna os valores dos nós concluídos e válidos para as entradas atuais do caso.
+
+        Usado pelos fallbacks para reaproveitar as etapas que deram certo antes de
+        uma falha, em vez de refazê-las.
+        """
+        return {
+            nome: contexto.valores[nome]
+            for nome in self.ordem
+            if contexto.concluido(nome, self.nos[nome].entradas)
+        }
+
+    def _executar_no(self, no, argumentos):
+        inicio = time.perf_counter()
+        valor = no.funcao(**argumentos)
+        return valor, time.perf_counter() - inicio
+
+
+_lock_casos = threading.Lock()
+_casos = OrderedDict()
+
+
+def obter_contexto_caso(caso_id=None) -> ContextoCaso:
+    """
+    Retorna o contexto memorizado do caso (ou um novo, se não houver caso_id).
+
+    Os contextos ficam em um LRU limitado por DAG_MAX_CASOS (padrão 1000).
+
+    Args:
+        caso_id: Identificador do caso informado pelo chamador (opcional)
+    """
+    if not caso_id:
+        return ContextoCaso()
+    with _lock_casos:
+        contexto = _casos.get(caso_id)
+        if contexto is None:
+            contexto = ContextoCaso(caso_id)
+            _casos[caso_id] = contexto
+        _casos.move_to_end(caso_id)
+        while len(_casos) > env_int("DAG_MAX_CASOS", 1000):
+            _casos.popitem(last=False)
+        return contexto
+
+
+def descartar_contexto_caso(caso_id):
+    """Remove o contexto memorizado do caso (por exemplo, quando houve degradação)."""
+    with _lock_casos:
+        _casos.pop(caso_id, None)
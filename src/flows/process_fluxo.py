@@ -1,104 +1,127 @@
-from src.flows.config_fluxos import configurar_decisor_fluxo
+from src.catalogo import valores_decodificacao
+from src.flows.config_fluxos import obter_grafo_fluxos
+from src.flows.motor_dag import descartar_contexto_caso, obter_contexto_caso
 from src.flows.fluxo_chain import (
     executar_chain_extracao,
-    executar_chain_identificacao_peca,
     executar_verificacao_trauma,
     executar_verificacao_mesma_doenca
 )
+from src.prazo import com_prazo
+from src.recuperacao import com_contexto_recuperacao
+from contextlib import nullcontext
 from loguru import logger
 
-def processar_texto_e_decidir_fluxo(texto, laudo_anatomopatologico=None):
+def processar_texto_e_decidir_fluxo(texto, laudo_anatomopatologico=None, prazo_segundos=None, caso_id=None):
     """
     Processa o texto, executa os agentes necessários para a decisão e decide qual fluxo seguir.
     
     Args:
         texto: Texto da descrição cirúrgica a ser processado
         laudo_anatomopatologico: Texto do laudo anatomopatológico (opcional)
+        prazo_segundos: Orçamento de tempo da requisição (opcional). As etapas que
+            não couberem no tempo restante usam seus fallbacks heurísticos.
+        caso_id: Identificador do caso (opcional). Com ele, os resultados das etapas
+            ficam memorizados e uma nova chamada (por exemplo, com o laudo que chegou
+            depois) recalcula apenas as etapas afetadas.
+        
+    Returns:
+        Resultado do fluxo selecionado, incluindo as etapas degradadas e as
+        contagens de embeddings e consultas ao vector store ("recuperacao")
+    """
+    # Os logs do caso (inclusive nas threads que copiam o contexto) levam o caso_id
+    contexto_log = logger.contextualize(caso_id=caso_id) if caso_id else nullcontext()
+    with contexto_log, com_prazo(prazo_segundos) as prazo, com_contexto_recuperacao() as recuperacao:
+        resultado = _decidir_e_executar_fluxo(texto, laudo_anatomopatologico, caso_id)
+        if isinstance(resultado, dict):
+            resultado.update(prazo.resumo())
+            resultado["recuperacao"] = recuperacao.resumo()
+        if caso_id and prazo.etapas_degradadas:
+            # Resultados de fallback não devem ser reaproveitados em chamadas futuras
+            descartar_contexto_caso(caso_id)
+        return resultado
+
+def _decidir_e_executar_fluxo(texto, laudo_anatomopatologico=None, caso_id=None):
+    """
+    Executa o grafo de etapas para o caso.
+    
+    A decisão entre os fluxos com e sem peça anatômica está nas condições do grafo
+    (ver config_fluxos.montar_grafo_fluxos). Se alguma etapa falhar, usa o fluxo
+    simplificado.
+    
+    Args:
+        texto: Texto da descrição cirúrgica a ser processado
+        laudo_anatomopatologico: Texto do laudo anatomopatológico (opcional)
+        caso_id: Identificador do caso para memorização das etapas (opcional)
         
     Returns:
         Resultado do fluxo selecionado
     """
     logger.info("Processando texto e decidindo fluxo")
     
-    # Configurar o decisor de fluxo
-    decisor = configurar_decisor_fluxo()
-    
-    # Verificar primeiro se o laudo foi fornecido
-    if not laudo_anatomopatologico:
-        logger.info("Laudo anatomopatológico não fornecido, usando fluxo sem peça anatômica")
-        try:
-            # Executar diretamente o fluxo sem peça anatômica
-            resultado = decisor.fluxos["fluxo_sem_peca_anatomica"]["funcao"](texto)
-            return resultado
-        except Exception as e:
-            logger.error(f"Erro ao executar fluxo sem peça anatômica: {str(e)}")
-            # Tentar um fluxo mais simples em caso de erro
-            return executar_fluxo_simplificado(texto)
+    contexto = obter_contexto_caso(caso_id)
+    grafo = obter_grafo_fluxos()
+    # Entradas e leitura sob o lock da execução do caso (ver GrafoFluxo.executar)
+    execucao_caso = grafo.executar(
+        contexto, alvos=["resultado"], entradas={"texto": texto, "laudo": laudo_anatomopatologico or None}
+    )
+    execucao = execucao_caso["execucao"]
     
-    # Se chegou aqui, é porque o laudo foi fornecido
-    # Agora verificamos se há retirada de peça anatômica
-    resultados = {}
+    if execucao["erros"]:
+        logger.error("Erro nas etapas {etapas}, usando fluxo simplificado", etapas=list(execucao["erros"]))
+        resultado = executar_fluxo_simplificado(texto, execucao_caso["etapas_concluidas"])
+    else:
+        # Cópia: o valor memorizado no contexto não deve ser alterado pela resposta
+        resultado = dict(execucao_caso["valores"]["resultado"])
     
-    try:
-        resultado_peca = executar_chain_identificacao_peca(texto)
-        resultados["retirada_peca_anatomica"] = resultado_peca.retirada_peca_anatomica
-        resultados["justificativa_peca"] = resultado_peca.justificativa
-        logger.info(f"Retirada de peça anatômica: {resultados['retirada_peca_anatomica']}")
+    if caso_id:
+        resultado["caso_id"] = caso_id
+    resultado["execucao"] = execucao
+    return resultado
         
-        # Se foi identificada peça anatômica, usar o fluxo com peça anatômica
-        if resultados["retirada_peca_anatomica"]:
-            logger.info("Peça anatômica identificada, usando fluxo com peça anatômica")
-            try:
-                resultado = decisor.fluxos["fluxo_com_peca_anatomica"]["funcao"](texto, laudo_anatomopatologico)
-                return resultado
-            except Exception as e:
-                logger.error(f"Erro ao executar fluxo com peça anatômica: {str(e)}")
-                # Tentar um fluxo mais simples em caso de erro
-                return executar_fluxo_simplificado(texto)
-        else:
-            logger.info("Peça anatômica não identificada, usando fluxo sem peça anatômica")
-            try:
-                resultado = decisor.fluxos["fluxo_sem_peca_anatomica"]["funcao"](texto)
-                return resultado
-            except Exception as e:
-                logger.error(f"Erro ao executar fluxo sem peça anatômica: {str(e)}")
-                # Tentar um fluxo mais simples em caso de erro
-                return executar_fluxo_simplificado(texto)
-            
-    except Exception as e:
-        logger.error(f"Erro ao identificar peça anatômica: {str(e)}")
-        # Em caso de erro na identificação, usar o fluxo sem peça anatômica por segurança
-        logger.info("Usando fluxo sem peça anatômica devido a erro na identificação")
-        try:
-            resultado = decisor.fluxos["fluxo_sem_peca_anatomica"]["funcao"](texto)
-            return resultado
-        except Exception as e:
-            logger.error(f"Erro ao executar fluxo sem peça anatômica após erro na identificação: {str(e)}")
-            # Tentar um fluxo mais simples em caso de erro
-            return executar_fluxo_simplificado(texto)
-        
-def executar_fluxo_simplificado(texto):
+def executar_fluxo_simplificado(texto, etapas_concluidas=None):
     """
     Executa um fluxo simplificado em caso de erro nos fluxos principais.
     Este fluxo faz apenas a extração e classificação básica.
     
+    As etapas que já foram concluídas antes da falha (extração, procedimentos
+    corrigidos, verificações) são reaproveitadas; só as que faltam são executadas.
+    
     Args:
         texto: Texto da descrição cirúrgica
+        etapas_concluidas: Valores das etapas concluídas do grafo (opcional)
         
     Returns:
         Resultado simplificado
     """
     logger.info("Executando fluxo simplificado devido a erros anteriores")
+    etapas = etapas_concluidas or {}
+    reaproveitadas = []
     
     try:
-        # Extrair procedimentos
-        resultado_extracao = executar_chain_extracao(texto)
+        # Extrair procedimentos (preferindo os já corrigidos com o laudo)
+        if etapas.get("procedimentos_corrigidos") is not None:
+            resultado_extracao = etapas["procedimentos_corrigidos"]
+            reaproveitadas.append("procedimentos_corrigidos")
+        elif etapas.get("extracao") is not None:
+            resultado_extracao = etapas["extracao"]
+            reaproveitadas.append("extracao")
+        else:
+            resultado_extracao = executar_chain_extracao(texto)
         
         # Verificar entrada por trauma diretamente
-        entrada_por_trauma = executar_verificacao_trauma(texto)
+        if "entrada_por_trauma" in etapas:
+            entrada_por_trauma = etapas["entrada_por_trauma"]
+            reaproveitadas.append("entrada_por_trauma")
+        else:
+            entrada_por_trauma = executar_verificacao_trauma(texto)
         
-        # Verificar se os procedimentos são para a mesma doença
-        mesma_doenca = executar_verificacao_mesma_doenca(resultado_extracao.procedimentos_identificados)
+        # Verificar se os procedimentos são para a mesma doença (a etapa concluída
+        # usou os mesmos procedimentos corrigidos reaproveitados acima)
+        if "mesma_doenca" in etapas and "procedimentos_corrigidos" in reaproveitadas:
+            mesma_doenca = etapas["mesma_doenca"]
+            reaproveitadas.append("mesma_doenca")
+        else:
+            mesma_doenca = executar_verificacao_mesma_doenca(resultado_extracao.procedimentos_identificados)
         
         # Verificar se há mais de um procedimento
         multiplos_procedimentos = len(resultado_extracao.procedimentos_identificados) > 1
@@ -115,8 +138,11 @@ def executar_fluxo_simplificado(texto):
         else:
             classificacao_final = "procedimento_isolado"
         
+        if reaproveitadas:
+            logger.info("Fluxo simplificado reaproveitou as etapas: {}", reaproveitadas)
+        
         # Construir resultado
-        return {
+        resultado = {
             "extracao": resultado_extracao,
             "classificacao_final": classificacao_final,
             "detalhes_classificacao": {
@@ -125,10 +151,15 @@ def executar_fluxo_simplificado(texto):
                 "mesma_doenca": mesma_doenca,
                 "numero_procedimentos": len(resultado_extracao.procedimentos_identificados)
             },
-            "tipo_fluxo": "simplificado"
+            "tipo_fluxo": "simplificado",
+            "etapas_reaproveitadas": reaproveitadas
         }
+        if etapas.get("decodificacao") is not None:
+            resultado["decodificacao"] = etapas["decodificacao"]
+            resultado["valores_catalogo"] = valores_decodificacao(etapas["decodificacao"])
+        return resultado
     except Exception as e:
-        logger.error(f"Erro no fluxo simplificado: {str(e)}")
+        logger.error("Erro no fluxo simplificado: {erro}", erro=e)
         # Retornar um resultado mínimo em caso de erro
         return {
             "erro": str(e),
@@ -1,19 +1,19 @@
 """
 Funções utilitárias para o projeto.
 """
+from src.registro_prompts import obter_prompt
 
 def load_prompt(path: str) -> str:
     """
-    Carrega um arquivo de prompt e retorna seu conteúdo como string.
+    Carrega um prompt e retorna seu conteúdo como string.
+    
+    O conteúdo vem do registro central de prompts (carregado uma única vez e
+    recarregado quando o arquivo muda).
     
     Args:
-        path: Caminho para o arquivo de prompt
+        path: Nome do prompt ou caminho relativo ao diretório de prompts
         
     Returns:
         O conteúdo do arquivo como string
     """
-    try:
-        with open(path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except Exception as e:
-        raise Exception(f"Erro ao carregar o prompt de {path}: {str(e)}") 
\ No newline at end of file
+    return obter_prompt(path) 
\ No newline at end of file
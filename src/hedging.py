@@ -0,0 +1,214 @@
+"""
+Requisições com hedge (duplicadas) para reduzir a latência de cauda das chamadas ao LLM.
+
+Opcional e restrito a chamadas idempotentes de saída estruturada. Quando uma chamada
+não retorna dentro do atraso de hedge (um percentil configurável das latências
+observadas para aquela chain, sem a espera na fila do agendador), uma segunda
+chamada idêntica é disparada e o primeiro resultado válido é usado. A carga extra é limitada a uma fração das chamadas.
+
+Configuração (variáveis de ambiente):
+    HEDGE_CHAINS: chains habilitadas, separadas por vírgula (padrão: nenhuma).
+                  Ex.: "verificador_trauma,identificador_peca,extrator"
+    HEDGE_PERCENTIL: percentil das latências usado como atraso (padrão 95)
+    HEDGE_ATRASO_PADRAO: atraso em segundos enquanto há poucas amostras (padrão 8)
+    HEDGE_ATRASO_MINIMO: atraso mínimo em segundos (padrão 1)
+    HEDGE_MAX_FRACAO: fração máxima de chamadas que podem gerar hedge (padrão 0.1)
+    HEDGE_JANELA: número de latências mantidas por chain (padrão 200)
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from loguru import logger
+from src.configuracao import env_float, env_int, env_str
+from src.metricas import registrar_fonte_metricas
+from src.prazo import prazo_atual
+
+AMOSTRAS_MINIMAS = 20
+
+
+class EstatisticasHedge:
+    """Latências observadas e contadores de hedge de uma chain."""
+
+    def __init__(self, janela):
+        self.latencias = deque(maxlen=janela)
+        self.chamadas = 0
+        self.hedges = 0
+        self.vitorias_hedge = 0
+        self.hedges_negados = 0
+
+    def atraso(self, percentil, atraso_padrao, atraso_minimo):
+        """Retorna o atraso de hedge atual (percentil das latências observadas)."""
+        if len(self.latencias) < AMOSTRAS_MINIMAS:
+            return atraso_padrao
+        ordenadas = sorted(self.latencias)
+        indice = min(len(ordenadas) - 1, int(round(percentil / 100.0 * (len(ordenadas) - 1))))
+        return max(atraso_minimo, ordenadas[indice])
+
+    def resumo(self):
+        return {
+            "chamadas": self.chamadas,
+            "hedges": self.hedges,
+            "hedges_negados": self.hedges_negados,
+            "vitorias_hedge": self.vitorias_hedge,
+            "taxa_hedge": round(self.hedges / self.chamadas, 4) if self.chamadas else None,
+            "taxa_vitoria": round(self.vitorias_hedge / self.hedges, 4) if self.hedges else None,
+            "amostras_latencia": len(self.latencias),
+        }
+
+
+class ExecutorHedge:
+    """Executa chamadas com hedge e mantém as estatísticas por chain."""
+
+    def __init__(self, chains, percentil=95.0, atraso_padrao=8.0, atraso_minimo=1.0, max_fracao=0.1, janela=200):
+        self.chains = set(chains)
+        self.percentil = percentil
+        self.atraso_padrao = atraso_padrao
+        self.atraso_minimo = atraso_minimo
+        self.max_fracao = max_fracao
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._estatisticas = {}
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+    def habilitado(self, nome_chain: str) -> bool:
+        """Indica se o hedge está habilitado para a chain."""
+        return nome_chain in self.chains
+
+    def _stats(self, nome_chain):
+        if nome_chain not in self._estatisticas:
+            self._estatisticas[nome_chain] = EstatisticasHedge(self.janela)
+        return self._estatisticas[nome_chain]
+
+    def _pode_disparar_hedge(self, stats):
+        # Limita a carga extra: hedges <= max_fracao * chamadas (com folga de 1)
+        return stats.hedges + 1 <= self.max_fracao * stats.chamadas + 1
+
+    def executar(self, nome_chain: str, funcao, valido=None, agendar=None):
+        """
+        Executa `funcao` com hedge.
+
+        O atraso do hedge conta a partir do momento em que a chamada original sai
+        da fila do agendador, e as latências registradas são só as de `funcao`
+        (quando o hedge vence, o atraso mais a duração do hedge): com o agendador
+        saturado, a espera na fila não vira hedge nem infla o percentil. A espera
+        pela saída da fila é limitada pelo prazo da requisição; esgotado o prazo,
+        não há hedge.
+
+        Args:
+            nome_chain: Nome da chain (chave das estatísticas)
+            funcao: Função sem argumentos que faz a chamada (idempotente)
+            valido: Função que valida o resultado (padrão: não é None)
+            agendar: Função que recebe uma chamada sem argumentos e a executa
+                     pelo agendador (padrão: executa diretamente); cada tentativa
+                     passa por ela
+
+        Returns:
+            O primeiro resultado válido entre a chamada original e o hedge
+        """
+        valido = valido or (lambda resultado: resultado is not None)
+        agendar = agendar or (lambda chamada: chamada())
+        with self._lock:
+            stats = self._stats(nome_chain)
+            stats.chamadas += 1
+            atraso = stats.atraso(self.percentil, self.atraso_padrao, self.atraso_minimo)
+
+        def tentativa(iniciada):
+            def medida():
+                iniciada.set()
+                inicio = time.perf_counter()
+                resultado = funcao()
+                return resultado, time.perf_counter() - inicio
+            return agendar(medida)
+
+        iniciada = threading.Event()
+        original = self._executor.submit(contextvars.copy_context().run, tentativa, iniciada)
+        # Erro do agendador antes de a chamada começar também libera a espera
+        original.add_done_callback(lambda _: iniciada.set())
+        prazo = prazo_atual()
+        limite_espera = max(0.0, prazo.restante()) if prazo is not None and prazo.segundos is not None else None
+        if not iniciada.wait(timeout=limite_espera):
+            # A chamada não saiu da fila dentro do prazo: um hedge também ficaria na
+            # fila; o agendador encerra a original pelo prazo
+            return self._finalizar(stats, original.result(), hedge=False)
+        concluidos, _ = wait([original], timeout=atraso)
+        if concluidos:
+            return self._finalizar(stats, original.result(), hedge=False)
+
+        with self._lock:
+            permitido = self._pode_disparar_hedge(stats)
+            if permitido:
+                stats.hedges += 1
+            else:
+                stats.hedges_negados += 1
+        if not permitido:
+            return self._finalizar(stats, original.result(), hedge=False)
+
+        logger.debug("Disparando hedge para '{chain}' após {atraso:.2f}s", chain=nome_chain, atraso=atraso)
+        duplicada = self._executor.submit(contextvars.copy_context().run, tentativa, threading.Event())
+        pendentes = {original, duplicada}
+        ultimo_erro = None
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                try:
+                    resultado, duracao = futuro.result()
+                except Exception as e:
+                    ultimo_erro = e
+                    continue
+                if valido(resultado):
+                    if futuro is duplicada:
+                        # Latência vista pelo chamador: o atraso já gasto com a original + o hedge
+                        duracao += atraso
+                    return self._finalizar(stats, (resultado, duracao), hedge=futuro is duplicada)
+        if ultimo_erro is not None:
+            raise ultimo_erro
+        return original.result()[0]
+
+    def _finalizar(self, stats, tentativa, hedge):
+        resultado, duracao = tentativa
+        with self._lock:
+            stats.latencias.append(duracao)
+            if hedge:
+                stats.vitorias_hedge += 1
+        return resultado
+
+    def resumo(self):
+        """Retorna as métricas de hedge por chain."""
+        with self._lock:
+            return {
+                "chains_habilitadas": sorted(self.chains),
+                "chains": {
+                    nome: {
+                        **stats.resumo(),
+                        "atraso_atual_s": round(stats.atraso(self.percentil, self.atraso_padrao, self.atraso_minimo), 3),
+                    }
+                    for nome, stats in self._estatisticas.items()
+                },
+            }
+
+
+_lock = threading.Lock()
+_executor_hedge = None
+
+
+def obter_executor_hedge() -> ExecutorHedge:
+    """Retorna o executor de hedge compartilhado, configurado a partir do ambiente."""
+    global _executor_hedge
+    if _executor_hedge is None:
+        with _lock:
+            if _executor_hedge is None:
+                chains = [nome.strip() for nome in (env_str("HEDGE_CHAINS") or "").split(",") if nome.strip()]
+                _executor_hedge = ExecutorHedge(
+                    chains,
+                    percentil=env_float("HEDGE_PERCENTIL", 95.0),
+                    atraso_padrao=env_float("HEDGE_ATRASO_PADRAO", 8.0),
+                    atraso_minimo=env_float("HEDGE_ATRASO_MINIMO", 1.0),
+                    max_fracao=env_float("HEDGE_MAX_FRACAO", 0.1),
+                    janela=env_int("HEDGE_JANELA", 200),
+                )
+    return _executor_hedge
+
+
+registrar_fonte_metricas("hedge", lambda: obter_executor_hedge().resumo())
@@ -0,0 +1,287 @@
+"""
+Índice vetorial local do catálogo com dimensão reduzida e quantização int8.
+
+Os embeddings do text-embedding-3-small podem ser encurtados: os primeiros d
+componentes, renormalizados, equivalem a pedir `dimensions=d` à API. O índice
+guarda a matriz do catálogo em d dimensões, quantizada em int8 por dimensão
+(escala simétrica), e faz a busca aproximada nessa matriz; os melhores
+`fator_rerank * k` candidatos são reordenados com o produto interno exato em float32
+na dimensão de re-rank (por padrão, a completa).
+
+A matriz de re-rank em float32 é a maior parte da memória por vetor, e o re-rank
+só lê `fator_rerank * k` linhas por consulta. Por isso ela é gravada em um arquivo
+.npy e mapeada em memória (mmap): só as páginas lidas ficam residentes, e os
+processos trabalhadores compartilham o mesmo cache de páginas do sistema.
+
+O NumPy não tem produto de matrizes inteiras via BLAS (int8 x int8 em int32 fica
+várias vezes mais lento que o float32), então a matriz int8 é convertida em
+blocos pequenos para um buffer float32 reaproveitado por thread, que cabe no
+cache, e pontuada com o BLAS.
+
+Fontes dos embeddings do catálogo, na ordem:
+- o armazém local da ingestão (INDICE_LOCAL_ARQUIVO, ver src/armazem_embeddings.py);
+- a coluna embedding_descricao_titulo do CSV do catálogo.
+
+Configuração (variáveis de ambiente):
+    RECUPERACAO_BACKEND: "supabase" (padrão) ou "local" para buscar neste índice
+    INDICE_LOCAL_ARQUIVO: arquivo SQLite com os embeddings (padrão: o do armazém local)
+    INDICE_LOCAL_DIMENSAO: dimensões da busca aproximada (padrão 256; 0 = todas)
+    INDICE_LOCAL_QUANTIZAR: quantiza a matriz de busca em int8 (padrão true)
+    INDICE_LOCAL_DIMENSAO_RERANK: dimensões do re-rank em float32 (padrão 0 = todas)
+    INDICE_LOCAL_FATOR_RERANK: candidatos re-ranqueados por documento pedido (padrão 4)
+    INDICE_LOCAL_RERANK_MMAP: mapeia a matriz de re-rank de um arquivo (padrão true)
+    INDICE_LOCAL_DIRETORIO_RERANK: diretório do arquivo de re-rank (padrão: o do projeto)
+"""
+import csv
+import glob
+import hashlib
+import os
+import threading
+from loguru import logger
+from src.configuracao import env_bool, env_int, env_str
+
+# Linhas da matriz int8 convertidas por vez na pontuação (buffer float32 que cabe no cache L2)
+TAMANHO_BLOCO = 1024
+
+PREFIXO_ARQUIVO_RERANK = "indice_local_rerank_"
+
+_lock = threading.Lock()
+_indice = None
+
+
+def reduzir(matriz, dimensao):
+    """Mantém as primeiras `dimensao` componentes e renormaliza cada linha (float32)."""
+    import numpy as np
+
+    matriz = np.asarray(matriz, dtype=np.float32)
+    if matriz.ndim == 1:
+        return reduzir(matriz[None, :], dimensao)[0]
+    if dimensao:
+        matriz = matriz[:, :dimensao]
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return np.ascontiguousarray(matriz / normas, dtype=np.float32)
+
+
+def mapear_em_disco(matriz, diretorio):
+    """
+    Grava a matriz em um .npy no diretório (nome pelo conteúdo) e a abre por mmap.
+
+    Processos com o mesmo catálogo reaproveitam o arquivo; arquivos de catálogos
+    anteriores são removidos.
+
+    Returns:
+        A matriz mapeada (somente leitura)
+    """
+    import numpy as np
+
+    digest = hashlib.sha1(np.ascontiguousarray(matriz).tobytes()).hexdigest()[:16]
+    caminho = os.path.join(diretorio, f"{PREFIXO_ARQUIVO_RERANK}{digest}.npy")
+    if not os.path.exists(caminho):
+        os.makedirs(diretorio, exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            np.save(arquivo, matriz)
+        os.replace(temporario, caminho)
+        for antigo in glob.glob(os.path.join(diretorio, f"{PREFIXO_ARQUIVO_RERANK}*.npy")):
+            if antigo != caminho:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+    return np.load(caminho, mmap_mode="r")
+
+
+class IndiceVetorialLocal:
+    """Busca por produto interno em memória, com dimensão reduzida, int8 e re-rank."""
+
+    def __init__(self, metadados, matriz, dimensao=256, quantizar=True, dimensao_rerank=None, fator_rerank=4,
+                 diretorio_rerank=None):
+        """
+        Args:
+            metadados: Um dicionário por linha (código, nome e descrição do procedimento)
+            matriz: Embeddings do catálogo (uma linha por procedimento, dimensão completa)
+            dimensao: Dimensões da busca aproximada (None ou 0 = todas)
+            quantizar: Se a matriz de busca é guardada em int8
+            dimensao_rerank: Dimensões do re-rank em float32 (None ou 0 = todas)
+            fator_rerank: Candidatos re-ranqueados por documento pedido (0 = sem re-rank)
+            diretorio_rerank: Diretório do arquivo mapeado da matriz de re-rank
+                (None = a matriz fica em memória)
+        """
+        import numpy as np
+
+        self.metadados = list(metadados)
+        self.dimensao = dimensao or matriz.shape[1]
+        self.quantizar = quantizar
+        self.fator_rerank = fator_rerank
+        self.dimensao_rerank = dimensao_rerank or matriz.shape[1]
+        self._local = threading.local()
+
+        busca = reduzir(matriz, self.dimensao)
+        if quantizar:
+            # Escala simétrica por dimensão: valor ≈ int8 * escala
+            maximos = np.abs(busca).max(axis=0) if len(busca) else np.ones(busca.shape[1], dtype=np.float32)
+            self.escala = np.maximum(maximos, 1e-12) / 127.0
+            self.matriz_busca = np.clip(np.rint(busca / self.escala), -127, 127).astype(np.int8)
+        else:
+            self.escala = None
+            self.matriz_busca = busca
+        self.matriz_rerank = None
+        if fator_rerank:
+            self.matriz_rerank = reduzir(matriz, self.dimensao_rerank)
+            if diretorio_rerank and len(self.matriz_rerank):
+                try:
+                    self.matriz_rerank = mapear_em_disco(self.matriz_rerank, diretorio_rerank)
+                except OSError as e:
+                    logger.warning(
+                        "Não foi possível mapear a matriz de re-rank em {diretorio}: {erro}; mantendo em memória",
+                        diretorio=diretorio_rerank, erro=e
+                    )
+
+    def bytes_por_vetor(self):
+        """
+        Bytes por procedimento da matriz de busca e da de re-rank; "memoria" conta
+        só o que fica residente (a matriz mapeada em disco não entra).
+        """
+        import numpy as np
+
+        busca = self.matriz_busca.itemsize * self.dimensao
+        rerank = self.matriz_rerank.itemsize * self.dimensao_rerank if self.matriz_rerank is not None else 0
+        em_disco = isinstance(self.matriz_rerank, np.memmap)
+        return {
+            "busca": busca,
+            "rerank": rerank,
+            "rerank_em_disco": em_disco,
+            "memoria": busca + (0 if em_disco else rerank),
+        }
+
+    def _buffer_conversao(self):
+        import numpy as np
+
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((TAMANHO_BLOCO, self.dimensao), dtype=np.float32)
+        return buffer
+
+    def pontuar(self, consulta):
+        """Pontuações aproximadas de todos os procedimentos para a consulta (dimensão completa)."""
+        import numpy as np
+
+        q = reduzir(consulta, self.dimensao)
+        if not self.quantizar:
+            return self.matriz_busca @ q
+        # A escala entra na consulta; cada bloco int8 é convertido no buffer da thread
+        q = q * self.escala
+        buffer = self._buffer_conversao()
+        pontuacoes = np.empty(len(self.matriz_busca), dtype=np.float32)
+        for inicio in range(0, len(self.matriz_busca), TAMANHO_BLOCO):
+            bloco = self.matriz_busca[inicio:inicio + TAMANHO_BLOCO]
+            convertido = buffer[:len(bloco)]
+            np.copyto(convertido, bloco, casting="unsafe")
+            np.matmul(convertido, q, out=pontuacoes[inicio:inicio + len(bloco)])
+        return pontuacoes
+
+    def buscar_indices(self, consulta, k):
+        """
+        Retorna (índices, similaridades) dos k procedimentos mais similares.
+        """
+        import numpy as np
+
+        n = len(self.matriz_busca)
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        pontuacoes = self.pontuar(consulta)
+        candidatos = min(n, k * self.fator_rerank) if self.fator_rerank else k
+        indices = np.argpartition(-pontuacoes, candidatos - 1)[:candidatos]
+        if self.matriz_rerank is not None:
+            q = reduzir(consulta, self.dimensao_rerank)
+            indices = np.sort(indices)  # leitura em ordem no arquivo mapeado
+            similaridades = np.asarray(self.matriz_rerank[indices], dtype=np.float32) @ q
+        else:
+            similaridades = pontuacoes[indices]
+        ordem = np.argsort(-similaridades)[:k]
+        return indices[ordem], similaridades[ordem]
+
+    def buscar(self, consulta, match_count=10):
+        """
+        Busca os documentos mais similares ao embedding da consulta.
+
+        Returns:
+            Lista de documentos no mesmo formato das linhas do vector store
+        """
+        indices, similaridades = self.buscar_indices(consulta, match_count)
+        return [
+            {**self.metadados[indice], "similarity": round(float(similaridade), 4), "origem": "indice_local"}
+            for indice, similaridade in zip(indices.tolist(), similaridades.tolist())
+        ]
+
+
+def carregar_embeddings_csv(caminho=None):
+    """
+    Lê os embeddings da coluna embedding_descricao_titulo do CSV do catálogo.
+
+    Returns:
+        Tupla (metadados, matriz float32)
+    """
+    import numpy as np
+    from src.catalogo import caminho_catalogo
+
+    csv.field_size_limit(2 ** 31 - 1)
+    metadados, vetores = [], []
+    with open(caminho or caminho_catalogo(), "r", encoding="utf-8", newline="") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            texto = (linha.get("embedding_descricao_titulo") or "").strip().strip("[]")
+            if not texto:
+                continue
+            vetores.append(np.array(texto.split(","), dtype=np.float32))
+            metadados.append({
+                "codigo_procedimento": linha.get("Código do Procedimento", "").strip(),
+                "nome_procedimento": linha.get("Nome do Procedimento", "").strip(),
+                "descricao_procedimento": linha.get("Descrição do Procedimento", "").strip(),
+            })
+    return metadados, np.vstack(vetores) if vetores else np.zeros((0, 0), dtype=np.float32)
+
+
+def carregar_embeddings_catalogo():
+    """Lê os embeddings do catálogo do armazém local, se existir, ou do CSV."""
+    from src.armazem_embeddings import CAMINHO_ARQUIVO_PADRAO, ArmazemArquivo
+
+    caminho = env_str("INDICE_LOCAL_ARQUIVO") or CAMINHO_ARQUIVO_PADRAO
+    if os.path.exists(caminho):
+        metadados, matriz = ArmazemArquivo(caminho).carregar()
+        if len(metadados):
+            return metadados, matriz
+    return carregar_embeddings_csv()
+
+
+def backend_local_habilitado() -> bool:
+    return (env_str("RECUPERACAO_BACKEND") or "supabase").strip().lower() == "local"
+
+
+def obter_indice_local():
+    """Retorna o índice local do catálogo, construído na primeira chamada."""
+    global _indice
+    if _indice is None:
+        with _lock:
+            if _indice is None:
+                from src.armazem_embeddings import DIRETORIO_PROJETO
+
+                metadados, matriz = carregar_embeddings_catalogo()
+                _indice = IndiceVetorialLocal(
+                    metadados,
+                    matriz,
+                    dimensao=env_int("INDICE_LOCAL_DIMENSAO", 256),
+                    quantizar=env_bool("INDICE_LOCAL_QUANTIZAR", True),
+                    dimensao_rerank=env_int("INDICE_LOCAL_DIMENSAO_RERANK", 0),
+                    fator_rerank=env_int("INDICE_LOCAL_FATOR_RERANK", 4),
+                    diretorio_rerank=(
+                        (env_str("INDICE_LOCAL_DIRETORIO_RERANK") or DIRETORIO_PROJETO)
+                        if env_bool("INDICE_LOCAL_RERANK_MMAP", True) else None
+                    ),
+                )
+                logger.info(
+                    "Índice local: {procedimentos} procedimentos, {dimensao} dimensões, {bytes} bytes residentes por vetor",
+                    procedimentos=len(metadados), dimensao=_indice.dimensao, bytes=_indice.bytes_por_vetor()["memoria"]
+                )
+    return _indice
@@ -0,0 +1,191 @@
+"""
+Ingestão incremental dos embeddings do catálogo SIGTAP no vector store.
+
+O CSV do catálogo é lido em streaming. Para cada linha, o hash (SHA-256) do
+texto "descricao_e_titulo" é comparado com o já gravado no destino: linhas sem
+mudança são ignoradas, e só as novas ou alteradas têm o embedding gerado, em
+lotes e com chamadas concorrentes. As linhas com embedding são gravadas (upsert
+pelo código) em lotes.
+
+Uso:
+    python -m src.ingestao_catalogo [--csv catalogo.csv] [--destino supabase|arquivo|postgres] [--arquivo caminho]
+        [--lote-embedding 100] [--concorrencia 4] [--lote-escrita 500] [--forcar]
+
+Configuração (variáveis de ambiente, sobrescritas pelos argumentos):
+    INGESTAO_LOTE_EMBEDDING: textos por chamada de embedding (padrão 100)
+    INGESTAO_CONCORRENCIA: chamadas de embedding simultâneas (padrão 4)
+    INGESTAO_LOTE_ESCRITA: linhas por upsert (padrão 500)
+"""
+import argparse
+import contextvars
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from src.configuracao import env_int
+
+
+def hash_conteudo(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def ler_catalogo(caminho):
+    """
+    Lê o CSV do catálogo em streaming, sem manter a coluna de embedding.
+
+    Yields:
+        Dicionários com código, nome, descrição, "descricao_e_titulo" e o hash do conteúdo
+    """
+    # A coluna de embedding do CSV ultrapassa o limite padrão de tamanho de campo
+    csv.field_size_limit(2 ** 31 - 1)
+    with open(caminho, "r", encoding="utf-8", newline="") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            codigo = (linha.get("Código do Procedimento") or "").strip()
+            if not codigo:
+                continue
+            nome = (linha.get("Nome do Procedimento") or "").strip()
+            descricao = (linha.get("Descrição do Procedimento") or "").strip()
+            texto = (linha.get("descricao_e_titulo") or "").strip() or f"{nome}:{descricao}"
+            yield {
+                "codigo_procedimento": codigo,
+                "nome_procedimento": nome,
+                "descricao_procedimento": descricao,
+                "descricao_e_titulo": texto,
+                "hash_conteudo": hash_conteudo(texto),
+            }
+
+
+def ingerir_catalogo(caminho_csv, armazem, gerar_embeddings, lote_embedding=None, concorrencia=None,
+                     lote_escrita=None, forcar=False):
+    """
+    Gera e grava os embeddings das linhas novas ou alteradas do catálogo.
+
+    Args:
+        caminho_csv: Caminho do CSV do catálogo
+        armazem: Destino (ver src/armazem_embeddings.py)
+        gerar_embeddings: Função que recebe uma lista de textos e retorna seus embeddings
+        lote_embedding: Textos por chamada de embedding
+        concorrencia: Chamadas de embedding simultâneas
+        lote_escrita: Linhas por gravação
+        forcar: Gera novamente os embeddings de todas as linhas
+
+    Returns:
+        Relatório com as linhas lidas, ignoradas, com embedding gerado e gravadas,
+        as falhas e a vazão
+    """
+    lote_embedding = lote_embedding or env_int("INGESTAO_LOTE_EMBEDDING", 100)
+    concorrencia = concorrencia or env_int("INGESTAO_CONCORRENCIA", 4)
+    lote_escrita = lote_escrita or env_int("INGESTAO_LOTE_ESCRITA", 500)
+
+    inicio = time.perf_counter()
+    existentes = {} if forcar else armazem.hashes()
+    logger.info("Ingestão no destino '{destino}': {linhas} linhas já gravadas", destino=armazem.nome, linhas=len(existentes))
+
+    relatorio = {"lidas": 0, "ignoradas": 0, "embeddings_gerados": 0, "gravadas": 0,
+                 "chamadas_embedding": 0, "falhas_embedding": 0}
+    pendentes = []
+    a_gravar = []
+    em_andamento = set()
+
+    def gerar(lote):
+        return lote, gerar_embeddings([linha["descricao_e_titulo"] for linha in lote])
+
+    def coletar(futuros):
+        for futuro in futuros:
+            em_andamento.discard(futuro)
+            relatorio["chamadas_embedding"] += 1
+            try:
+                lote, embeddings = futuro.result()
+            except Exception as e:
+                logger.error("Erro ao gerar embeddings de um lote: {erro}", erro=e)
+                relatorio["falhas_embedding"] += 1
+                continue
+            for linha, embedding in zip(lote, embeddings):
+                linha["embedding"] = embedding
+                a_gravar.append(linha)
+            relatorio["embeddings_gerados"] += len(lote)
+
+    def gravar(todas=False):
+        while a_gravar and (todas or len(a_gravar) >= lote_escrita):
+            lote = a_gravar[:lote_escrita]
+            del a_gravar[:lote_escrita]
+            relatorio["gravadas"] += armazem.gravar(lote)
+
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="ingestao") as executor:
+        def submeter(lote):
+            # Limita os lotes em voo para manter a memória constante em catálogos grandes
+            while len(em_andamento) >= 2 * concorrencia:
+                concluidos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                coletar(concluidos)
+                gravar()
+            em_andamento.add(executor.submit(contextvars.copy_context().run, gerar, lote))
+
+        for linha in ler_catalogo(caminho_csv):
+            relatorio["lidas"] += 1
+            if existentes.get(linha["codigo_procedimento"]) == linha["hash_conteudo"]:
+                relatorio["ignoradas"] += 1
+                continue
+            pendentes.append(linha)
+            if len(pendentes) >= lote_embedding:
+                submeter(pendentes)
+                pendentes = []
+        if pendentes:
+            submeter(pendentes)
+        coletar(list(wait(em_andamento).done))
+    gravar(todas=True)
+
+    duracao = time.perf_counter() - inicio
+    relatorio.update({
+        "destino": armazem.nome,
+        "duracao_s": round(duracao, 2),
+        "linhas_por_s": round(relatorio["lidas"] / duracao, 1) if duracao > 0 else None,
+        "embeddings_por_s": round(relatorio["embeddings_gerados"] / duracao, 1) if duracao > 0 else None,
+    })
+    logger.info(
+        "Ingestão concluída: {lidas} lidas, {ignoradas} ignoradas, "
+        "{embeddings_gerados} embeddings, {gravadas} gravadas em {duracao_s}s",
+        **relatorio,
+    )
+    return relatorio
+
+
+def main():
+    from src.agendador import com_prioridade
+    from src.armazem_embeddings import criar_armazem
+    from src.catalogo import caminho_catalogo
+    from src.flows.fluxo_chain import obter_processador
+
+    parser = argparse.ArgumentParser(description="Ingestão incremental dos embeddings do catálogo")
+    parser.add_argument("--csv", default=None, help="CSV do catálogo (padrão: CATALOGO_CSV)")
+    parser.add_argument("--destino", choices=["supabase", "arquivo", "postgres"], default="supabase")
+    parser.add_argument("--arquivo", default=None, help="Arquivo SQLite do destino 'arquivo' ou DSN do destino 'postgres'")
+    parser.add_argument("--lote-embedding", type=int, default=None)
+    parser.add_argument("--concorrencia", type=int, default=None)
+    parser.add_argument("--lote-escrita", type=int, default=None)
+    parser.add_argument("--forcar", action="store_true", help="Gera novamente todos os embeddings")
+    args = parser.parse_args()
+
+    armazem = criar_armazem(args.destino, args.arquivo)
+    with com_prioridade("lote"):
+        relatorio = ingerir_catalogo(
+            args.csv or caminho_catalogo(),
+            armazem,
+            obter_processador().gerar_embeddings,
+            lote_embedding=args.lote_embedding,
+            concorrencia=args.concorrencia,
+            lote_escrita=args.lote_escrita,
+            forcar=args.forcar,
+        )
+    print(json.dumps(relatorio, ensure_ascii=False))
+    return 0 if relatorio["falhas_embedding"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Configuração do logging (loguru) com baixo custo no caminho quente.
+
+Sem configuração, o loguru grava tudo (a partir de DEBUG) no stderr, de forma
+síncrona, na thread da requisição. Aqui o sink é configurado uma vez por processo:
+- nível mínimo global e níveis por módulo;
+- gravação síncrona por padrão: com um arquivo local ou o stderr, gravar direto
+  custa menos na thread da requisição do que entregar a mensagem a outra thread
+  (benchmarks/custo_logs.py). Para destinos lentos (disco de rede, pipe que pode
+  encher), LOG_ASSINCRONO=true grava em uma thread separada (SinkAssincrono): a
+  thread chamadora só formata a mensagem e a coloca em uma fila em memória. O
+  `enqueue=True` do loguru serializa (pickle) cada registro para uma fila entre
+  processos, o que custa mais ainda na thread chamadora;
+- formato texto ou JSON (um objeto por linha, com os campos passados por nome
+  ao logger, como caso_id, no objeto "extra");
+- amostragem dos eventos de debug de alto volume (debug_amostrado).
+
+No código, as mensagens usam a formatação do loguru (`logger.info("... {}", valor)`
+ou `logger.info("... {campo}", campo=valor)`) em vez de f-strings: com o nível
+desabilitado, a mensagem não é formatada. Valores caros de calcular vão com
+`logger.opt(lazy=True)` e uma função.
+
+Configuração (variáveis de ambiente):
+    LOG_NIVEL: nível mínimo (padrão INFO)
+    LOG_NIVEIS_MODULOS: níveis por módulo, "modulo=NIVEL" separados por vírgula
+        (por exemplo "src.flows.fluxo_chain=WARNING,src.recuperacao=DEBUG")
+    LOG_FORMATO: "texto" (padrão) ou "json"
+    LOG_ASSINCRONO: grava em uma thread separada, para destinos lentos (padrão false)
+    LOG_ARQUIVO: arquivo de log (padrão: stderr)
+    LOG_ROTACAO: tamanho para rotação do arquivo, só com LOG_ASSINCRONO=false
+        (padrão "100 MB"; no modo assíncrono, use a rotação externa, como o logrotate)
+    LOG_AMOSTRAGEM_DEBUG: fração dos eventos de debug_amostrado registrados (padrão 0.01)
+"""
+import os
+import queue
+import random
+import sys
+import threading
+from loguru import logger
+from src.configuracao import env_bool, env_float, env_str
+
+FORMATO_TEXTO = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+_lock = threading.Lock()
+_configurado = False
+_taxa_amostragem = 1.0
+_sink_assincrono = None
+
+
+class SinkAssincrono:
+    """
+    Sink do loguru que entrega as mensagens formatadas a uma thread escritora.
+
+    A escritora grava em lote tudo o que estiver na fila a cada vez. O loguru
+    chama stop() ao remover o sink, que grava o que falta antes de retornar.
+    """
+
+    def __init__(self, destino):
+        """
+        Args:
+            destino: Stream de texto aberto (sys.stderr ou um arquivo)
+        """
+        self.destino = destino
+        self._iniciar()
+
+    def _iniciar(self):
+        self._fila = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._escrever, name="logs", daemon=True)
+        self._thread.start()
+
+    def write(self, mensagem):
+        self._fila.put(mensagem)
+
+    def _escrever(self):
+        parar = False
+        while not parar:
+            mensagens = [self._fila.get()]
+            while True:
+                try:
+                    mensagens.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if None in mensagens:
+                parar = True
+                mensagens = [mensagem for mensagem in mensagens if mensagem is not None]
+            try:
+                self.destino.write("".join(mensagens))
+                self.destino.flush()
+            except Exception:
+                pass
+
+    def stop(self):
+        self._fila.put(None)
+        self._thread.join()
+        if self.destino not in (sys.stderr, sys.stdout):
+            self.destino.close()
+
+
+def _reiniciar_apos_fork():
+    # A thread escritora não sobrevive ao fork (trabalhadores em multiprocessing)
+    if _sink_assincrono is not None:
+        _sink_assincrono._iniciar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+
+
+def niveis_modulos(texto):
+    """Converte "modulo=NIVEL,..." no dicionário de filtro do loguru."""
+    niveis = {}
+    for item in (texto or "").split(","):
+        modulo, _, nivel = item.partition("=")
+        if modulo.strip() and nivel.strip():
+            niveis[modulo.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar_logs(forcar=False):
+    """
+    Substitui o sink padrão do loguru pelo configurado no ambiente (uma vez por processo).
+
+    Args:
+        forcar: Reconfigura mesmo que já tenha sido configurado (por exemplo, em testes)
+    """
+    global _configurado, _taxa_amostragem, _sink_assincrono
+    if _configurado and not forcar:
+        return
+    with _lock:
+        if _configurado and not forcar:
+            return
+        nivel = (env_str("LOG_NIVEL") or "INFO").upper()
+        filtro = {"": nivel, **niveis_modulos(env_str("LOG_NIVEIS_MODULOS"))}
+        # O sink precisa aceitar o menor nível; o filtro aplica o nível de cada módulo
+        nivel_sink = min(logger.level(valor).no for valor in filtro.values())
+        arquivo = env_str("LOG_ARQUIVO")
+        opcoes = {
+            "level": nivel_sink,
+            "filter": filtro,
+            "format": FORMATO_TEXTO,
+            "serialize": (env_str("LOG_FORMATO") or "texto").lower() == "json",
+            "backtrace": False,
+            "diagnose": False,
+        }
+        logger.remove()
+        _sink_assincrono = None
+        if env_bool("LOG_ASSINCRONO", False):
+            destino = open(arquivo, "a", encoding="utf-8") if arquivo else sys.stderr
+            _sink_assincrono = SinkAssincrono(destino)
+            logger.add(_sink_assincrono, colorize=not arquivo and sys.stderr.isatty(), **opcoes)
+        elif arquivo:
+            logger.add(arquivo, rotation=env_str("LOG_ROTACAO") or "100 MB", **opcoes)
+        else:
+            logger.add(sys.stderr, **opcoes)
+        _taxa_amostragem = min(max(env_float("LOG_AMOSTRAGEM_DEBUG", 0.01), 0.0), 1.0)
+        _configurado = True
+
+
+def encerrar_logs():
+    """Remove os sinks, gravando as mensagens pendentes na fila do sink assíncrono."""
+    global _configurado, _sink_assincrono
+    with _lock:
+        logger.remove()
+        _sink_assincrono = None
+        _configurado = False
+
+
+def debug_amostrado(mensagem, *args, **kwargs):
+    """
+    Registra em DEBUG apenas uma fração (LOG_AMOSTRAGEM_DEBUG) dos eventos.
+
+    Para eventos de alto volume, como os documentos formatados de cada caso. A
+    mensagem só é formatada nos eventos amostrados e com DEBUG habilitado.
+    """
+    if _taxa_amostragem >= 1.0 or random.random() < _taxa_amostragem:
+        logger.opt(depth=1).debug(mensagem, *args, **kwargs)
@@ -0,0 +1,42 @@
+"""
+Registro simples de métricas da aplicação.
+
+Cada componente registra uma função (fonte) que devolve um dicionário com o seu
+estado atual; o endpoint /metricas/ da API apenas coleta todas as fontes.
+"""
+import threading
+from loguru import logger
+
+_lock = threading.Lock()
+_fontes = {}
+
+
+def registrar_fonte_metricas(nome: str, funcao):
+    """
+    Registra (ou substitui) uma fonte de métricas.
+
+    Args:
+        nome: Nome da seção nas métricas
+        funcao: Função sem argumentos que retorna um dicionário serializável
+    """
+    with _lock:
+        _fontes[nome] = funcao
+
+
+def coletar_metricas():
+    """
+    Coleta as métricas de todas as fontes registradas.
+
+    Returns:
+        Dicionário nome da fonte -> métricas
+    """
+    with _lock:
+        fontes = list(_fontes.items())
+    resultado = {}
+    for nome, funcao in fontes:
+        try:
+            resultado[nome] = funcao()
+        except Exception as e:
+            logger.error("Erro ao coletar métricas de '{nome}': {erro}", nome=nome, erro=e)
+            resultado[nome] = {"erro": str(e)}
+    return resultado
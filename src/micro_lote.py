@@ -0,0 +1,182 @@
+"""
+Micro-lotes (micro-batching) de chamadas pequenas ao LLM entre requisições.
+
+Chamadas de um mesmo tipo que chegam dentro de uma janela curta são agrupadas em
+uma única chamada estruturada que devolve um resultado por item. A primeira
+chamada da janela é a "líder": espera a janela (ou o lote encher) e entrega o lote
+a uma thread do agrupador. O lote roda com a prioridade mais urgente e o prazo
+mais longo entre os seus itens (o resultado serve até o último prazo), e cada
+item, inclusive o da líder, aguarda o resultado só até o seu próprio prazo.
+
+Os itens vêm de requisições concorrentes do mesmo processo: chamadas da API (os
+endpoints rodam o fluxo fora do laço de eventos) e casos de um lote
+(LOTE_PARALELISMO).
+
+A função de lote recebe a lista de entradas e devolve uma lista alinhada de
+resultados; itens sem resultado (None) são reexecutados individualmente pelo
+chamador, assim como todos os itens de um lote que falhou.
+
+Configuração (variáveis de ambiente):
+    MICROLOTE_CHAINS: chains com micro-lote, separadas por vírgula (padrão: nenhuma).
+                      Ex.: "verificador_trauma,verificador_mesma_doenca"
+    MICROLOTE_JANELA_MS: janela de coleta em milissegundos (padrão 20)
+    MICROLOTE_TAMANHO_MAXIMO: itens por lote (padrão 16)
+    MICROLOTE_LOTES_SIMULTANEOS: lotes de uma chain executados ao mesmo tempo (padrão 8)
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from src.configuracao import env_float, env_int, env_str
+from src.metricas import registrar_fonte_metricas
+from src.agendador import PRIORIDADES, com_prioridade, prioridade_atual
+from src.prazo import PrazoEsgotadoError, com_prazo, prazo_atual, tempo_restante
+
+
+class _Lote:
+    def __init__(self):
+        self.entradas = []
+        self.prioridades = []
+        self.limites = []
+        self.resultados = None
+        self.erro = None
+        self.fechado = False
+        self.cheio = threading.Event()
+        self.concluido = threading.Event()
+
+
+class MicroLote:
+    """Agrupador de chamadas de um tipo em lotes por janela de tempo."""
+
+    def __init__(self, nome, janela=0.02, tamanho_maximo=16, lotes_simultaneos=8):
+        """
+        Args:
+            nome: Nome do agrupador (usado em logs e métricas)
+            janela: Segundos que a líder espera por outras chamadas
+            tamanho_maximo: Máximo de itens por lote
+            lotes_simultaneos: Threads que executam os lotes
+        """
+        self.nome = nome
+        self.janela = janela
+        self.tamanho_maximo = tamanho_maximo
+        self._executor = ThreadPoolExecutor(max_workers=lotes_simultaneos, thread_name_prefix=f"microlote-{nome}")
+        self._lock = threading.Lock()
+        self._aberto = None
+        self._contadores = {"lotes": 0, "itens": 0, "lotes_com_erro": 0, "maior_lote": 0, "prazo_esgotado": 0}
+
+    def submeter(self, entrada, executar_lote):
+        """
+        Adiciona a entrada ao lote aberto e aguarda o resultado.
+
+        Args:
+            entrada: Entrada do item
+            executar_lote: Função (lista de entradas) -> lista de resultados alinhada
+
+        Returns:
+            O resultado do item (None se o lote não trouxe resultado para ele)
+
+        Raises:
+            Exception: O erro do lote, se a chamada em lote falhar
+            PrazoEsgotadoError: Se o prazo do chamador acabar antes do resultado do lote
+        """
+        prazo = prazo_atual()
+        with self._lock:
+            lote = self._aberto
+            lider = lote is None
+            if lider:
+                lote = self._aberto = _Lote()
+            indice = len(lote.entradas)
+            lote.entradas.append(entrada)
+            lote.prioridades.append(prioridade_atual())
+            lote.limites.append(prazo.limite if prazo is not None else float("inf"))
+            if len(lote.entradas) >= self.tamanho_maximo:
+                self._fechar(lote)
+
+        if lider:
+            lote.cheio.wait(self.janela)
+            with self._lock:
+                self._fechar(lote)
+            self._executor.submit(contextvars.copy_context().run, self._executar, lote, executar_lote)
+
+        restante = tempo_restante()
+        if not lote.concluido.wait(timeout=max(0.0, restante) if restante is not None else None):
+            with self._lock:
+                self._contadores["prazo_esgotado"] += 1
+            raise PrazoEsgotadoError(f"Prazo esgotado aguardando o micro-lote '{self.nome}'")
+
+        if lote.erro is not None:
+            raise lote.erro
+        return lote.resultados[indice] if indice < len(lote.resultados) else None
+
+    def _fechar(self, lote):
+        # Chamado com self._lock adquirido
+        if not lote.fechado:
+            lote.fechado = True
+            if self._aberto is lote:
+                self._aberto = None
+            lote.cheio.set()
+
+    def _executar(self, lote, executar_lote):
+        tamanho = len(lote.entradas)
+        try:
+            prioridade = min(lote.prioridades, key=lambda nome: PRIORIDADES.get(nome, 0))
+            limite = max(lote.limites)
+            segundos = None if limite == float("inf") else max(0.0, limite - time.monotonic())
+            with com_prioridade(prioridade), com_prazo(segundos):
+                lote.resultados = list(executar_lote(lote.entradas))
+        except Exception as e:
+            logger.error("Erro no micro-lote '{nome}' com {tamanho} itens: {erro}", nome=self.nome, tamanho=tamanho, erro=e)
+            lote.erro = e
+        finally:
+            with self._lock:
+                self._contadores["lotes"] += 1
+                self._contadores["itens"] += tamanho
+                self._contadores["maior_lote"] = max(self._contadores["maior_lote"], tamanho)
+                if lote.erro is not None:
+                    self._contadores["lotes_com_erro"] += 1
+            lote.concluido.set()
+
+    def resumo(self):
+        with self._lock:
+            return {
+                **self._contadores,
+                "tamanho_medio": (
+                    round(self._contadores["itens"] / self._contadores["lotes"], 2)
+                    if self._contadores["lotes"] else None
+                ),
+                "janela_ms": round(self.janela * 1000, 1),
+                "tamanho_maximo": self.tamanho_maximo,
+            }
+
+
+_lock = threading.Lock()
+_micro_lotes = {}
+
+
+def micro_lote_habilitado(nome: str) -> bool:
+    """Indica se a chain está configurada em MICROLOTE_CHAINS."""
+    chains = env_str("MICROLOTE_CHAINS", "")
+    return nome in {chain.strip() for chain in chains.split(",") if chain.strip()}
+
+
+def obter_micro_lote(nome: str) -> MicroLote:
+    """Retorna o agrupador compartilhado da chain."""
+    micro_lote = _micro_lotes.get(nome)
+    if micro_lote is None:
+        with _lock:
+            micro_lote = _micro_lotes.get(nome)
+            if micro_lote is None:
+                micro_lote = MicroLote(
+                    nome,
+                    janela=env_float("MICROLOTE_JANELA_MS", 20.0) / 1000.0,
+                    tamanho_maximo=max(1, env_int("MICROLOTE_TAMANHO_MAXIMO", 16)),
+                    lotes_simultaneos=max(1, env_int("MICROLOTE_LOTES_SIMULTANEOS", 8)),
+                )
+                _micro_lotes[nome] = micro_lote
+    return micro_lote
+
+
+registrar_fonte_metricas(
+    "micro_lote", lambda: {nome: micro_lote.resumo() for nome, micro_lote in list(_micro_lotes.items())}
+)
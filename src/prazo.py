@@ -0,0 +1,166 @@
+"""
+Prazo (deadline) por requisição propagado pelas etapas dos fluxos.
+
+O prazo da requisição corrente fica em um ContextVar, do mesmo jeito que a
+prioridade do agendador. Antes de uma chamada ao LLM, cada etapa consulta
+`prazo_permite(etapa)`: se o tempo restante não cobre o custo estimado da etapa,
+ela usa o seu fallback barato e registra a degradação, que é devolvida na resposta.
+
+O custo estimado de cada etapa é a média móvel das latências observadas, ou
+PRAZO_CUSTO_PADRAO segundos enquanto não há observações.
+
+O prazo também limita as esperas depois dessa verificação: a fila do agendador
+(src/agendador.py) e a espera de um item por um micro-lote (src/micro_lote.py)
+levantam PrazoEsgotadoError quando o prazo acaba, e a etapa usa o seu fallback
+com a degradação registrada com o motivo "prazo" (ver motivo_degradacao).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+from src.configuracao import env_float
+
+_prazo_atual = contextvars.ContextVar("prazo_atual", default=None)
+
+_lock = threading.Lock()
+_latencias_etapas = {}
+
+
+class PrazoEsgotadoError(Exception):
+    """Levantada quando o prazo da requisição acaba durante uma espera (fila, micro-lote)."""
+
+
+class Prazo:
+    """Prazo absoluto de uma requisição e registro das etapas degradadas."""
+
+    def __init__(self, segundos: float = None):
+        self.segundos = segundos
+        # 0 (ou negativo) é um prazo já expirado, não a ausência de prazo
+        self.limite = time.monotonic() + segundos if segundos is not None else float("inf")
+        self.etapas_degradadas = []
+        self.decisoes_locais = []
+        self._lock = threading.Lock()
+
+    def restante(self) -> float:
+        """Segundos restantes até o prazo (negativo se já expirou)."""
+        return self.limite - time.monotonic()
+
+    def resumo(self):
+        """Retorna as informações do prazo para inclusão na resposta."""
+        with self._lock:
+            return {
+                "prazo_segundos": self.segundos,
+                "restante_segundos": round(self.restante(), 3) if self.segundos is not None else None,
+                "etapas_degradadas": list(self.etapas_degradadas),
+                "decisoes_locais": list(self.decisoes_locais),
+            }
+
+    def registrar_degradacao(self, etapa: str, motivo: str):
+        with self._lock:
+            self.etapas_degradadas.append({"etapa": etapa, "motivo": motivo})
+
+    def registrar_decisao_local(self, etapa: str, origem: str):
+        with self._lock:
+            self.decisoes_locais.append({"etapa": etapa, "origem": origem})
+
+
+@contextmanager
+def com_prazo(segundos: float = None):
+    """
+    Define o prazo das etapas executadas dentro do bloco.
+
+    Mesmo sem orçamento, o objeto Prazo é criado para registrar as etapas que
+    usaram fallback por erro.
+
+    Args:
+        segundos: Orçamento de tempo em segundos (None = sem prazo)
+
+    Yields:
+        O objeto Prazo criado
+    """
+    prazo = Prazo(segundos)
+    token = _prazo_atual.set(prazo)
+    try:
+        yield prazo
+    finally:
+        _prazo_atual.reset(token)
+
+
+def prazo_atual():
+    """Retorna o Prazo da requisição corrente (ou None)."""
+    return _prazo_atual.get()
+
+
+def registrar_latencia_etapa(etapa: str, duracao: float):
+    """Atualiza a média móvel de latência de uma etapa."""
+    with _lock:
+        anterior = _latencias_etapas.get(etapa)
+        _latencias_etapas[etapa] = duracao if anterior is None else 0.8 * anterior + 0.2 * duracao
+
+
+def custo_estimado(etapa: str) -> float:
+    """Retorna o custo estimado (segundos) de uma etapa."""
+    with _lock:
+        custo = _latencias_etapas.get(etapa)
+    return custo if custo is not None else env_float("PRAZO_CUSTO_PADRAO", 3.0)
+
+
+def prazo_permite(etapa: str) -> bool:
+    """
+    Indica se ainda há tempo para executar a etapa com o LLM.
+
+    Quando não há, a degradação é registrada no prazo corrente e o chamador deve
+    usar o fallback barato da etapa.
+
+    Args:
+        etapa: Nome da etapa (o mesmo nome da chain)
+
+    Returns:
+        True se não há prazo ou se o tempo restante cobre o custo estimado
+    """
+    prazo = prazo_atual()
+    if prazo is None or prazo.segundos is None:
+        return True
+    restante = prazo.restante()
+    custo = custo_estimado(etapa)
+    if restante >= custo:
+        return True
+    logger.warning(
+        "Prazo insuficiente para '{etapa}' (restante {restante:.2f}s, estimado {custo:.2f}s); usando fallback",
+        etapa=etapa, restante=restante, custo=custo,
+    )
+    prazo.registrar_degradacao(etapa, "prazo")
+    return False
+
+
+def tempo_restante():
+    """Segundos restantes do prazo corrente, ou None se não há prazo."""
+    prazo = prazo_atual()
+    if prazo is None or prazo.segundos is None:
+        return None
+    return prazo.restante()
+
+
+def motivo_degradacao(erro: Exception) -> str:
+    """Motivo registrado quando uma etapa usa o fallback por causa de `erro`."""
+    return "prazo" if isinstance(erro, PrazoEsgotadoError) else "erro"
+
+
+def registrar_degradacao(etapa: str, motivo: str):
+    """Registra no prazo corrente (se houver) que a etapa usou o fallback."""
+    prazo = prazo_atual()
+    if prazo is not None:
+        prazo.registrar_degradacao(etapa, motivo)
+
+
+def registrar_decisao_local(etapa: str, origem: str):
+    """
+    Registra no prazo corrente (se houver) que a etapa foi decidida sem o LLM.
+
+    Assim os resultados exportados para treino não usam como rótulo decisões do
+    próprio classificador local.
+    """
+    prazo = prazo_atual()
+    if prazo is not None:
+        prazo.registrar_decisao_local(etapa, origem)
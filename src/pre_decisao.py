@@ -0,0 +1,146 @@
+"""
+Pré-decisão local (sem LLM) da verificação de mesma doença.
+
+Combina dois sinais baratos:
+- similaridade de cosseno entre os embeddings (nome + descrição) dos procedimentos,
+  gerados em uma única chamada em lote;
+- concordância do sítio anatômico, tomado do catálogo SIGTAP: o procedimento é
+  associado ao item mais parecido do catálogo local e o sítio é a "forma de
+  organização" do código (seis primeiros dígitos, por exemplo 040703 = fígado e
+  vias biliares).
+
+Conjuntos claramente parecidos (todos os pares acima do limiar alto e mesmo sítio)
+ou claramente distintos (algum par abaixo do limiar baixo e com sítios diferentes)
+são decididos localmente; os demais vão para o LLM.
+
+A pré-decisão muda o resultado do faturamento sem consultar o LLM, então fica
+desligada por padrão: antes de habilitá-la, calibre os limiares com
+benchmarks/validar_pre_decisao.py, que mede a concordância com o
+verificador_mesma_doenca e a cobertura (casos decididos localmente).
+
+Configuração (variáveis de ambiente):
+    MESMA_DOENCA_PRE_DECISAO: habilita a pré-decisão (padrão false)
+    MESMA_DOENCA_LIMIAR_ALTO: similaridade mínima de todos os pares para "mesma doença" (padrão 0.75)
+    MESMA_DOENCA_LIMIAR_BAIXO: similaridade abaixo da qual um par é "doenças diferentes" (padrão 0.30)
+    MESMA_DOENCA_SIMILARIDADE_CATALOGO: pontuação lexical mínima para associar o sítio (padrão 0.5)
+"""
+import threading
+from src.catalogo import buscar_no_catalogo_local
+from src.configuracao import env_bool, env_float
+from src.metricas import registrar_fonte_metricas
+
+_lock = threading.Lock()
+_contadores = {"mesma_doenca": 0, "doencas_diferentes": 0, "indefinido": 0}
+
+
+def pre_decisao_habilitada() -> bool:
+    """Indica se a pré-decisão de mesma doença está habilitada."""
+    return env_bool("MESMA_DOENCA_PRE_DECISAO", False)
+
+
+def texto_procedimento(procedimento) -> str:
+    """Texto usado no embedding e na busca no catálogo: nome e descrição do procedimento."""
+    if isinstance(procedimento, dict):
+        nome, descricao = procedimento.get("procedimento", ""), procedimento.get("descricao", "")
+    else:
+        nome, descricao = getattr(procedimento, "procedimento", ""), getattr(procedimento, "descricao", "")
+    return f"{nome}: {descricao}" if descricao else str(nome or procedimento)
+
+
+def sitio_anatomico(procedimento):
+    """
+    Retorna o sítio anatômico (forma de organização SIGTAP) do procedimento, ou None
+    se nenhum item do catálogo for parecido o suficiente.
+    """
+    documentos = buscar_no_catalogo_local(texto_procedimento(procedimento), match_count=1)
+    if not documentos or documentos[0]["similarity"] < env_float("MESMA_DOENCA_SIMILARIDADE_CATALOGO", 0.5):
+        return None
+    codigo = "".join(c for c in str(documentos[0]["codigo_procedimento"]) if c.isdigit())
+    return codigo[:6] if len(codigo) >= 6 else None
+
+
+def similaridades_pares(embeddings):
+    """Retorna a matriz de similaridade de cosseno entre os embeddings."""
+    import numpy as np
+
+    matriz = np.asarray(embeddings, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    matriz = matriz / np.maximum(normas, 1e-12)
+    return matriz @ matriz.T
+
+
+def limiares_pre_decisao():
+    """Retorna (limiar alto, limiar baixo) configurados."""
+    return env_float("MESMA_DOENCA_LIMIAR_ALTO", 0.75), env_float("MESMA_DOENCA_LIMIAR_BAIXO", 0.30)
+
+
+def decidir_por_limiares(similaridades, sitios, limiar_alto, limiar_baixo):
+    """
+    Aplica a regra da pré-decisão à matriz de similaridades e aos sítios.
+
+    Returns:
+        True (mesma doença), False (doenças diferentes) ou None (limítrofe)
+    """
+    n = len(sitios)
+    pares = [(i, j, float(similaridades[i][j])) for i in range(n) for j in range(i + 1, n)]
+    mesmo_sitio = all(sitio is not None for sitio in sitios) and len(set(sitios)) == 1
+    if pares and all(sim >= limiar_alto for _, _, sim in pares) and mesmo_sitio:
+        return True
+    if any(
+        sim <= limiar_baixo and sitios[i] is not None and sitios[j] is not None and sitios[i] != sitios[j]
+        for i, j, sim in pares
+    ):
+        return False
+    return None
+
+
+def pre_decidir_mesma_doenca(embeddings, sitios):
+    """
+    Decide localmente se os procedimentos tratam a mesma doença, quando o caso é claro.
+
+    Args:
+        embeddings: Embeddings dos procedimentos (um por procedimento)
+        sitios: Sítios anatômicos dos procedimentos (None quando desconhecido)
+
+    Returns:
+        Tupla (decisão, detalhes): decisão é True/False, ou None se o caso for limítrofe
+    """
+    similaridades = similaridades_pares(embeddings)
+    decisao = decidir_por_limiares(similaridades, sitios, *limiares_pre_decisao())
+    n = len(sitios)
+    pares = [(i, j, float(similaridades[i, j])) for i in range(n) for j in range(i + 1, n)]
+
+    with _lock:
+        chave = "indefinido" if decisao is None else "mesma_doenca" if decisao else "doencas_diferentes"
+        _contadores[chave] += 1
+
+    detalhes = {
+        "similaridade_minima": round(min((sim for _, _, sim in pares), default=1.0), 4),
+        "similaridade_maxima": round(max((sim for _, _, sim in pares), default=1.0), 4),
+        "sitios": sitios,
+    }
+    return decisao, detalhes
+
+
+def mesma_doenca_por_sitio(procedimentos):
+    """
+    Heurística sem embeddings: mesma doença se todos os sítios conhecidos coincidem.
+
+    Usada como fallback quando o LLM não está disponível.
+    """
+    sitios = {sitio for sitio in (sitio_anatomico(p) for p in procedimentos) if sitio is not None}
+    return len(sitios) <= 1
+
+
+def resumo_pre_decisao():
+    with _lock:
+        total = sum(_contadores.values())
+        return {
+            **_contadores,
+            "taxa_decidida_localmente": (
+                round((total - _contadores["indefinido"]) / total, 4) if total else None
+            ),
+        }
+
+
+registrar_fonte_metricas("pre_decisao_mesma_doenca", resumo_pre_decisao)
@@ -0,0 +1,129 @@
+"""
+Processamento em lote de casos com reaproveitamento de duplicatas.
+
+Os casos do lote são agrupados (src/deduplicacao.py): apenas um representante de
+cada grupo de duplicatas exatas ou quase-duplicatas passa pelo fluxo completo, e
+os demais membros recebem o resultado do representante, marcado com
+"reaproveitado_de". O relatório de reaproveitamento acompanha os resultados.
+
+Usado pelo job "processar_lote" da fila e pela linha de comando:
+    python -m src.processamento_lote --entrada casos.jsonl --saida resultados.jsonl [--limiar 0.85]
+
+Cada linha da entrada é um objeto com "text" e, opcionalmente, "id", "laudo" e
+"prazo_segundos".
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from src.configuracao import env_int
+from src.deduplicacao import agrupar_casos
+
+
+def processar_lote(casos, limiar=0.85, paralelismo=None):
+    """
+    Processa os casos do lote, executando o fluxo apenas para os representantes.
+
+    Args:
+        casos: Lista de dicionários com "text" e, opcionalmente, "id", "laudo" e "prazo_segundos"
+        limiar: Similaridade mínima para considerar dois casos quase-duplicatas
+        paralelismo: Representantes processados em paralelo (padrão: LOTE_PARALELISMO ou 4)
+
+    Returns:
+        Dicionário com "resultados" (um por caso, na ordem da entrada) e "relatorio"
+    """
+    from src.flows.process_fluxo import processar_texto_e_decidir_fluxo
+
+    inicio = time.perf_counter()
+    grupos = agrupar_casos(casos, limiar)
+    ids = [str(caso.get("id", posicao)) for posicao, caso in enumerate(casos)]
+    representantes = sorted({representante for representante, _, _ in grupos})
+    logger.info("Lote com {casos} casos: {representantes} representantes a processar", casos=len(casos), representantes=len(representantes))
+
+    def processar(posicao):
+        caso = casos[posicao]
+        return processar_texto_e_decidir_fluxo(caso["text"], caso.get("laudo"), caso.get("prazo_segundos"))
+
+    paralelismo = paralelismo or env_int("LOTE_PARALELISMO", 4)
+    with ThreadPoolExecutor(max_workers=max(1, paralelismo)) as executor:
+        futuros = {
+            posicao: executor.submit(contextvars.copy_context().run, processar, posicao)
+            for posicao in representantes
+        }
+        resultados_representantes = {}
+        for posicao, futuro in futuros.items():
+            try:
+                resultados_representantes[posicao] = futuro.result()
+            except Exception as e:
+                logger.error("Erro no caso {caso_id} do lote: {erro}", caso_id=ids[posicao], erro=e)
+                resultados_representantes[posicao] = {
+                    "erro": str(e), "classificacao_final": "não_classificado", "tipo_fluxo": "erro"
+                }
+
+    resultados = []
+    membros = {}
+    for posicao, (representante, tipo, similaridade) in enumerate(grupos):
+        resultado = dict(resultados_representantes[representante])
+        if tipo != "representante":
+            resultado["reaproveitado_de"] = ids[representante]
+            resultado["tipo_duplicata"] = tipo
+            resultado["similaridade_estimada"] = similaridade
+            membros.setdefault(ids[representante], []).append(ids[posicao])
+        resultados.append({"id": ids[posicao], "resultado": resultado})
+
+    exatas = sum(1 for _, tipo, _ in grupos if tipo == "exata")
+    quase = sum(1 for _, tipo, _ in grupos if tipo == "quase_duplicata")
+    relatorio = {
+        "total_casos": len(casos),
+        "processados": len(representantes),
+        "duplicatas_exatas": exatas,
+        "quase_duplicatas": quase,
+        "taxa_reaproveitamento": round((exatas + quase) / len(casos), 4) if casos else 0.0,
+        "limiar": limiar,
+        "grupos": [{"representante": representante, "membros": lista} for representante, lista in membros.items()],
+        "duracao_s": round(time.perf_counter() - inicio, 2),
+    }
+    logger.info(
+        "Lote concluído: {processados} processados, {exatas} duplicatas exatas e {quase} quase-duplicatas reaproveitadas",
+        processados=relatorio["processados"], exatas=exatas, quase=quase
+    )
+    return {"resultados": resultados, "relatorio": relatorio}
+
+
+def main():
+    from src.agendador import com_prioridade
+    from src.fila_jobs import para_json
+
+    parser = argparse.ArgumentParser(description="Processa um arquivo de casos reaproveitando duplicatas")
+    parser.add_argument("--entrada", required=True, help="Arquivo JSONL com os casos")
+    parser.add_argument("--saida", required=True, help="Arquivo JSONL com os resultados")
+    parser.add_argument("--relatorio", help="Arquivo JSON com o relatório de reaproveitamento (opcional)")
+    parser.add_argument("--limiar", type=float, default=0.85)
+    parser.add_argument("--paralelismo", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.entrada, "r", encoding="utf-8") as arquivo:
+        casos = [json.loads(linha) for linha in arquivo if linha.strip()]
+
+    with com_prioridade("lote"):
+        saida = processar_lote(casos, args.limiar, args.paralelismo)
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        for item in saida["resultados"]:
+            arquivo.write(json.dumps(para_json(item), ensure_ascii=False) + "\n")
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as arquivo:
+            json.dump(saida["relatorio"], arquivo, ensure_ascii=False, indent=2)
+    print(json.dumps({k: v for k, v in saida["relatorio"].items() if k != "grupos"}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
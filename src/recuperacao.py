@@ -0,0 +1,358 @@
+"""
+Recuperação por procedimento com fusão por posição recíproca (RRF).
+
+Uma única consulta com os nomes de todos os procedimentos concatenados gera um
+embedding "médio", e os candidatos de cada procedimento ficam diluídos. Aqui cada
+procedimento vira uma consulta própria, executadas em paralelo, e as listas
+ranqueadas são fundidas por RRF (pontuação = soma de 1 / (k + posição)), com
+deduplicação pelo código do procedimento. O primeiro candidato de cada consulta
+fica à frente dos demais, então todos os procedimentos têm representação no topo.
+
+Configuração (variáveis de ambiente):
+    RECUPERACAO_RRF_K: constante k da fusão (padrão 60)
+    RECUPERACAO_CANDIDATOS_POR_CONSULTA: documentos pedidos por consulta (padrão 8)
+    RECUPERACAO_DOCS_POR_PROCEDIMENTO: documentos mantidos após a fusão, por procedimento (padrão 5)
+    RECUPERACAO_MAX_PARALELISMO: consultas simultâneas (padrão 8)
+    RECUPERACAO_SIMILARIDADE_MINIMA: descarta documentos abaixo desta similaridade (padrão 0.25)
+    RECUPERACAO_GAP_RELATIVO: descarta documentos cuja similaridade fica mais de
+        esta fração abaixo da do primeiro da mesma consulta (padrão 0.35)
+    RECUPERACAO_ORCAMENTO_TOKENS: tokens máximos dos documentos formatados para o prompt (padrão 1200)
+    RECUPERACAO_RPC_LOTE: usa a RPC em lote, com todas as consultas em uma única
+        chamada (padrão false; exige sql/match_procedimentos_lote.sql aplicado no Supabase)
+
+Dentro de uma requisição (com_contexto_recuperacao), embeddings e listas
+recuperadas por termo ficam em um ContextoRecuperacao, do mesmo jeito que o
+prazo: a comparação com o laudo e a decodificação consultam os mesmos
+procedimentos, e a segunda etapa reaproveita o que a primeira já buscou. Uma
+etapa também pode antecipar a recuperação de um termo (antecipar), como a
+extração em streaming (src/extracao_streaming.py); quem pedir o mesmo termo
+depois espera a consulta em andamento em vez de repeti-la.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from src.catalogo import normalizar_texto
+from src.agendador import estimar_tokens
+from src.configuracao import env_bool, env_float, env_int
+
+_lock = threading.Lock()
+_executor = None
+
+_contexto_atual = contextvars.ContextVar("contexto_recuperacao", default=None)
+
+
+class ContextoRecuperacao:
+    """Embeddings e documentos recuperados durante uma requisição, com contadores."""
+
+    def __init__(self):
+        self.embeddings = {}
+        self.documentos = {}
+        self.lotes_embedding = 0
+        self.textos_embedding = 0
+        self.embeddings_reaproveitados = 0
+        self.rodadas_recuperacao = 0
+        self.consultas = 0
+        self.consultas_reaproveitadas = 0
+        self.consultas_antecipadas = 0
+        self._antecipadas = {}
+        self._lock = threading.Lock()
+
+    def obter_embeddings(self, textos, gerar):
+        """
+        Retorna os embeddings dos textos, gerando em um único lote apenas os que
+        ainda não foram calculados nesta requisição.
+
+        Args:
+            textos: Lista de textos
+            gerar: Função que recebe uma lista de textos e retorna seus embeddings
+
+        Returns:
+            Lista de embeddings, na ordem dos textos
+        """
+        with self._lock:
+            faltantes = list(dict.fromkeys(t for t in textos if _chave_texto(t) not in self.embeddings))
+            self.embeddings_reaproveitados += len(textos) - len(faltantes)
+        if faltantes:
+            gerados = gerar(faltantes)
+            with self._lock:
+                self.lotes_embedding += 1
+                self.textos_embedding += len(faltantes)
+                for texto, embedding in zip(faltantes, gerados):
+                    self.embeddings[_chave_texto(texto)] = embedding
+        with self._lock:
+            return [self.embeddings[_chave_texto(t)] for t in textos]
+
+    def documentos_em_cache(self, termo, match_count):
+        """
+        Lista já recuperada para o termo nesta requisição (ou None). Se a
+        recuperação do termo foi antecipada e ainda está em andamento, espera por ela.
+        """
+        chave = (_chave_texto(termo), match_count)
+        with self._lock:
+            documentos = self.documentos.get(chave)
+            futuro = self._antecipadas.get(chave) if documentos is None else None
+        if futuro is not None:
+            try:
+                futuro.result()
+            except Exception:
+                return None
+            with self._lock:
+                documentos = self.documentos.get(chave)
+        if documentos is not None:
+            with self._lock:
+                self.consultas_reaproveitadas += 1
+        return documentos
+
+    def antecipar(self, termo, match_count, recuperar):
+        """
+        Inicia em segundo plano a recuperação de um termo que ainda não foi
+        consultado nem está em andamento nesta requisição.
+
+        A função deve guardar a lista com guardar_documentos (como
+        ProcessadorProcedimentos._recuperar_listas) e não deve esperar por outras
+        tarefas do mesmo executor.
+
+        Args:
+            termo: Termo de busca
+            match_count: Número de documentos pedidos
+            recuperar: Função sem argumentos que recupera e guarda a lista do termo
+
+        Returns:
+            True se a recuperação foi iniciada
+        """
+        chave = (_chave_texto(termo), match_count)
+        with self._lock:
+            if chave in self.documentos or chave in self._antecipadas:
+                return False
+            self._antecipadas[chave] = _obter_executor().submit(contextvars.copy_context().run, recuperar)
+            self.consultas_antecipadas += 1
+            return True
+
+    def guardar_documentos(self, termos, match_count, listas):
+        """Guarda as listas de uma rodada de recuperação (uma por termo)."""
+        with self._lock:
+            self.rodadas_recuperacao += 1
+            self.consultas += len(termos)
+            for termo, documentos in zip(termos, listas):
+                self.documentos[(_chave_texto(termo), match_count)] = documentos
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "lotes_embedding": self.lotes_embedding,
+                "textos_embedding": self.textos_embedding,
+                "embeddings_reaproveitados": self.embeddings_reaproveitados,
+                "rodadas_recuperacao": self.rodadas_recuperacao,
+                "consultas": self.consultas,
+                "consultas_reaproveitadas": self.consultas_reaproveitadas,
+                "consultas_antecipadas": self.consultas_antecipadas,
+            }
+
+
+@contextmanager
+def com_contexto_recuperacao():
+    """
+    Compartilha embeddings e documentos recuperados entre as etapas executadas
+    dentro do bloco (inclusive nas threads que copiam o contexto).
+
+    Yields:
+        O ContextoRecuperacao criado
+    """
+    contexto = ContextoRecuperacao()
+    token = _contexto_atual.set(contexto)
+    try:
+        yield contexto
+    finally:
+        _contexto_atual.reset(token)
+
+
+def contexto_recuperacao():
+    """Retorna o ContextoRecuperacao da requisição corrente (ou None)."""
+    return _contexto_atual.get()
+
+
+def _chave_texto(texto):
+    return " ".join(normalizar_texto(texto).split())
+
+
+def parametros_recuperacao():
+    """Retorna (k, candidatos por consulta, documentos por procedimento)."""
+    return (
+        env_int("RECUPERACAO_RRF_K", 60),
+        env_int("RECUPERACAO_CANDIDATOS_POR_CONSULTA", 8),
+        env_int("RECUPERACAO_DOCS_POR_PROCEDIMENTO", 5),
+    )
+
+
+def consultas_unicas(termos):
+    """Remove termos vazios e repetidos (sem diferenciar caixa e acentos), mantendo a ordem."""
+    unicos = []
+    vistos = set()
+    for termo in termos:
+        if not isinstance(termo, str) or not termo.strip():
+            continue
+        chave = _chave_texto(termo)
+        if chave not in vistos:
+            vistos.add(chave)
+            unicos.append(termo.strip())
+    return unicos
+
+
+def parametros_poda():
+    """Retorna (similaridade mínima, gap relativo, orçamento de tokens)."""
+    return (
+        env_float("RECUPERACAO_SIMILARIDADE_MINIMA", 0.25),
+        env_float("RECUPERACAO_GAP_RELATIVO", 0.35),
+        env_int("RECUPERACAO_ORCAMENTO_TOKENS", 1200),
+    )
+
+
+def podar_documentos(documentos, similaridade_minima=None, gap_relativo=None):
+    """
+    Remove documentos pouco similares e duplicados de uma lista ranqueada.
+
+    São descartados os documentos abaixo da similaridade mínima ou cuja
+    similaridade fica mais de `gap_relativo` abaixo da do primeiro documento. Os
+    que não têm "similarity" são mantidos. O primeiro documento é sempre mantido,
+    para que o fallback da decodificação tenha um candidato.
+
+    Args:
+        documentos: Lista de documentos ordenada por relevância
+        similaridade_minima: Piso de similaridade (padrão: RECUPERACAO_SIMILARIDADE_MINIMA)
+        gap_relativo: Distância relativa máxima ao primeiro (padrão: RECUPERACAO_GAP_RELATIVO)
+
+    Returns:
+        Lista podada, na mesma ordem
+    """
+    padrao_minima, padrao_gap, _ = parametros_poda()
+    similaridade_minima = padrao_minima if similaridade_minima is None else similaridade_minima
+    gap_relativo = padrao_gap if gap_relativo is None else gap_relativo
+
+    documentos = [documento for documento in documentos or [] if isinstance(documento, dict)]
+    similaridades = [d.get("similarity") for d in documentos if isinstance(d.get("similarity"), (int, float))]
+    corte = max(similaridade_minima, max(similaridades) * (1 - gap_relativo)) if similaridades else None
+
+    podados = []
+    vistos = set()
+    for documento in documentos:
+        chave = chave_documento(documento)
+        if chave in vistos:
+            continue
+        similaridade = documento.get("similarity")
+        if podados and corte is not None and isinstance(similaridade, (int, float)) and similaridade < corte:
+            continue
+        vistos.add(chave)
+        podados.append(documento)
+    return podados
+
+
+def limitar_por_orcamento(textos, orcamento_tokens):
+    """
+    Mantém os textos, em ordem, enquanto couberem no orçamento de tokens (o
+    primeiro é sempre mantido).
+
+    Returns:
+        Lista com o prefixo dos textos que cabe no orçamento
+    """
+    mantidos = []
+    usados = 0
+    for texto in textos:
+        tokens = estimar_tokens(texto)
+        if mantidos and usados + tokens > orcamento_tokens:
+            break
+        mantidos.append(texto)
+        usados += tokens
+    return mantidos
+
+
+def rpc_lote_habilitada() -> bool:
+    return env_bool("RECUPERACAO_RPC_LOTE", False)
+
+
+def separar_por_consulta(linhas, total_consultas):
+    """
+    Separa as linhas da RPC em lote (com o campo "consulta") em uma lista por consulta.
+
+    Returns:
+        Lista com total_consultas listas de documentos, na ordem das linhas
+    """
+    listas = [[] for _ in range(total_consultas)]
+    for linha in linhas or []:
+        consulta = linha.get("consulta")
+        if isinstance(consulta, int) and 0 <= consulta < total_consultas:
+            listas[consulta].append({chave: valor for chave, valor in linha.items() if chave != "consulta"})
+    return listas
+
+
+def chave_documento(documento):
+    """Chave de deduplicação: o código do procedimento (ou o nome, se não houver código)."""
+    codigo = documento.get("codigo_procedimento")
+    if codigo not in (None, ""):
+        return str(codigo)
+    return normalizar_texto(str(documento.get("nome_procedimento", "")))
+
+
+def fundir_rrf(listas, k=60, limite=None):
+    """
+    Funde listas ranqueadas de documentos por posição recíproca.
+
+    Documentos com o mesmo código são unidos: somam as contribuições de cada lista
+    e mantêm a maior similaridade observada.
+
+    Args:
+        listas: Listas de documentos (dicionários), cada uma ordenada por relevância
+        k: Constante da fusão; valores maiores suavizam o peso das primeiras posições
+        limite: Número máximo de documentos retornados (None para todos)
+
+    Returns:
+        Lista de documentos ordenada pela pontuação RRF, com o campo "rrf"
+    """
+    pontuacoes = {}
+    documentos = {}
+    for lista in listas:
+        vistos = set()
+        for posicao, documento in enumerate(lista or [], start=1):
+            if not isinstance(documento, dict):
+                continue
+            chave = chave_documento(documento)
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            pontuacoes[chave] = pontuacoes.get(chave, 0.0) + 1.0 / (k + posicao)
+            atual = documentos.get(chave)
+            if atual is None or (documento.get("similarity") or 0) > (atual.get("similarity") or 0):
+                documentos[chave] = documento
+
+    ordenadas = sorted(pontuacoes, key=lambda chave: pontuacoes[chave], reverse=True)
+    if limite is not None:
+        ordenadas = ordenadas[:limite]
+    return [{**documentos[chave], "rrf": round(pontuacoes[chave], 6)} for chave in ordenadas]
+
+
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, env_int("RECUPERACAO_MAX_PARALELISMO", 8)),
+                    thread_name_prefix="recuperacao",
+                )
+    return _executor
+
+
+def executar_consultas(funcao, argumentos):
+    """
+    Executa funcao(*args) para cada tupla de argumentos em paralelo, propagando o
+    contexto (prazo e prioridade) da requisição.
+
+    Returns:
+        Resultados na ordem dos argumentos
+    """
+    argumentos = list(argumentos)
+    if len(argumentos) <= 1:
+        return [funcao(*args) for args in argumentos]
+    executor = _obter_executor()
+    futuros = [executor.submit(contextvars.copy_context().run, funcao, *args) for args in argumentos]
+    return [futuro.result() for futuro in futuros]
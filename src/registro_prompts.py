@@ -0,0 +1,166 @@
+"""
+Registro central dos prompts do projeto.
+
+Os prompts são resolvidos a partir do diretório `prompts/` do projeto (independente
+do diretório de trabalho e do sistema operacional), carregados uma única vez e
+mantidos em memória. A verificação de alteração (mtime) é feita no máximo uma vez
+a cada PROMPTS_INTERVALO_RECARGA segundos, de modo que requisições normais não
+fazem nenhum acesso ao sistema de arquivos.
+"""
+import hashlib
+import os
+import threading
+import time
+from loguru import logger
+from src.configuracao import env_float
+
+DIRETORIO_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_PROMPTS = os.path.join(DIRETORIO_PROJETO, "prompts")
+
+
+class RegistroPrompts:
+    """
+    Mantém os prompts em memória com hash de conteúdo e recarga por mtime.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PROMPTS, intervalo_recarga=2.0):
+        """
+        Inicializa o registro.
+
+        Args:
+            diretorio: Diretório base dos prompts
+            intervalo_recarga: Intervalo mínimo (s) entre verificações de mtime; 0 desativa a recarga
+        """
+        self.diretorio = diretorio
+        self.intervalo_recarga = intervalo_recarga
+        self._prompts = {}
+        self._lock = threading.RLock()
+        self._ultima_verificacao = 0.0
+
+    def resolver_caminho(self, nome: str) -> str:
+        """
+        Resolve o nome de um prompt para o caminho absoluto do arquivo.
+
+        Aceita o nome simples ("system_decodificacao"), o nome do arquivo
+        ("system_decodificacao.txt") ou caminhos antigos no formato Windows
+        ("prompts\\system_decodificacao.txt").
+        """
+        nome = nome.replace("\\", "/")
+        if os.path.isabs(nome):
+            return nome
+        partes = [parte for parte in nome.split("/") if parte]
+        if partes and partes[0] == os.path.basename(self.diretorio):
+            partes = partes[1:]
+        caminho = os.path.join(self.diretorio, *partes)
+        if not os.path.splitext(caminho)[1]:
+            caminho += ".txt"
+        return caminho
+
+    def _chave(self, nome: str) -> str:
+        return os.path.splitext(os.path.basename(nome.replace("\\", "/")))[0]
+
+    def _carregar(self, chave: str, caminho: str):
+        try:
+            with open(caminho, "r", encoding="utf-8") as arquivo:
+                conteudo = arquivo.read()
+            mtime = os.stat(caminho).st_mtime_ns
+        except Exception as e:
+            raise Exception(f"Erro ao carregar o prompt de {caminho}: {str(e)}")
+        entrada = {
+            "caminho": caminho,
+            "conteudo": conteudo,
+            "hash": hashlib.sha256(conteudo.encode("utf-8")).hexdigest(),
+            "mtime": mtime,
+        }
+        self._prompts[chave] = entrada
+        return entrada
+
+    def _verificar_alteracoes(self):
+        """Recarrega os prompts cujo mtime mudou (respeitando o intervalo de recarga)."""
+        if self.intervalo_recarga <= 0:
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_verificacao < self.intervalo_recarga:
+            return
+        with self._lock:
+            if agora - self._ultima_verificacao < self.intervalo_recarga:
+                return
+            self._ultima_verificacao = agora
+            for chave, entrada in list(self._prompts.items()):
+                try:
+                    mtime = os.stat(entrada["caminho"]).st_mtime_ns
+                except OSError:
+                    continue
+                if mtime != entrada["mtime"]:
+                    hash_anterior = entrada["hash"]
+                    nova = self._carregar(chave, entrada["caminho"])
+                    if nova["hash"] != hash_anterior:
+                        logger.info("Prompt '{chave}' recarregado (hash {hash})", chave=chave, hash=nova["hash"][:12])
+
+    def _entrada(self, nome: str):
+        self._verificar_alteracoes()
+        chave = self._chave(nome)
+        entrada = self._prompts.get(chave)
+        if entrada is None:
+            with self._lock:
+                entrada = self._prompts.get(chave)
+                if entrada is None:
+                    entrada = self._carregar(chave, self.resolver_caminho(nome))
+        return entrada
+
+    def obter(self, nome: str) -> str:
+        """Retorna o conteúdo do prompt."""
+        return self._entrada(nome)["conteudo"]
+
+    def hash(self, nome: str) -> str:
+        """Retorna o hash SHA-256 do conteúdo atual do prompt."""
+        return self._entrada(nome)["hash"]
+
+    def assinatura(self) -> str:
+        """
+        Retorna um hash combinado de todos os prompts carregados.
+
+        Muda sempre que algum prompt é recarregado com conteúdo diferente, o que
+        permite a quem montou objetos a partir dos prompts saber quando refazê-los.
+        """
+        self._verificar_alteracoes()
+        with self._lock:
+            combinado = "|".join(f"{chave}:{entrada['hash']}" for chave, entrada in sorted(self._prompts.items()))
+        return hashlib.sha256(combinado.encode("utf-8")).hexdigest()
+
+    def carregar_todos(self):
+        """
+        Carrega todos os prompts do diretório.
+
+        Returns:
+            Dicionário nome -> hash dos prompts carregados
+        """
+        for arquivo in sorted(os.listdir(self.diretorio)):
+            if arquivo.endswith(".txt"):
+                self._entrada(arquivo)
+        with self._lock:
+            return {chave: entrada["hash"] for chave, entrada in self._prompts.items()}
+
+
+_registro = None
+_lock_registro = threading.Lock()
+
+
+def obter_registro_prompts() -> RegistroPrompts:
+    """Retorna o registro de prompts compartilhado pelo processo."""
+    global _registro
+    if _registro is None:
+        with _lock_registro:
+            if _registro is None:
+                _registro = RegistroPrompts(intervalo_recarga=env_float("PROMPTS_INTERVALO_RECARGA", 2.0))
+    return _registro
+
+
+def obter_prompt(nome: str) -> str:
+    """Atalho para obter o conteúdo de um prompt do registro compartilhado."""
+    return obter_registro_prompts().obter(nome)
+
+
+def hash_prompt(nome: str) -> str:
+    """Atalho para obter o hash de um prompt do registro compartilhado."""
+    return obter_registro_prompts().hash(nome)
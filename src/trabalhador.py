@@ -0,0 +1,164 @@
+"""
+Processos trabalhadores que consomem a fila de jobs (src/fila_jobs.py).
+
+Cada processo reserva um job por vez, executa o processamento com prioridade
+"lote" no agendador de chamadas e grava o resultado na fila. Enquanto o job roda,
+uma thread renova a visibilidade da reserva para que ele não seja entregue a
+outro trabalhador.
+
+Uso:
+    python -m src.trabalhador [--trabalhadores N]
+
+O número de processos também pode ser definido por TRABALHADORES (padrão: número
+de CPUs). Cada processo tem o seu agendador de chamadas à OpenAI; os limites de
+RPM/TPM e de concorrência são divididos entre os processos por
+AGENDADOR_PROCESSOS (ver src/agendador.py), que, se não configurado, passa a ser
+o número de trabalhadores + 1 (uma parte fica para a API).
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from src.configuracao import env_float, env_int
+from src.fila_jobs import obter_fila_jobs
+from src.logs import configurar_logs, encerrar_logs
+
+
+def _processar_com_laudo(payload):
+    from src.flows.process_fluxo import processar_texto_e_decidir_fluxo
+    return processar_texto_e_decidir_fluxo(
+        payload["text"], payload.get("laudo"), payload.get("prazo_segundos"), payload.get("caso_id")
+    )
+
+
+def _processar_lote(payload):
+    from src.processamento_lote import processar_lote
+    return processar_lote(payload["casos"], payload.get("limiar", 0.85))
+
+
+# Tipo do job -> função que recebe o payload e retorna o resultado
+TIPOS_JOB = {
+    "processar_com_laudo": _processar_com_laudo,
+    "processar_lote": _processar_lote,
+}
+
+
+def _renovar_visibilidade(fila, job_id, trabalhador, parar):
+    intervalo = max(fila.visibilidade / 3.0, 1.0)
+    while not parar.wait(intervalo):
+        try:
+            fila.estender_visibilidade(job_id, trabalhador)
+        except Exception as e:
+            logger.error("Erro ao renovar visibilidade do job {job_id}: {erro}", job_id=job_id, erro=e)
+
+
+def processar_job(fila, job, trabalhador):
+    """
+    Executa um job reservado e registra o resultado ou a falha na fila.
+
+    Args:
+        fila: FilaJobs de onde o job foi reservado
+        job: Job retornado por FilaJobs.reservar
+        trabalhador: Identificador do trabalhador
+    """
+    from src.agendador import com_prioridade
+
+    logger.info("Trabalhador {trabalhador} processando job {job_id} (tentativa {tentativa})", trabalhador=trabalhador, job_id=job['id'], tentativa=job['tentativas'])
+    parar_renovacao = threading.Event()
+    renovacao = threading.Thread(
+        target=_renovar_visibilidade, args=(fila, job["id"], trabalhador, parar_renovacao), daemon=True
+    )
+    renovacao.start()
+    try:
+        funcao = TIPOS_JOB.get(job["tipo"])
+        if funcao is None:
+            raise ValueError(f"Tipo de job desconhecido: {job['tipo']}")
+        with com_prioridade("lote"):
+            resultado = funcao(job["payload"])
+        if isinstance(resultado, dict) and resultado.get("tipo_fluxo") == "erro":
+            raise RuntimeError(resultado.get("erro", "Erro no processamento"))
+        if fila.concluir(job["id"], resultado, trabalhador):
+            logger.info("Job {job_id} concluído", job_id=job['id'])
+        else:
+            logger.warning("Job {job_id} não está mais reservado por {trabalhador}; resultado descartado", job_id=job["id"], trabalhador=trabalhador)
+    except Exception as e:
+        logger.error("Erro no job {job_id}: {erro}", job_id=job['id'], erro=e)
+        if not fila.falhar(job["id"], str(e), trabalhador):
+            logger.warning("Job {job_id} não está mais reservado por {trabalhador}; falha ignorada", job_id=job["id"], trabalhador=trabalhador)
+    finally:
+        parar_renovacao.set()
+
+
+def executar_trabalhador(indice=0, parar=None):
+    """
+    Laço principal de um trabalhador: reserva e processa jobs até ser interrompido.
+
+    Args:
+        indice: Índice do trabalhador (compõe o identificador)
+        parar: threading.Event/multiprocessing.Event que encerra o laço
+    """
+    configurar_logs()
+    trabalhador = f"{socket.gethostname()}-{os.getpid()}-{indice}"
+    intervalo_ociosidade = env_float("TRABALHADOR_INTERVALO_OCIOSO", 1.0)
+    fila = obter_fila_jobs()
+
+    # Aquecer o processador antes de pegar o primeiro job
+    try:
+        from src.flows.fluxo_chain import obter_processador
+        obter_processador()
+    except Exception as e:
+        logger.error("Erro ao aquecer o processador no trabalhador {trabalhador}: {erro}", trabalhador=trabalhador, erro=e)
+
+    logger.info("Trabalhador {trabalhador} iniciado", trabalhador=trabalhador)
+    while parar is None or not parar.is_set():
+        job = fila.reservar(trabalhador)
+        if job is None:
+            time.sleep(intervalo_ociosidade)
+            continue
+        processar_job(fila, job, trabalhador)
+    logger.info("Trabalhador {trabalhador} encerrado", trabalhador=trabalhador)
+    encerrar_logs()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabalhadores da fila de jobs")
+    parser.add_argument("--trabalhadores", type=int, default=env_int("TRABALHADORES", os.cpu_count() or 1))
+    args = parser.parse_args()
+    configurar_logs()
+
+    if env_int("AGENDADOR_PROCESSOS", 0) <= 0:
+        # Sem isto, cada trabalhador usaria os limites inteiros da conta
+        os.environ["AGENDADOR_PROCESSOS"] = str(args.trabalhadores + 1)
+    logger.info(
+        "Limites do agendador divididos entre {processos} processos",
+        processos=os.environ["AGENDADOR_PROCESSOS"],
+    )
+
+    parar = multiprocessing.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    processos = [
+        multiprocessing.Process(target=executar_trabalhador, args=(indice, parar), name=f"trabalhador-{indice}")
+        for indice in range(args.trabalhadores)
+    ]
+    for processo in processos:
+        processo.start()
+    logger.info("{trabalhadores} trabalhadores iniciados", trabalhadores=len(processos))
+    try:
+        for processo in processos:
+            processo.join()
+    except KeyboardInterrupt:
+        parar.set()
+        for processo in processos:
+            processo.join()
+
+
+if __name__ == "__main__":
+    main()
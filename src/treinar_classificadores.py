@@ -0,0 +1,133 @@
+"""
+Treina os classificadores locais de triagem (src/classificador_local.py).
+
+Os exemplos vêm de um arquivo JSONL com o campo "texto" e os rótulos dados pelo
+LLM: "entrada_por_trauma" e/ou "retirada_peca_anatomica". O arquivo pode ser
+gerado a partir dos jobs concluídos da fila (--exportar-fila); nesse caso são
+descartados os rótulos de etapas degradadas ou decididas pelo próprio
+classificador local.
+
+Uso:
+    python -m src.treinar_classificadores --exportar-fila exemplos.jsonl
+    python -m src.treinar_classificadores --dados exemplos.jsonl [--saida modelos] [--precisao-alvo 0.98]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from src.classificador_local import ClassificadorTexto, diretorio_classificadores
+
+# Nome do classificador -> (campo do rótulo, etapa do LLM que o produz)
+TAREFAS = {
+    "trauma": ("entrada_por_trauma", "verificador_trauma"),
+    "peca": ("retirada_peca_anatomica", "identificador_peca"),
+}
+
+EXEMPLOS_MINIMOS = 50
+
+# Latência máxima de inferência por texto; acima dela o modelo não é salvo
+LIMITE_INFERENCIA_US = 1000
+
+
+def exportar_fila(caminho_saida):
+    """
+    Exporta os rótulos dos jobs concluídos da fila para um arquivo JSONL.
+
+    Returns:
+        Número de exemplos exportados
+    """
+    from src.fila_jobs import obter_fila_jobs
+
+    total = 0
+    with open(caminho_saida, "w", encoding="utf-8") as arquivo:
+        for payload, resultado in obter_fila_jobs().listar_concluidos("processar_com_laudo"):
+            if not isinstance(resultado, dict) or not payload.get("text"):
+                continue
+            etapas_excluidas = {
+                item.get("etapa")
+                for item in resultado.get("etapas_degradadas", []) + resultado.get("decisoes_locais", [])
+            }
+            exemplo = {"texto": payload["text"]}
+            for campo, etapa in TAREFAS.values():
+                if isinstance(resultado.get(campo), bool) and etapa not in etapas_excluidas:
+                    exemplo[campo] = resultado[campo]
+            if len(exemplo) > 1:
+                arquivo.write(json.dumps(exemplo, ensure_ascii=False) + "\n")
+                total += 1
+    return total
+
+
+def carregar_exemplos(caminho):
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        return [json.loads(linha) for linha in arquivo if linha.strip()]
+
+
+def medir_inferencia(classificador, textos, repeticoes=3):
+    """Retorna a latência média de inferência por texto, em microssegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            classificador.decidir(texto)
+    return (time.perf_counter() - inicio) / (repeticoes * len(textos)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina os classificadores locais de triagem")
+    parser.add_argument("--dados", help="Arquivo JSONL com texto e rótulos")
+    parser.add_argument("--exportar-fila", help="Exporta os rótulos dos jobs concluídos para este arquivo JSONL")
+    parser.add_argument("--saida", default=None, help="Diretório dos modelos (padrão: CLASSIFICADORES_DIR)")
+    parser.add_argument("--precisao-alvo", type=float, default=0.98)
+    parser.add_argument("--iteracoes", type=int, default=300)
+    parser.add_argument("--limite-inferencia-us", type=float, default=LIMITE_INFERENCIA_US,
+                        help="Latência máxima de inferência por texto, em µs (0 = sem limite)")
+    args = parser.parse_args()
+
+    if args.exportar_fila:
+        total = exportar_fila(args.exportar_fila)
+        logger.info("{total} exemplos exportados para {arquivo}", total=total, arquivo=args.exportar_fila)
+        if not args.dados:
+            return 0
+    if not args.dados:
+        parser.error("informe --dados ou --exportar-fila")
+
+    exemplos = carregar_exemplos(args.dados)
+    saida = args.saida or diretorio_classificadores()
+    os.makedirs(saida, exist_ok=True)
+
+    codigo = 0
+    for nome, (campo, _) in TAREFAS.items():
+        rotulados = [e for e in exemplos if isinstance(e.get(campo), bool) and e.get("texto")]
+        positivos = sum(1 for e in rotulados if e[campo])
+        if len(rotulados) < EXEMPLOS_MINIMOS or positivos == 0 or positivos == len(rotulados):
+            logger.warning(
+                "Classificador '{nome}': exemplos insuficientes ({total}, {positivos} positivos)",
+                nome=nome, total=len(rotulados), positivos=positivos,
+            )
+            continue
+        textos = [e["texto"] for e in rotulados]
+        classificador = ClassificadorTexto()
+        metricas = classificador.treinar(
+            textos, [e[campo] for e in rotulados], iteracoes=args.iteracoes, precisao_alvo=args.precisao_alvo
+        )
+        metricas["inferencia_us"] = round(medir_inferencia(classificador, textos[:200]), 1)
+        if args.limite_inferencia_us and metricas["inferencia_us"] > args.limite_inferencia_us:
+            logger.error(
+                "Classificador '{nome}': inferência de {latencia} µs por texto acima do limite de {limite} µs; modelo não salvo",
+                nome=nome, latencia=metricas["inferencia_us"], limite=args.limite_inferencia_us,
+            )
+            codigo = 1
+            continue
+        classificador.metadados["metricas"] = metricas
+        caminho = os.path.join(saida, f"{nome}.npz")
+        classificador.salvar(caminho)
+        print(f"{nome}: {json.dumps(metricas, ensure_ascii=False)} -> {caminho}")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
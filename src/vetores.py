@@ -0,0 +1,66 @@
+"""
+Representação dos embeddings: float32 de ponta a ponta.
+
+Por padrão, o SDK da OpenAI pede os embeddings em base64 e os converte em listas
+de floats do Python (1536 objetos por embedding), que depois são serializadas em
+JSON para a RPC com ~20 caracteres por componente. Aqui os embeddings são pedidos
+em base64 e decodificados direto em um buffer float32 do NumPy (um único bloco de
+6 KB por embedding), que é o que circula pelos caches, pelo índice local e pela
+pré-decisão. Na fronteira com o Postgres, o vetor vira o literal de texto do
+pgvector com 9 dígitos significativos, suficiente para reproduzir o float32 exato.
+
+Configuração (variáveis de ambiente):
+    EMBEDDINGS_BASE64: pede os embeddings em base64 (padrão true); com false, pede
+        listas de floats (para proxies da API sem suporte a base64)
+"""
+import base64
+from src.configuracao import env_bool
+
+
+def formato_embeddings() -> str:
+    """Valor de encoding_format pedido à API de embeddings."""
+    return "base64" if env_bool("EMBEDDINGS_BASE64", True) else "float"
+
+
+def decodificar_base64(texto):
+    """Decodifica um embedding em base64 (float32 little-endian) sem copiar os componentes."""
+    import numpy as np
+
+    return np.frombuffer(base64.b64decode(texto), dtype="<f4")
+
+
+def matriz_embeddings(dados):
+    """
+    Monta a matriz float32 dos embeddings de uma resposta da API.
+
+    Args:
+        dados: Itens de `response.data` (com `index` e `embedding` em base64 ou lista)
+
+    Returns:
+        Matriz float32 (um embedding por linha, na ordem de `index`)
+    """
+    import numpy as np
+
+    itens = sorted(dados, key=lambda item: item.index)
+    if not itens:
+        return np.zeros((0, 0), dtype=np.float32)
+    primeiro = itens[0].embedding
+    if not isinstance(primeiro, str):
+        return np.asarray([item.embedding for item in itens], dtype=np.float32)
+    matriz = np.empty((len(itens), len(base64.b64decode(primeiro)) // 4), dtype=np.float32)
+    for linha, item in enumerate(itens):
+        matriz[linha] = decodificar_base64(item.embedding)
+    return matriz
+
+
+def literal_vetor(vetor) -> str:
+    """
+    Literal de texto do pgvector ("[0.1,0.2,...]") para enviar o embedding à RPC.
+
+    Nove dígitos significativos reproduzem exatamente o float32, com cerca de
+    metade do tamanho da serialização JSON dos floats de 64 bits.
+    """
+    import numpy as np
+
+    componentes = np.asarray(vetor, dtype=np.float32).tolist()
+    return "[" + ",".join(map("{:.9g}".format, componentes)) + "]"